@@ -3,3 +3,12 @@ import os
 MLFLOW_URL: str = os.getenv("MLFLOW_URL")
 NODE_NAME: str = os.getenv("NODE_NAME")
 DATA_PATH: str = os.getenv("DATA_PATH", "/common/fl_models/iris/data.csv")
+
+# Memory the models loaded from the registry are kept in across tasks, 0 to load
+# them for every task
+MODEL_CACHE_MB: int = int(os.getenv("MODEL_CACHE_MB", "512"))
+
+# Directory the model artifacts are cached in, shared with the other processes of
+# the host, each loading the models from the registry when unset
+ARTIFACT_CACHE_DIR: str | None = os.getenv("ARTIFACT_CACHE_DIR")
+ARTIFACT_CACHE_MB: int = int(os.getenv("ARTIFACT_CACHE_MB", "2048"))
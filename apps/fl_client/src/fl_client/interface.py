@@ -1,9 +1,12 @@
+import copy
+from typing import Callable
+
 from flwr.common import Message
 
 from fl_client import stages
 from fl_client.utils import responses_utils
 
-from interfaces import recordset
+from interfaces import array_serde, delta, recordset
 
 
 def load_data_if(msg: Message, global_vars: dict) -> Message:
@@ -34,14 +37,53 @@ def train_model_if(msg: Message, global_vars: dict) -> Message:
     latest_parameters, current_global_iter = recordset.read_train_model_recordset(
         msg.content
     )
+    global_version, base_version, delta_reply = recordset.read_train_model_transport(
+        msg.content
+    )
+    codec, error_feedback, topk = recordset.read_train_model_codec(msg.content)
+    compression = recordset.read_compression(msg.content)
+    packed = recordset.read_packed(msg.content)
+    latest_parameters = array_serde.decode_parameters(latest_parameters)
+    if base_version is not None:
+        base = stages.get_global_parameters(base_version, global_vars)
+        if base is None:
+            return responses_utils.create_missing_base_response(msg, base_version)
+        latest_parameters = delta.add_parameters(base, latest_parameters)
     stages.set_model_parameters(latest_parameters, global_vars)
     metrics = stages.train_model(global_vars, current_global_iter)
-    latest_parameters = stages.get_model_parameters(global_vars)
-    return responses_utils.create_train_response(msg, latest_parameters, metrics)
+    trained_parameters = stages.get_model_parameters(global_vars)
+    num_examples = global_vars.get("num_examples")
+    if not delta_reply:
+        return responses_utils.create_train_response(
+            msg,
+            stages.encode_parameters(
+                trained_parameters,
+                codec,
+                error_feedback,
+                global_vars,
+                topk,
+                compression,
+                packed,
+            ),
+            metrics,
+            num_examples=num_examples,
+        )
+    stages.set_global_parameters(latest_parameters, global_version, global_vars)
+    update = delta.subtract_parameters(trained_parameters, latest_parameters)
+    return responses_utils.create_train_response(
+        msg,
+        stages.encode_parameters(
+            update, codec, error_feedback, global_vars, topk, compression
+        ),
+        metrics,
+        base_version=global_version,
+        num_examples=num_examples,
+    )
 
 
 def get_parameters_if(msg: Message, global_vars: dict) -> Message:
-    latest_parameters = stages.get_model_parameters(global_vars)
+    compression = recordset.read_compression(msg.content)
+    latest_parameters = stages.get_model_parameters(global_vars, compression)
     return responses_utils.create_parameters_response(msg, latest_parameters)
 
 
@@ -61,6 +103,8 @@ def set_run_config_if(msg: Message, global_vars: dict) -> Message:
         content["model_version"],
         global_vars["data_path"],
     )
+    # Versions and residuals of a previous task do not apply to this one
+    stages.clear_global_parameters(global_vars)
     return responses_utils.create_success_response(msg, "set run config successfully")
 
 
@@ -74,3 +118,32 @@ def filter_clients_if(msg: Message, global_vars: dict) -> Message:
     if use_case == global_vars["use_case"]:
         return responses_utils.create_participate_response(msg, True)
     return responses_utils.create_participate_response(msg, False)
+
+
+def pipeline_if(
+    msg: Message,
+    global_vars: dict,
+    handler: Callable[[Message, dict], Message],
+) -> Message:
+    modes: list[str] = []
+    replies = []
+    step_success: list[bool] = []
+    message = "pipeline completed successfully"
+    for step in recordset.read_pipeline_recordset(msg.content):
+        mode = str(step.configs_records["config"]["mode"])
+        step_msg = Message(metadata=copy.copy(msg.metadata), content=step)
+        try:
+            reply = handler(step_msg, global_vars).content
+        except Exception as e:
+            reply = responses_utils.create_failure_recordset(str(e))
+        config = reply.configs_records["config"]
+        success = bool(config.get("success", config.get("participate", False)))
+        modes.append(mode)
+        replies.append(reply)
+        step_success.append(success)
+        if not success:
+            message = f"pipeline stopped at {mode}: {str(config.get('message', ''))}"
+            break
+    return responses_utils.create_pipeline_response(
+        msg, modes, replies, step_success, message
+    )
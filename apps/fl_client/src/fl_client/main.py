@@ -1,13 +1,20 @@
 from flwr.client import ClientApp
 from flwr.common import Context, Message
 
-from fl_client.config import MLFLOW_URL, NODE_NAME, DATA_PATH
+from fl_client.config import (
+    ARTIFACT_CACHE_DIR,
+    ARTIFACT_CACHE_MB,
+    DATA_PATH,
+    MLFLOW_URL,
+    NODE_NAME,
+)
 from fl_client.interface import (
     clean_config_if,
     filter_clients_if,
     get_parameters_if,
     load_data_if,
     load_model_if,
+    pipeline_if,
     prepare_data_if,
     set_parameters_if,
     set_run_config_if,
@@ -15,6 +22,7 @@ from fl_client.interface import (
     upload_model_if,
 )
 
+from interfaces.artifact_cache import ArtifactCache
 from interfaces.mlflow_client import setup_mlflow
 
 global_vars = {
@@ -27,14 +35,18 @@ global_vars = {
     "data_path": DATA_PATH,
 }
 
-setup_mlflow(MLFLOW_URL)
+setup_mlflow(
+    MLFLOW_URL,
+    artifact_cache=(
+        ArtifactCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MB * 2**20)
+        if ARTIFACT_CACHE_DIR
+        else None
+    ),
+)
 app = ClientApp()
 
 
-@app.query()
-def query(msg: Message, ctx: Context) -> Message:
-    global global_vars
-
+def handle_query(msg: Message, global_vars: dict) -> Message:
     mode = msg.content.configs_records["config"]["mode"]
     if not isinstance(mode, str):
         raise TypeError()
@@ -66,10 +78,19 @@ def query(msg: Message, ctx: Context) -> Message:
     elif mode == "clean_config":
         return clean_config_if(msg)
 
+    elif mode == "pipeline":
+        return pipeline_if(msg, global_vars, handle_query)
+
     else:
         raise NotImplementedError(f"Unknown mode: {mode}")
 
 
+@app.query()
+def query(msg: Message, ctx: Context) -> Message:
+    global global_vars
+    return handle_query(msg, global_vars)
+
+
 @app.train()
 def train(msg: Message, ctx: Context) -> Message:
     global global_vars
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+import cloudpickle
+from mlflow.pyfunc import PyFuncModel
+
+# Name and version of a registered model
+ModelKey = tuple[str | None, int | None]
+
+
+def model_size(model: PyFuncModel) -> int:
+    # Bytes of the pickled FL model, as loaded from the registry
+    return len(cloudpickle.dumps(model.unwrap_python_model()))
+
+
+class ModelCache:
+    # Models loaded from the registry by name and version, which do not change once
+    # registered. The least recently used are evicted once the models pass the
+    # budget, and a model larger than the budget is not kept.
+    def __init__(self, budget: int) -> None:
+        self.budget = budget
+        self.size = 0
+        self._models: OrderedDict[ModelKey, tuple[PyFuncModel, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: ModelKey) -> PyFuncModel | None:
+        with self._lock:
+            if key not in self._models:
+                return None
+            self._models.move_to_end(key)
+            return self._models[key][0]
+
+    def put(self, key: ModelKey, model: PyFuncModel, size: int) -> None:
+        if size > self.budget:
+            return
+        with self._lock:
+            if key in self._models:
+                self.size -= self._models.pop(key)[1]
+            self._models[key] = (model, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, evicted) = self._models.popitem(last=False)
+                self.size -= evicted
+
+    def __contains__(self, key: ModelKey) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
@@ -1,10 +1,16 @@
+from collections import OrderedDict
+
 import pandas as pd
 from flwr.common import MetricsRecord, ParametersRecord
 from mlflow.models.model import ModelInfo
 
-from fl_client.config import DATA_PATH
+from fl_client.config import DATA_PATH, MODEL_CACHE_MB
+from fl_client.model_cache import ModelCache, model_size
+
+from interfaces import array_serde, mlflow_client
 
-from interfaces import mlflow_client
+# Models loaded by earlier tasks, which only create a new local learner from them
+model_cache = ModelCache(MODEL_CACHE_MB * 2**20)
 
 
 def set_run_config(
@@ -35,12 +41,19 @@ def prepare_data(global_vars: dict) -> None:
     local_learner = global_vars["local_learner"]
     data = global_vars["data"]
     local_learner.prepare_data(data=data)
+    global_vars["num_examples"] = len(data)
 
 
 def load_model(
     global_vars: dict,
 ) -> None:
-    mlf_model = mlflow_client.load_model()
+    context = mlflow_client.current_context()
+    key = (context.model_name, context.model_version)
+    mlf_model = model_cache.get(key)
+    if mlf_model is None:
+        mlf_model = mlflow_client.load_model()
+        if model_cache.budget > 0:
+            model_cache.put(key, mlf_model, model_size(mlf_model))
     global_vars["model"] = mlf_model
     global_vars["local_learner"] = (
         mlf_model.unwrap_python_model().create_local_learner()
@@ -69,17 +82,69 @@ def evaluate_model(global_vars: dict) -> MetricsRecord:
 
 def get_model_parameters(
     global_vars: dict,
+    compression: str | None = None,
 ) -> ParametersRecord:
     local_learner = global_vars["local_learner"]
     parameters = local_learner.get_parameters()
     if not isinstance(parameters, ParametersRecord):
         raise TypeError(f"Expected ParametersRecord, got {type(parameters)}")
-    return parameters
+    return array_serde.compress_parameters(parameters, compression)
 
 
 def set_model_parameters(parameters: ParametersRecord, global_vars: dict) -> None:
     local_learner = global_vars["local_learner"]
-    local_learner.set_parameters(parameters)
+    local_learner.set_parameters(array_serde.decode_parameters(parameters))
+
+
+def set_global_parameters(
+    parameters: ParametersRecord, global_version: int, global_vars: dict
+) -> None:
+    global_vars["global_version"] = global_version
+    global_vars["global_parameters"] = parameters
+
+
+def get_global_parameters(
+    global_version: int, global_vars: dict
+) -> ParametersRecord | None:
+    if global_vars.get("global_version") != global_version:
+        return None
+    return global_vars.get("global_parameters")
+
+
+def clear_global_parameters(global_vars: dict) -> None:
+    for key in ("global_version", "global_parameters", "residual"):
+        global_vars.pop(key, None)
+
+
+def encode_parameters(
+    parameters: ParametersRecord,
+    codec: str | None,
+    error_feedback: bool,
+    global_vars: dict,
+    topk: float | None = None,
+    compression: str | None = None,
+    packed: bool = False,
+) -> ParametersRecord:
+    if packed:
+        return array_serde.compress_parameters(
+            array_serde.pack_parameters(parameters), compression
+        )
+    # Top-k always carries the entries it did not send over to the next round
+    if topk is None and (codec is None or not error_feedback):
+        return array_serde.compress_parameters(
+            array_serde.encode_parameters(parameters, codec), compression
+        )
+    # Add what the previous rounds failed to transmit before encoding
+    residual = global_vars.get("residual") or {}
+    encoded = OrderedDict()
+    for k, v in parameters.items():
+        ndarray = array_serde.array_to_ndarray(v)
+        if k in residual:
+            ndarray = ndarray + residual[k]
+        encoded[k] = array_serde.encode_ndarray(ndarray, codec, topk)
+        residual[k] = ndarray - array_serde.array_to_ndarray(encoded[k])
+    global_vars["residual"] = residual
+    return array_serde.compress_parameters(ParametersRecord(encoded), compression)
 
 
 def upload_model(
@@ -7,6 +7,8 @@ from flwr.common import (
     RecordSet,
 )
 
+from interfaces import recordset
+
 
 def create_participate_response(msg: Message, participate: bool) -> Message:
     configsrecord = ConfigsRecord({"participate": participate})
@@ -34,7 +36,11 @@ def create_upload_model_response(msg: Message, model_id: str, run_id: int) -> Me
 
 
 def create_train_response(
-    msg: Message, model_parameters: ParametersRecord, model_metrics: MetricsRecord
+    msg: Message,
+    model_parameters: ParametersRecord,
+    model_metrics: MetricsRecord,
+    base_version: int | None = None,
+    num_examples: int | None = None,
 ) -> Message:
     configsrecord = ConfigsRecord(
         {
@@ -42,6 +48,12 @@ def create_train_response(
             "message": "model trained successfully",
         }
     )
+    # The parameters are a delta against this global version
+    if base_version is not None:
+        configsrecord["base_version"] = base_version
+    # Number of examples trained on, the weight of the parameters in the average
+    if num_examples is not None:
+        configsrecord["num_examples"] = num_examples
     rs = RecordSet(
         parameters_records={"parameters": model_parameters},
         metrics_records={"metrics": model_metrics},
@@ -50,6 +62,18 @@ def create_train_response(
     return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
 
 
+def create_missing_base_response(msg: Message, base_version: int) -> Message:
+    configsrecord = ConfigsRecord(
+        {
+            "success": False,
+            "missing_base": True,
+            "message": f"global version {base_version} is not available",
+        }
+    )
+    rs = RecordSet(configs_records={"config": configsrecord})
+    return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
+
+
 def create_parameters_response(
     msg: Message, model_parameters: ParametersRecord
 ) -> Message:
@@ -64,3 +88,19 @@ def create_parameters_response(
         configs_records={"config": configsrecord},
     )
     return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
+
+
+def create_failure_recordset(event: str) -> RecordSet:
+    configsrecord = ConfigsRecord({"success": False, "message": event})
+    return RecordSet(configs_records={"config": configsrecord})
+
+
+def create_pipeline_response(
+    msg: Message,
+    modes: list[str],
+    replies: list[RecordSet],
+    step_success: list[bool],
+    event: str,
+) -> Message:
+    rs = recordset.create_pipeline_reply_recordset(modes, replies, step_success, event)
+    return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
@@ -1,5 +1,6 @@
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 from flwr.common import (
     ConfigsRecord,
@@ -12,6 +13,10 @@ from flwr.common import (
 
 from fl_client import interface
 
+import interfaces.recordset
+from interfaces.array_serde import array_to_ndarray
+from interfaces.testing import full_parameters
+
 
 @patch("fl_client.interface.stages.load_data")
 def test_load_data_if_success(load_data_mock):
@@ -122,7 +127,7 @@ def test_train_model_if_success(
         metadata=Mock(spec=Metadata),
         content=RecordSet(
             configs_records=configs_records,
-            parameters_records={"parameters": Mock(ParametersRecord)},
+            parameters_records={"parameters": ParametersRecord()},
         ),
     )
 
@@ -153,6 +158,68 @@ def test_train_model_if_error():
         interface.train_model_if(msg, global_vars)
 
 
+@patch("fl_client.interface.stages.train_model")
+@patch("fl_client.interface.stages.get_model_parameters")
+@patch("fl_client.interface.stages.set_model_parameters")
+def test_train_model_if_delta(
+    set_model_parameters_mock, get_model_parameters_mock, train_model_mock
+):
+    get_model_parameters_mock.return_value = full_parameters(4.0, (2, 2))
+    train_model_mock.return_value = MetricsRecord()
+    global_vars = {
+        "global_version": 1,
+        "global_parameters": full_parameters(1.0, (2, 2)),
+        "num_examples": 12,
+    }
+    msg = Message(
+        metadata=Mock(spec=Metadata),
+        content=interfaces.recordset.create_train_model_recordset(
+            full_parameters(2.0, (2, 2)),
+            1,
+            global_version=2,
+            base_version=1,
+            delta_reply=True,
+        ),
+    )
+
+    rsp = interface.train_model_if(msg, global_vars)
+
+    # The node trains on base + delta and keeps it as its new base
+    received = set_model_parameters_mock.call_args.args[0]
+    assert np.array_equal(array_to_ndarray(received["weight"]), np.full((2, 2), 3.0))
+    assert global_vars["global_version"] == 2
+    assert global_vars["global_parameters"] is received
+    # The reply is the update against the received model
+    reply = rsp.content.parameters_records["parameters"]
+    assert rsp.content.configs_records["config"]["base_version"] == 2
+    assert rsp.content.configs_records["config"]["num_examples"] == 12
+    assert np.array_equal(array_to_ndarray(reply["weight"]), np.full((2, 2), 1.0))
+
+
+@patch("fl_client.interface.stages.train_model")
+def test_train_model_if_missing_base(train_model_mock):
+    global_vars = {
+        "global_version": 0,
+        "global_parameters": full_parameters(1.0, (2, 2)),
+    }
+    msg = Message(
+        metadata=Mock(spec=Metadata),
+        content=interfaces.recordset.create_train_model_recordset(
+            full_parameters(2.0, (2, 2)),
+            1,
+            global_version=2,
+            base_version=1,
+            delta_reply=True,
+        ),
+    )
+
+    rsp = interface.train_model_if(msg, global_vars)
+
+    assert not train_model_mock.called
+    assert not rsp.content.configs_records["config"]["success"]
+    assert rsp.content.configs_records["config"]["missing_base"]
+
+
 @patch("fl_client.interface.stages.get_model_parameters")
 def test_get_parameters_if(get_model_parameters_mock):
     get_model_parameters_mock.return_value = Mock(ParametersRecord)
@@ -160,7 +227,7 @@ def test_get_parameters_if(get_model_parameters_mock):
     global_vars = dict()
     msg = Message(
         metadata=Mock(spec=Metadata),
-        content=RecordSet(),
+        content=interfaces.recordset.create_get_parameters_recordset(),
     )
 
     rsp = interface.get_parameters_if(msg, global_vars)
@@ -293,3 +360,54 @@ def test_filter_clients_if_error():
 
     with pytest.raises(TypeError):
         interface.filter_clients_if(msg, global_vars)
+
+
+def test_pipeline_if():
+    global_vars = {"use_case": "iris"}
+    steps = [
+        interfaces.recordset.create_filter_clients_recordset("iris"),
+        interfaces.recordset.create_prepare_data_recordset(),
+        interfaces.recordset.create_get_parameters_recordset(),
+    ]
+    msg = Message(
+        metadata=Mock(spec=Metadata),
+        content=interfaces.recordset.create_pipeline_recordset(steps),
+    )
+
+    def handler(step_msg, step_global_vars):
+        mode = step_msg.content.configs_records["config"]["mode"]
+        if mode == "filter_clients":
+            return interface.filter_clients_if(step_msg, step_global_vars)
+        if mode == "prepare_data":
+            raise ValueError("no data")
+        raise AssertionError("pipeline should have stopped")
+
+    rsp = interface.pipeline_if(msg, global_vars, handler)
+
+    config = rsp.content.configs_records["config"]
+    assert not config["success"]
+    assert config["steps"] == ["filter_clients", "prepare_data"]
+    assert config["step_success"] == [True, False]
+    steps = interfaces.recordset.read_pipeline_reply_recordset(rsp.content)
+    assert steps[0][2].configs_records["config"]["participate"]
+    assert steps[1][2].configs_records["config"]["message"] == "no data"
+
+
+def test_pipeline_if_not_participating():
+    global_vars = {"use_case": "other"}
+    steps = [
+        interfaces.recordset.create_filter_clients_recordset("iris"),
+        interfaces.recordset.create_prepare_data_recordset(),
+    ]
+    msg = Message(
+        metadata=Mock(spec=Metadata),
+        content=interfaces.recordset.create_pipeline_recordset(steps),
+    )
+    handler = Mock(
+        side_effect=lambda m, g: interface.filter_clients_if(m, g),
+    )
+
+    rsp = interface.pipeline_if(msg, global_vars, handler)
+
+    assert handler.call_count == 1
+    assert not rsp.content.configs_records["config"]["success"]
@@ -0,0 +1,30 @@
+from unittest.mock import Mock
+
+from mlflow.pyfunc import PyFuncModel
+
+from fl_client.model_cache import ModelCache, model_size
+
+from fl_models.iris.fl_model import FLModel
+
+
+def test_model_cache_evicts_least_recent():
+    cache = ModelCache(100)
+    models = [Mock(spec=PyFuncModel) for _ in range(3)]
+
+    cache.put(("a", 1), models[0], 40)
+    cache.put(("b", 1), models[1], 40)
+    cache.get(("a", 1))
+    cache.put(("c", 1), models[2], 40)
+    # A model over the budget is not kept
+    cache.put(("d", 1), models[2], 101)
+
+    assert cache.get(("b", 1)) is None
+    assert cache.get(("a", 1)) is models[0]
+    assert len(cache) == 2 and cache.size == 80
+
+
+def test_model_size():
+    model = Mock(spec=PyFuncModel)
+    model.unwrap_python_model.return_value = FLModel()
+
+    assert model_size(model) > 0
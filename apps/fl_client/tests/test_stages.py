@@ -4,12 +4,23 @@ from unittest.mock import Mock, patch
 import pandas as pd
 from mlflow.pyfunc import PyFuncModel
 from torch.utils.data import DataLoader
-from flwr.common import MetricsRecord
+import numpy as np
+from flwr.common import MetricsRecord, ParametersRecord
 
 from fl_client import stages
 from fl_client.config import DATA_PATH
+from fl_client.model_cache import ModelCache
 
 from fl_models.iris.fl_model import FLModel
+from interfaces.array_serde import (
+    INT8_STYPE,
+    PACKED_KEY,
+    SPARSE_STYPE,
+    array_to_ndarray,
+    decode_parameters,
+    ndarray_to_array,
+)
+from interfaces import mlflow_client
 from interfaces.pytorch import (
     pytorch_to_parameter_record,
 )
@@ -64,6 +75,7 @@ def test_prepare_data(global_vars_dict):
     local_learner = global_vars["local_learner"]
     stages.prepare_data(global_vars)
     assert isinstance(local_learner.dataloader, DataLoader)
+    assert global_vars["num_examples"] == len(global_vars["data"])
 
 
 def test_load_model(fl_model_wrapper):
@@ -71,9 +83,12 @@ def test_load_model(fl_model_wrapper):
     global_vars = {}
 
     # Load model from mlflow
-    with patch(
-        "fl_client.stages.mlflow_client.load_model",
-        return_value=fl_model_wrapper,
+    with (
+        patch(
+            "fl_client.stages.mlflow_client.load_model",
+            return_value=fl_model_wrapper,
+        ),
+        patch.object(stages, "model_cache", ModelCache(0)),
     ):
         stages.load_model(global_vars)
 
@@ -82,6 +97,33 @@ def test_load_model(fl_model_wrapper):
     assert global_vars["local_learner"] is not None
 
 
+def test_load_model_cached(fl_model_wrapper):
+    context = mlflow_client.MlflowContext()
+    context.model_name, context.model_version = "model_name", 1
+    cache = ModelCache(2**20)
+    global_vars = [{}, {}, {}]
+
+    with (
+        mlflow_client.use_context(context),
+        patch(
+            "fl_client.stages.mlflow_client.load_model",
+            return_value=fl_model_wrapper,
+        ) as mock_load_model,
+        patch.object(stages, "model_cache", cache),
+    ):
+        stages.load_model(global_vars[0])
+        stages.load_model(global_vars[1])
+        context.model_version = 2
+        stages.load_model(global_vars[2])
+
+    # A model loaded before is not fetched again, each task getting its own
+    # learner from it, while another version is
+    assert mock_load_model.call_count == 2
+    assert global_vars[1]["model"] is global_vars[0]["model"]
+    assert global_vars[1]["local_learner"] is not global_vars[0]["local_learner"]
+    assert ("model_name", 1) in cache and ("model_name", 2) in cache
+
+
 def test_upload_model(global_vars_dict):
     # Create the local learner
     global_vars = global_vars_dict
@@ -176,6 +218,58 @@ def test_get_model_parameters_success(global_vars_dict):
     assert parameters is not None
 
 
+def test_get_model_parameters_compressed(global_vars_dict):
+    global_vars = global_vars_dict
+    raw = stages.get_model_parameters(global_vars)
+    parameters = stages.get_model_parameters(global_vars, "zlib")
+
+    # Set parameters accepts the compressed arrays
+    stages.set_model_parameters(parameters, global_vars)
+
+    assert parameters.keys() == raw.keys()
+    for k, v in stages.get_model_parameters(global_vars).items():
+        assert np.array_equal(array_to_ndarray(v), array_to_ndarray(raw[k]))
+
+
+def test_set_model_parameters_in_place(global_vars_dict):
+    global_vars = global_vars_dict
+    local_learner = global_vars["local_learner"]
+    weight = local_learner.linear.weight
+    data_ptr = weight.data_ptr()
+    parameters = ParametersRecord(
+        {
+            k: ndarray_to_array(np.full(v.shape, 0.5, dtype=np.float32))
+            for k, v in local_learner.state_dict().items()
+        }
+    )
+
+    stages.set_model_parameters(parameters, global_vars)
+
+    # The received values are copied into the existing parameters
+    assert local_learner.linear.weight is weight
+    assert weight.data_ptr() == data_ptr
+    assert (weight == 0.5).all()
+
+
+def test_set_model_parameters_mismatch(global_vars_dict):
+    global_vars = global_vars_dict
+    local_learner = global_vars["local_learner"]
+    before = stages.get_model_parameters(global_vars)
+    parameters = ParametersRecord(
+        {
+            "linear.weight": ndarray_to_array(np.zeros((3, 4), dtype=np.float32)),
+            "linear.bias": ndarray_to_array(np.zeros(4, dtype=np.float32)),
+        }
+    )
+
+    with pytest.raises(ValueError):
+        stages.set_model_parameters(parameters, global_vars)
+
+    # Nothing is written when an array does not match
+    for k, v in local_learner.state_dict().items():
+        assert np.array_equal(v.numpy(), array_to_ndarray(before[k]))
+
+
 def test_get_model_parameters_error(global_vars_dict):
     global_vars = global_vars_dict
     with patch.object(
@@ -190,3 +284,62 @@ def test_get_model_parameters_error(global_vars_dict):
 def test_clean_current_config(mock_clean_current_config):
     stages.clean_current_config()
     mock_clean_current_config.assert_called_once()
+
+
+def test_encode_parameters_error_feedback():
+    ndarray = np.linspace(-1.0, 1.0, 100, dtype=np.float32)
+    parameters = ParametersRecord({"weight": ndarray_to_array(ndarray)})
+    global_vars = {}
+
+    sent = []
+    for _ in range(50):
+        encoded = stages.encode_parameters(parameters, "int8", True, global_vars)
+        sent.append(array_to_ndarray(encoded["weight"]))
+
+    # The error of each round is carried into the next one, so on average the
+    # encoded updates converge to the exact values
+    assert encoded["weight"].stype == INT8_STYPE
+    assert np.abs(np.mean(sent, axis=0) - ndarray).max() < 1e-3
+    assert np.abs(sent[0] - ndarray).max() > 1e-3
+
+
+def test_encode_parameters_topk():
+    ndarray = np.linspace(-1.0, 1.0, 100, dtype=np.float32)
+    parameters = ParametersRecord({"weight": ndarray_to_array(ndarray)})
+    global_vars = {}
+
+    sent = np.zeros_like(ndarray)
+    for _ in range(20):
+        encoded = stages.encode_parameters(parameters, None, False, global_vars, 0.1)
+        sent += array_to_ndarray(encoded["weight"])
+
+    # Only 10 entries go out each round, the others are carried over until they
+    # are large enough to be sent
+    assert encoded["weight"].stype == SPARSE_STYPE
+    assert len(encoded["weight"].data) == 10 * 8
+    assert np.allclose(sent + global_vars["residual"]["weight"], 20 * ndarray)
+    assert np.count_nonzero(sent) > 10
+
+
+def test_encode_parameters_packed():
+    ndarray = np.arange(6, dtype=np.float32)
+    parameters = ParametersRecord(
+        {"weight": ndarray_to_array(ndarray), "bias": ndarray_to_array(np.ones(2))}
+    )
+
+    encoded = stages.encode_parameters(
+        parameters, None, False, {}, compression="zlib", packed=True
+    )
+
+    assert list(encoded.keys()) == [PACKED_KEY]
+    decoded = decode_parameters(encoded)
+    assert list(decoded.keys()) == ["weight", "bias"]
+    assert np.array_equal(array_to_ndarray(decoded["weight"]), ndarray)
+
+
+def test_clear_global_parameters():
+    global_vars = {"global_version": 1, "global_parameters": None, "residual": {}}
+
+    stages.clear_global_parameters(global_vars)
+
+    assert global_vars == {}
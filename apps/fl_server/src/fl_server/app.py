@@ -1,116 +1,420 @@
-from flwr.common import Context, ParametersRecord
+import time
+from typing import Any
+
+from flwr.common import Context, MetricsRecord, ParametersRecord
 from flwr.server import Driver, ServerApp
+from pika.exceptions import AMQPError
 
 from fl_server import requires
 from fl_server import stages
 from fl_server import config
-from fl_server.utils import mlflow_utils
+from fl_server.checkpoints import (
+    CheckpointStore,
+    CheckpointWriter,
+    DirectoryStore,
+    MlflowStore,
+    tag_run,
+)
+from fl_server.control import ControlChannel, ControlledDriver, TaskCancelled
+from fl_server.nodes import NODE_CLAIMS, NodeClaims
+from fl_server.optimizers import ServerOptimizer
+from fl_server.rounds import (
+    AsyncPolicy,
+    AsyncReport,
+    RoundPolicy,
+    RoundState,
+    SamplingPolicy,
+)
+from fl_server.utils import driver_utils, mlflow_utils
 
 from interfaces import mlflow_client, rabbitmq_client
+from interfaces.artifact_cache import ArtifactCache
+from interfaces.array_serde import unpack_parameters
+from interfaces.delta import add_parameters, scale_parameters
 from schemas.task import Task
 
 
-def _mlflow_config(task: Task, driver: Driver, node_ids: list[int]) -> None:
+def _mlflow_config(task: Task) -> tuple[str, str]:
     experiment_id, parent_run_id, child_run_id = mlflow_utils.create_mlflow_runs(
         task.run_name, task.experiment_name
     )
     mlflow_client.set_current_config(
         experiment_id, parent_run_id, child_run_id, task.model_name, task.model_version
     )
-    requires.set_run_config(
-        driver,
-        node_ids,
-        experiment_id,
-        parent_run_id,
-        task.model_name,
-        task.model_version,
-    )
-
-
-def _model_and_data(task: Task, driver: Driver, node_ids: list[int]) -> None:
-    # Load model and data
-    stages.load_model(config.global_vars)
-    requires.load_data(driver, node_ids, task.use_case)
-    requires.load_model(driver, node_ids, task.model_name, task.model_version)
-    requires.prepare_data(driver, node_ids)
+    # The runs of a task are found by its ID when resuming it, or ending them after
+    # its worker died
+    tag_run(parent_run_id, task)
+    tag_run(child_run_id, task)
+    return experiment_id, parent_run_id
 
 
 def _training_loop(
     driver: Driver,
     node_ids: list[int],
-    parameters: ParametersRecord,
+    state: RoundState,
     n_global_iter: int,
+    policy: RoundPolicy,
+    optimizer: ServerOptimizer | None = None,
+    sampling: SamplingPolicy | None = None,
+    global_vars: dict[str, Any] | None = None,
+    control: ControlChannel | None = None,
+    checkpoints: CheckpointWriter | None = None,
 ) -> None:
-    for iter in range(n_global_iter):
-        results = requires.train_model(
-            driver, node_ids, parameters, current_global_iter=iter
-        )
-        aggregated_parameters = stages.aggregate_parameters(
-            [r[0] for r in results], config.global_vars
+    # Each task aggregates with its own global_vars
+    task_vars = config.global_vars if global_vars is None else global_vars
+
+    def accumulate(parameters: ParametersRecord, weight: float) -> None:
+        stages.accumulate_parameters(parameters, task_vars, weight)
+
+    pending_message_ids: list[str] = []
+    # Latency of the latest reply of each node, splitting the nodes into strata
+    latencies: dict[int, float] = {}
+    # Replies are folded into the aggregate as they arrive when the aggregator
+    # supports it, instead of being held until the round closes
+    streaming = stages.supports_streaming(task_vars)
+    # A resumed task carries on from the version of its checkpoint
+    for iter in range(state.version, n_global_iter):
+        if control is not None:
+            control.check()
+        if streaming:
+            stages.begin_round(task_vars)
+        round_node_ids, sampling_weights = node_ids, None
+        if sampling is not None:
+            # The plan is logged so that the round can be reproduced
+            plan = sampling.plan(node_ids, iter, latencies)
+            print(plan)
+            mlflow_client.log_dict(plan.to_dict(), f"round_plans/round_{iter}.json")
+            round_node_ids, sampling_weights = plan.node_ids, plan.weights
+        results, report = requires.train_model(
+            driver,
+            round_node_ids,
+            state,
+            current_global_iter=iter,
+            policy=policy,
+            stale_message_ids=pending_message_ids,
+            accumulate=accumulate if streaming else None,
+            sampling_weights=sampling_weights,
         )
+        print(report)
+        pending_message_ids = report.pending_message_ids
+        latencies.update(report.latencies)
+        if streaming:
+            aggregated_parameters = stages.finalize_parameters(task_vars)
+        else:
+            aggregated_parameters = stages.aggregate_parameters(
+                [r[0] for r in results], task_vars
+            )
+        if state.delta_transport:
+            # Nodes replied with updates against the current global model
+            aggregated_parameters = add_parameters(
+                state.parameters, aggregated_parameters
+            )
+        if optimizer is not None:
+            # The aggregated update is a pseudo-gradient the server steps along
+            aggregated_parameters = optimizer.step(
+                state.parameters, aggregated_parameters
+            )
         aggregated_metrics = stages.aggregate_metrics(
-            [r[1] for r in results], config.global_vars
+            [r[1] for r in results], task_vars
         )
-        mlflow_client.log_metrics(aggregated_metrics, step=iter)
-        requires.set_parameters(driver, node_ids, aggregated_parameters)
+        mlflow_client.log_metrics(
+            {**aggregated_metrics, **report.to_metrics()}, step=iter
+        )
+        # The next train message carries the aggregated parameters
+        state.update(aggregated_parameters)
+        if checkpoints is not None:
+            checkpoints.after_version(state, node_ids, optimizer)
 
 
-def get_serverapp(task: Task) -> ServerApp:
-    def server_main(driver: Driver, context: Context) -> None:
-        global global_vars
-        # Create rabbit client for updates
-        rabbitmq = rabbitmq_client.setup_rabbitmq(
-            config.RABBIT_USERNAME,
-            config.RABBIT_PASSWORD,
-            config.RABBIT_HOST,
-            int(config.RABBIT_PORT),
-            1000,
-            "status",
-            True,
+def _async_training_loop(
+    driver: Driver,
+    node_ids: list[int],
+    state: RoundState,
+    n_versions: int,
+    policy: AsyncPolicy,
+    optimizer: ServerOptimizer | None = None,
+    global_vars: dict[str, Any] | None = None,
+    control: ControlChannel | None = None,
+    checkpoints: CheckpointWriter | None = None,
+) -> None:
+    task_vars = config.global_vars if global_vars is None else global_vars
+
+    # Updates are buffered in the aggregator, weighted by their staleness
+    def accumulate(update: ParametersRecord, weight: float) -> None:
+        stages.accumulate_parameters(update, task_vars, weight)
+
+    def publish(
+        metrics: list[MetricsRecord], discount: float, report: AsyncReport
+    ) -> None:
+        print(report)
+        if control is not None:
+            control.check()
+        update = stages.finalize_parameters(task_vars)
+        stages.begin_round(task_vars)
+        # Stale updates count for less than fresh ones in the step taken
+        aggregated_parameters = add_parameters(
+            state.parameters, scale_parameters(update, discount)
         )
+        if optimizer is not None:
+            aggregated_parameters = optimizer.step(
+                state.parameters, aggregated_parameters
+            )
+        aggregated_metrics = stages.aggregate_metrics(metrics, task_vars)
+        mlflow_client.log_metrics(
+            {**aggregated_metrics, **report.to_metrics()}, step=state.version
+        )
+        state.update(aggregated_parameters)
+        if checkpoints is not None:
+            checkpoints.after_version(state, node_ids, optimizer)
 
-        rabbitmq.publish_message(f"Task {task.id} running")
+    stages.begin_round(task_vars)
+    # A resumed task publishes the versions left
+    pending_message_ids = requires.train_async(
+        driver,
+        node_ids,
+        state,
+        n_versions - state.version,
+        policy,
+        accumulate,
+        publish,
+    )
+    # Updates of the nodes still training come too late for the last version
+    driver_utils.discard_messages(driver, pending_message_ids)
+
+
+def _checkpoint_store(parent_run_id: str) -> CheckpointStore:
+    if config.CHECKPOINT_DIR:
+        return DirectoryStore(config.CHECKPOINT_DIR)
+    return MlflowStore(parent_run_id)
+
+
+def create_artifact_cache() -> ArtifactCache | None:
+    if config.ARTIFACT_CACHE_DIR is None:
+        return None
+    return ArtifactCache(config.ARTIFACT_CACHE_DIR, config.ARTIFACT_CACHE_MB * 2**20)
 
-        # Get node IDs
-        node_ids = driver.get_node_ids()
 
-        # Filter clients
-        print("Filter clients")
-        filtered_node_ids = requires.filter_clients(driver, node_ids, task.use_case)
+def create_status_client() -> rabbitmq_client.RabbitMQClient:
+    return rabbitmq_client.setup_rabbitmq(
+        config.RABBIT_USERNAME,
+        config.RABBIT_PASSWORD,
+        config.RABBIT_HOST,
+        int(config.RABBIT_PORT),
+        1000,
+        "status",
+        True,
+    )
+
+
+def open_status_client(
+    status_client: rabbitmq_client.RabbitMQClient | None = None,
+) -> rabbitmq_client.RabbitMQClient:
+    # A connection left idle between tasks is closed by the broker once it misses
+    # its heartbeats, which only shows when it is used
+    if status_client is not None and status_client.is_open:
+        try:
+            status_client.probe()
+            return status_client
+        except AMQPError:
+            print("Status connection lost, reconnecting")
+    return create_status_client()
 
-        # Mlflow config
-        print("Broadcast mlflow run details")
-        _mlflow_config(task, driver, filtered_node_ids)
 
-        # Load model and data
-        print("Load model and data")
-        _model_and_data(task, driver, filtered_node_ids)
+def _free_node_ids(
+    driver: Driver, control: ControlChannel, claims: NodeClaims
+) -> list[int]:
+    # Nodes not claimed by other tasks, waiting while every connected node is
+    while True:
+        node_ids = driver.get_node_ids()
+        free_node_ids = claims.free(node_ids)
+        if free_node_ids or not node_ids:
+            return free_node_ids
+        control.check()
+        time.sleep(config.POLL_MAX_INTERVAL)
+
 
-        # Get parameters from random node
-        print("Get parameters")
-        parameters = requires.get_parameters_from_one_node(driver, filtered_node_ids)
+def get_serverapp(
+    task: Task,
+    status_client: rabbitmq_client.RabbitMQClient | None = None,
+    node_claims: NodeClaims | None = None,
+) -> ServerApp:
+    claims = NODE_CLAIMS if node_claims is None else node_claims
 
-        # Broadcast parameters
-        print("Broadcast parameters")
-        requires.set_parameters(driver, filtered_node_ids, parameters)
+    def run(driver: Driver) -> None:
+        # Create rabbit client for updates, unless the worker keeps one open
+        rabbitmq = open_status_client(status_client)
 
-        # Training loop
-        print("Training loop")
-        _training_loop(
-            driver, filtered_node_ids, parameters, task.num_global_iterations
+        # Cancellations posted by the REST API stop the task between rounds or
+        # while it waits for the nodes
+        control = ControlChannel(
+            rabbitmq.for_topic(rabbitmq_client.control_topic(task.id), True),
+            config.CONTROL_POLL_INTERVAL,
         )
+        # A task cancelled while pending is not started
+        try:
+            control.check()
+        except TaskCancelled:
+            print(f"Task {task.id} cancelled")
+            control.close()
+            rabbitmq.publish_message(f"Task {task.id} cancelled")
+            return
 
-        # Upload model
-        print("Upload model")
-        requires.upload_model(driver, filtered_node_ids, parameters)
+        rabbitmq.publish_message(f"Task {task.id} running")
+
+        controlled = ControlledDriver(driver, control)
+        # Nodes whose run config is to be cleaned when the task ends
+        configured_node_ids: list[int] = []
+        store: CheckpointStore | None = None
+        checkpoints: CheckpointWriter | None = None
+        cancelled = False
+        try:
+            # Mlflow config
+            print("Create mlflow runs")
+            experiment_id, parent_run_id = _mlflow_config(task)
+
+            # Load model, into state of its own as other tasks may be running
+            print("Load model")
+            task_vars = config.new_global_vars()
+            stages.load_model(task_vars)
+            if task.robust_aggregation is not None:
+                stages.set_robust_aggregation(
+                    task_vars, task.robust_aggregation, task.trim_fraction
+                )
+            # Stale updates and the replies of sampled strata are weighted as they
+            # are folded into the aggregate, which aggregators taking every reply
+            # at once cannot do
+            async_policy = AsyncPolicy.from_task(task)
+            sampling = SamplingPolicy.from_task(task)
+            if not stages.supports_streaming(task_vars):
+                if async_policy is not None:
+                    raise ValueError(
+                        "Asynchronous training needs an aggregator accumulating "
+                        "weighted updates, and cannot be combined with robust "
+                        "aggregation"
+                    )
+                if sampling is not None and sampling.strata > 1:
+                    raise ValueError(
+                        "Stratified sampling needs an aggregator accumulating "
+                        "weighted replies, and cannot be combined with robust "
+                        "aggregation"
+                    )
+
+            # Latest checkpoint of the task, when it was interrupted
+            checkpoint = None
+            if task.checkpoint_every is not None:
+                store = _checkpoint_store(parent_run_id)
+                checkpoint = store.load(task)
+                checkpoints = CheckpointWriter(store, task, task.checkpoint_every)
+
+            # Filter clients, broadcast run details, load model and data on the
+            # clients and get the initial parameters in a single round-trip
+            print("Set up clients")
+            with claims.lock:
+                node_ids = _free_node_ids(driver, control, claims)
+                # Cancelled while setting up, any of the nodes may have been
+                # configured
+                claims.claim(task.id, node_ids)
+                configured_node_ids = node_ids
+                filtered_node_ids, parameters = requires.setup_clients(
+                    controlled, node_ids, task, experiment_id, parent_run_id
+                )
+                configured_node_ids = filtered_node_ids
+                claims.release(task.id, keep=filtered_node_ids)
+            train_node_ids = filtered_node_ids
+            optimizer = ServerOptimizer.from_task(task)
+            version = 0
+            if checkpoint is not None:
+                # The checkpoint's parameters are broadcast in full to the nodes of
+                # the interrupted run still connected, or to all nodes if none is
+                print(f"Resume from version {checkpoint.version}")
+                parameters, version = checkpoint.parameters, checkpoint.version
+                train_node_ids = [
+                    i for i in checkpoint.node_ids if i in filtered_node_ids
+                ] or filtered_node_ids
+                if optimizer is not None:
+                    optimizer.set_state(checkpoint.optimizer)
+
+            # Training loop
+            print("Training loop")
+            state = RoundState(
+                parameters,
+                version=version,
+                delta_transport=task.delta_transport,
+                codec=task.update_codec,
+                error_feedback=task.error_feedback,
+                topk=task.update_topk,
+                compression=task.compression,
+                packed=task.packed_parameters,
+            )
+            if async_policy is not None:
+                _async_training_loop(
+                    controlled,
+                    train_node_ids,
+                    state,
+                    task.num_global_iterations,
+                    async_policy,
+                    optimizer,
+                    task_vars,
+                    control,
+                    checkpoints,
+                )
+            else:
+                _training_loop(
+                    controlled,
+                    train_node_ids,
+                    state,
+                    task.num_global_iterations,
+                    RoundPolicy.from_task(task),
+                    optimizer,
+                    sampling,
+                    task_vars,
+                    control,
+                    checkpoints,
+                )
+
+            # Upload model
+            print("Upload model")
+            requires.upload_model(
+                controlled, filtered_node_ids, unpack_parameters(state.parameters)
+            )
+        except TaskCancelled:
+            cancelled = True
+        except Exception:
+            # A failed task ends its runs, so that it is not resumed
+            if mlflow_client.current_context().configured:
+                mlflow_client.clean_current_config("FAILED")
+            raise
+        finally:
+            control.close()
+            if checkpoints is not None:
+                checkpoints.close()
+            # Only a task interrupted with the server keeps its checkpoints
+            if store is not None:
+                store.clear(task)
+
+        if cancelled:
+            print(f"Task {task.id} cancelled")
+            if mlflow_client.current_context().configured:
+                mlflow_client.clean_current_config("KILLED")
+            if configured_node_ids:
+                requires.clean_config(driver, configured_node_ids)
+            rabbitmq.publish_message(f"Task {task.id} cancelled")
+            return
 
         # Clean run details
         print("Clean run details")
         mlflow_client.clean_current_config()
-        requires.clean_config(driver, filtered_node_ids)
+        requires.clean_config(driver, configured_node_ids)
 
         rabbitmq.publish_message(f"Task {task.id} success")
 
+    def server_main(driver: Driver, context: Context) -> None:
+        # The nodes of the task are released however it ends, once cleaned
+        try:
+            run(driver)
+        finally:
+            claims.release(task.id)
+
     app = ServerApp()
     app._main = server_main
     return app
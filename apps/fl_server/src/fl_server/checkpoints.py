@@ -0,0 +1,257 @@
+import os
+import shutil
+import struct
+import threading
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+
+from flwr.common import Array, ConfigsRecord, ParametersRecord, RecordSet
+from flwr.common.serde import recordset_from_proto, recordset_to_proto
+from flwr.proto.recordset_pb2 import RecordSet as ProtoRecordSet
+
+from fl_server.optimizers import ServerOptimizer
+from fl_server.rounds import RoundState
+
+from interfaces import mlflow_client
+from schemas.task import Task
+
+OPTIMIZER_PREFIX = "optimizer."
+# Tag of the parent runs of the tasks taking checkpoints, holding the task id
+TASK_TAG = "fl_task_id"
+# Length of the header, ahead of it
+HEADER_SIZE = struct.Struct("<Q")
+
+
+@dataclass
+class Checkpoint:
+    task: Task
+    # Global version, the rounds completed in synchronous training
+    version: int
+    parameters: ParametersRecord
+    # Nodes training when the checkpoint was taken
+    node_ids: list[int]
+    optimizer: dict[str, ParametersRecord] = field(default_factory=dict)
+
+    def to_bytes(self) -> bytes:
+        # The length of a header, the header holding a Flower record set of the
+        # arrays without their data, then the data of the arrays by record name:
+        # serialising the data with protobuf holds the GIL for seconds on large
+        # models, stalling the training loop of the task
+        records = {"parameters": self.parameters}
+        for name, record in self.optimizer.items():
+            records[OPTIMIZER_PREFIX + name] = record
+        chunks = [a.data for name in sorted(records) for a in records[name].values()]
+        header = RecordSet(
+            parameters_records={
+                name: ParametersRecord(
+                    OrderedDict(
+                        (k, Array(a.dtype, a.shape, a.stype, b""))
+                        for k, a in record.items()
+                    )
+                )
+                for name, record in records.items()
+            },
+            configs_records={
+                "checkpoint": ConfigsRecord(
+                    {
+                        "task": self.task.model_dump_json(),
+                        "version": self.version,
+                        "node_ids": self.node_ids,
+                        "sizes": [len(chunk) for chunk in chunks],
+                    }
+                )
+            },
+        )
+        data: bytes = recordset_to_proto(header).SerializeToString()
+        return b"".join([HEADER_SIZE.pack(len(data)), data, *chunks])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Checkpoint":
+        (size,) = HEADER_SIZE.unpack_from(data)
+        offset = HEADER_SIZE.size + size
+        header = recordset_from_proto(
+            ProtoRecordSet.FromString(data[HEADER_SIZE.size : offset])
+        )
+        meta = header.configs_records["checkpoint"]
+        version, node_ids, sizes = meta["version"], meta["node_ids"], meta["sizes"]
+        if not isinstance(version, int) or not isinstance(node_ids, list):
+            raise ValueError("Checkpoint without its version and nodes")
+        if not isinstance(sizes, list):
+            raise ValueError("Checkpoint without the sizes of its arrays")
+        remaining = iter(cast(list[int], sizes))
+        records = {}
+        for name in sorted(header.parameters_records):
+            arrays = OrderedDict()
+            for key, array in header.parameters_records[name].items():
+                end = offset + next(remaining)
+                chunk = data[offset:end]
+                arrays[key] = Array(array.dtype, array.shape, array.stype, chunk)
+                offset = end
+            records[name] = ParametersRecord(arrays)
+        optimizer = {
+            name.removeprefix(OPTIMIZER_PREFIX): record
+            for name, record in records.items()
+            if name.startswith(OPTIMIZER_PREFIX)
+        }
+        return cls(
+            Task.model_validate_json(str(meta["task"])),
+            version,
+            records["parameters"],
+            [int(node_id) for node_id in node_ids],
+            optimizer,
+        )
+
+
+def _running_filter(task: Task) -> str:
+    return f"tags.{TASK_TAG} = '{task.id}' and attributes.status = 'RUNNING'"
+
+
+def tag_run(run_id: str, task: Task) -> None:
+    mlflow_client.set_run_tag(run_id, TASK_TAG, str(task.id))
+
+
+def is_running(task: Task) -> bool:
+    # A run of the task left running, as when the server died. Runs of tasks that
+    # failed or were cancelled have ended
+    return bool(mlflow_client.find_runs(task.experiment_name, _running_filter(task)))
+
+
+def end_runs(task: Task, status: str) -> None:
+    # Ends the runs of a task that could not end them itself
+    for run_id in mlflow_client.find_runs(task.experiment_name, _running_filter(task)):
+        mlflow_client.set_run_status(run_id, status)
+
+
+class DirectoryStore:
+    # The latest checkpoint of each task in a directory of its own, written to a
+    # temporary file first so that a crash while writing leaves the previous one
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+
+    def _directory(self, task: Task) -> Path:
+        return self.root / f"task_{task.id}"
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        directory = self._directory(checkpoint.task)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"version_{checkpoint.version:06d}.ckpt"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_bytes(checkpoint.to_bytes())
+        os.replace(temporary, path)
+        for previous in directory.glob("version_*.ckpt"):
+            if previous != path:
+                previous.unlink()
+
+    def load(self, task: Task) -> Checkpoint | None:
+        paths = sorted(self._directory(task).glob("version_*.ckpt"))
+        if not paths:
+            return None
+        return Checkpoint.from_bytes(paths[-1].read_bytes())
+
+    def clear(self, task: Task) -> None:
+        shutil.rmtree(self._directory(task), ignore_errors=True)
+
+    def pending(self) -> list[Task]:
+        # Tasks left with a checkpoint, interrupted before they completed
+        tasks = []
+        for directory in sorted(self.root.glob("task_*")):
+            paths = sorted(directory.glob("version_*.ckpt"))
+            if paths:
+                tasks.append(Checkpoint.from_bytes(paths[-1].read_bytes()).task)
+        return tasks
+
+
+class MlflowStore:
+    # The latest checkpoint logged as an artifact of the task's parent run, over
+    # the previous one. A task resumes from its latest run left running, that run
+    # then ending as killed since the new one carries on from it
+    PATH = "checkpoints/latest.ckpt"
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        mlflow_client.log_artifact_bytes(self.run_id, checkpoint.to_bytes(), self.PATH)
+
+    def load(self, task: Task) -> Checkpoint | None:
+        run_ids = mlflow_client.find_runs(task.experiment_name, _running_filter(task))
+        for run_id in run_ids:
+            if run_id == self.run_id:
+                continue
+            paths = mlflow_client.list_artifacts(run_id, os.path.dirname(self.PATH))
+            if self.PATH in paths:
+                data = mlflow_client.load_artifact_bytes(run_id, self.PATH)
+                mlflow_client.set_run_status(run_id, "KILLED")
+                return Checkpoint.from_bytes(data)
+        return None
+
+    def clear(self, task: Task) -> None:
+        # The parent run ends with the task, and is not resumed from
+        pass
+
+
+CheckpointStore = DirectoryStore | MlflowStore
+
+
+class CheckpointWriter:
+    # Saves a checkpoint of the task every `every` versions on a background thread.
+    # A checkpoint still waiting when the next one is taken is replaced by it, so
+    # the training loop never waits for the store
+    def __init__(self, store: CheckpointStore, task: Task, every: int) -> None:
+        if every < 1:
+            raise ValueError(f"Checkpoints need a positive interval, got {every}")
+        self.store = store
+        self.task = task
+        self.every = every
+        self._pending: Checkpoint | None = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._write, name=f"checkpoint-{task.id}", daemon=True
+        )
+        self._thread.start()
+
+    def after_version(
+        self,
+        state: RoundState,
+        node_ids: list[int],
+        optimizer: ServerOptimizer | None = None,
+    ) -> None:
+        if state.version % self.every:
+            return
+        checkpoint = Checkpoint(
+            self.task,
+            state.version,
+            state.parameters,
+            list(node_ids),
+            {} if optimizer is None else optimizer.get_state(),
+        )
+        with self._condition:
+            self._pending = checkpoint
+            self._condition.notify()
+
+    def _write(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._pending is not None or self._closed
+                )
+                checkpoint, self._pending = self._pending, None
+            if checkpoint is None:
+                return
+            try:
+                self.store.save(checkpoint)
+            except Exception:
+                # Training carries on, resuming from an older checkpoint if any
+                print(f"Checkpoint {checkpoint.version} of task {self.task.id} failed")
+                traceback.print_exc()
+
+    def close(self) -> None:
+        # Waits for the checkpoint still pending to be saved
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
@@ -7,10 +7,59 @@ RABBIT_PASSWORD = os.getenv("RABBIT_PASSWORD")
 RABBIT_HOST = os.getenv("RABBIT_HOST")
 RABBIT_PORT = os.getenv("RABBIT_PORT", "5672")
 
+# Reply collection
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", "0.01"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "3"))
+
+# Threads the aggregator splits large arrays over, 1 aggregating in the caller
+AGGREGATION_WORKERS = int(os.getenv("AGGREGATION_WORKERS", "1"))
+
+
+def _parse_stage_timeouts(raw: str) -> dict[str, float]:
+    # Format: "<msg_group>=<seconds>,<msg_group>=<seconds>"
+    timeouts = {}
+    for item in raw.split(","):
+        if item.strip():
+            stage, seconds = item.split("=")
+            timeouts[stage.strip()] = float(seconds)
+    return timeouts
+
+
+_stage_timeout = os.getenv("STAGE_TIMEOUT")
+STAGE_TIMEOUT = float(_stage_timeout) if _stage_timeout else None
+STAGE_TIMEOUTS = _parse_stage_timeouts(os.getenv("STAGE_TIMEOUTS", ""))
+
+# Seconds between reads of a task's control queue for its cancellation
+CONTROL_POLL_INTERVAL = float(os.getenv("CONTROL_POLL_INTERVAL", "5"))
+
+# Directory the task checkpoints are written to, resumed from when the server
+# starts, logged as MLflow artifacts of the parent run when unset
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR")
+
+# Directory the model artifacts are cached in, shared with the other processes
+# of the host, each loading the models from the registry when unset
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR")
+ARTIFACT_CACHE_MB = int(os.getenv("ARTIFACT_CACHE_MB", "2048"))
+
+# Tasks running at once in the server, 1 running each task in the consumer thread
+MAX_CONCURRENT_TASKS = int(os.getenv("MAX_CONCURRENT_TASKS", "1"))
+
+# Pre-warmed worker processes running the tasks instead, 0 for none, each replaced
+# after WORKER_MAX_TASKS tasks
+WARM_WORKERS = int(os.getenv("WARM_WORKERS", "0"))
+WORKER_MAX_TASKS = int(os.getenv("WORKER_MAX_TASKS", "20"))
+WORKER_CONNECT_TIMEOUT = float(os.getenv("WORKER_CONNECT_TIMEOUT", "10"))
+
+
+def new_global_vars() -> dict:
+    # State of one task, each task running with its own
+    return {
+        "aggregator": None,
+        "model": None,
+        "model_meta": None,
+        "use_case": None,
+    }
+
+
 global global_vars
-global_vars = {
-    "aggregator": None,
-    "model": None,
-    "model_meta": None,
-    "use_case": None,
-}
+global_vars = new_global_vars()
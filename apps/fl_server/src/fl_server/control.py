@@ -0,0 +1,71 @@
+import time
+from typing import Iterable, Optional
+
+from flwr.common import Message, RecordSet
+from flwr.server import Driver
+
+from interfaces.rabbitmq_client import RabbitMQClient
+
+CANCEL = "cancel"
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class ControlChannel:
+    # Queue of the task the REST API posts its cancellation to, read at most every
+    # interval seconds to keep the round trips to RabbitMQ off the polling loops
+    def __init__(self, client: RabbitMQClient, interval: float) -> None:
+        self.client = client
+        self.interval = interval
+        self.cancelled = False
+        self._checked_at = float("-inf")
+
+    def check(self) -> None:
+        now = time.monotonic()
+        if not self.cancelled and now - self._checked_at >= self.interval:
+            self._checked_at = now
+            self.cancelled = self.client.listen(None, blocking=False) == CANCEL
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def close(self) -> None:
+        self.client.delete()
+
+
+class ControlledDriver(Driver):
+    # Checks the control channel whenever replies are pulled, so that a task stops
+    # while it waits for the nodes as well as between rounds
+    def __init__(self, driver: Driver, control: ControlChannel) -> None:
+        self.driver = driver
+        self.control = control
+
+    def create_message(
+        self,
+        content: RecordSet,
+        message_type: str,
+        dst_node_id: int,
+        group_id: str,
+        ttl: Optional[float] = None,
+    ) -> Message:
+        return self.driver.create_message(
+            content, message_type, dst_node_id, group_id, ttl
+        )
+
+    def get_node_ids(self) -> list[int]:
+        node_ids: list[int] = self.driver.get_node_ids()
+        return node_ids
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        return self.driver.push_messages(messages)
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        self.control.check()
+        return self.driver.pull_messages(message_ids)
+
+    def send_and_receive(
+        self, messages: Iterable[Message], *, timeout: Optional[float] = None
+    ) -> Iterable[Message]:
+        self.control.check()
+        return self.driver.send_and_receive(messages, timeout=timeout)
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from typing import Any, Callable
+
+import numpy as np
+from flwr.client import ClientApp
+from flwr.common import (
+    DEFAULT_TTL,
+    ConfigsRecord,
+    Context,
+    Message,
+    MetricsRecord,
+    ParametersRecord,
+    RecordSet,
+)
+from flwr.server import Driver
+
+from fl_server import config
+from fl_server.utils import driver_utils, requires_utils
+
+import interfaces.recordset
+from interfaces.array_serde import (
+    array_to_ndarray,
+    compress_parameters,
+    decode_parameters,
+    ndarray_to_array,
+    pack_parameters,
+)
+
+# An intermediate aggregator is a node of the root server standing for its own
+# leaves: each message of the root is relayed to the leaves through the driver of
+# their superlink, and answered with their combined replies, the train replies as
+# one update weighted by the number of examples of the leaves
+
+
+def _failure(msg: Message, message: str) -> Message:
+    configsrecord = ConfigsRecord({"success": False, "message": message})
+    rs = RecordSet(configs_records={"config": configsrecord})
+    return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
+
+
+def _succeeded(msg: Message) -> bool:
+    if msg.has_error():
+        return False
+    return bool(msg.content.configs_records["config"].get("success", False))
+
+
+def _forward(
+    driver: Driver,
+    leaf_ids: list[int],
+    msg: Message,
+    on_reply: Callable[[Message], None] | None = None,
+) -> list[Message]:
+    group = msg.metadata.group_id
+    messages = driver_utils.create_messages(
+        driver, msg.content, msg.metadata.message_type, leaf_ids, group, DEFAULT_TTL
+    )
+    message_ids = driver_utils.send_messages(driver, messages)
+    return driver_utils.wait_messages(
+        driver,
+        message_ids,
+        timeout=config.STAGE_TIMEOUTS.get(group, config.STAGE_TIMEOUT),
+        on_reply=on_reply,
+        poll_interval=config.POLL_INTERVAL,
+        max_poll_interval=config.POLL_MAX_INTERVAL,
+    )
+
+
+def relay_query(msg: Message, driver: Driver, relay_vars: dict[str, Any]) -> Message:
+    # The leaves that do not participate or fail the setup are left out of the
+    # next messages, as the root does with its nodes
+    mode = msg.content.configs_records["config"]["mode"]
+    if not isinstance(mode, str):
+        raise TypeError(f"mode must be a string, received {type(mode)}")
+    if mode in ("filter_clients", "pipeline"):
+        relay_vars["leaf_ids"] = list(driver.get_node_ids())
+    leaf_ids = relay_vars["leaf_ids"] or []
+    if not leaf_ids:
+        return _failure(msg, "No leaves to relay to")
+    replies = _forward(driver, leaf_ids, msg)
+
+    if mode == "filter_clients":
+        participating = [
+            r
+            for r in replies
+            if not r.has_error() and r.content.configs_records["config"]["participate"]
+        ]
+        relay_vars["leaf_ids"] = [r.metadata.src_node_id for r in participating]
+        rs = RecordSet(
+            configs_records={
+                "config": ConfigsRecord({"participate": bool(participating)})
+            }
+        )
+        return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
+
+    succeeded = [r for r in replies if _succeeded(r)]
+    if mode == "pipeline":
+        relay_vars["leaf_ids"] = [r.metadata.src_node_id for r in succeeded]
+        if succeeded:
+            return msg.create_reply(content=succeeded[0].content, ttl=DEFAULT_TTL)
+    elif len(succeeded) == len(leaf_ids):
+        return msg.create_reply(content=succeeded[0].content, ttl=DEFAULT_TTL)
+    failed = [r for r in replies if not _succeeded(r) and not r.has_error()]
+    if failed:
+        return msg.create_reply(content=failed[0].content, ttl=DEFAULT_TTL)
+    return _failure(msg, f"{len(leaf_ids) - len(succeeded)} leaves failed {mode}")
+
+
+def relay_train(msg: Message, driver: Driver, relay_vars: dict[str, Any]) -> Message:
+    leaf_ids = relay_vars["leaf_ids"] or []
+    if not leaf_ids:
+        return _failure(msg, "No leaves to relay to")
+    train_config = msg.content.configs_records["config"]
+
+    # Weighted float64 sums of the parameters and metrics, folded in as the replies
+    # arrive
+    sums: OrderedDict[str, np.ndarray] = OrderedDict()
+    dtypes: dict[str, np.dtype] = {}
+    metrics: dict[str, float] = {}
+    base_versions: set[Any] = set()
+    total = 0.0
+    folded = 0
+
+    def on_reply(reply: Message) -> None:
+        nonlocal total, folded
+        if not _succeeded(reply):
+            return
+        weight = requires_utils.reply_weight(reply)
+        content = reply.content
+        parameters = decode_parameters(content.parameters_records["parameters"])
+        for k, v in parameters.items():
+            ndarray = array_to_ndarray(v)
+            if k not in sums:
+                sums[k] = np.zeros(ndarray.shape, dtype=np.float64)
+                dtypes[k] = ndarray.dtype
+            sums[k] += weight * ndarray
+        for k, value in content.metrics_records["metrics"].items():
+            if isinstance(value, (int, float)):
+                metrics[k] = metrics.get(k, 0.0) + weight * value
+        reply_config = content.configs_records["config"]
+        base_versions.add(
+            reply_config["base_version"] if "base_version" in reply_config else None
+        )
+        total += weight
+        folded += 1
+        del content.parameters_records["parameters"]
+
+    replies = _forward(driver, leaf_ids, msg, on_reply)
+    # Leaves that lost their base version get the full model once the root resends
+    # it to this node
+    missing_base = [r for r in replies if requires_utils.is_missing_base(r)]
+    if missing_base:
+        return msg.create_reply(content=missing_base[0].content, ttl=DEFAULT_TTL)
+    if not total:
+        return _failure(msg, "No successful replies from the leaves")
+    if len(base_versions) > 1:
+        return _failure(msg, "Leaves replied against different base versions")
+
+    averaged = OrderedDict()
+    for k, summed in sums.items():
+        summed /= total
+        # Integer buffers such as batch counters are rounded back
+        if not np.issubdtype(dtypes[k], np.inexact):
+            np.rint(summed, out=summed)
+        averaged[k] = ndarray_to_array(summed.astype(dtypes[k]))
+    parameters = ParametersRecord(averaged)
+    if train_config.get("packed", False):
+        parameters = pack_parameters(parameters)
+    compression = interfaces.recordset.read_compression(msg.content)
+    parameters = compress_parameters(parameters, compression)
+
+    configsrecord = ConfigsRecord(
+        {
+            "success": True,
+            "message": f"aggregated {folded} leaves",
+            "num_examples": int(total),
+        }
+    )
+    base_version = base_versions.pop()
+    if base_version is not None:
+        configsrecord["base_version"] = base_version
+    rs = RecordSet(
+        parameters_records={"parameters": parameters},
+        metrics_records={
+            "metrics": MetricsRecord({k: v / total for k, v in metrics.items()})
+        },
+        configs_records={"config": configsrecord},
+    )
+    return msg.create_reply(content=rs, ttl=DEFAULT_TTL)
+
+
+def get_intermediate_app(driver: Driver) -> ClientApp:
+    relay_vars: dict[str, Any] = {"leaf_ids": None}
+    app = ClientApp()
+
+    @app.query()
+    def query(msg: Message, ctx: Context) -> Message:
+        return relay_query(msg, driver, relay_vars)
+
+    @app.train()
+    def train(msg: Message, ctx: Context) -> Message:
+        return relay_train(msg, driver, relay_vars)
+
+    return app
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import argparse
+
+    from flwr.client.app import _start_client_internal
+    from flwr.server.driver import GrpcDriver
+
+    parser = argparse.ArgumentParser(description="Start an intermediate aggregator")
+    parser.add_argument(
+        "--superlink", type=str, default="0.0.0.0:9091", help="Leaves' superlink URL"
+    )
+    parser.add_argument(
+        "--root", type=str, default="0.0.0.0:9092", help="Root superlink fleet URL"
+    )
+    args = parser.parse_args()
+
+    leaves_driver = GrpcDriver(driver_service_address=args.superlink)
+    intermediate_app = get_intermediate_app(leaves_driver)
+    _start_client_internal(
+        server_address=args.root,
+        load_client_app_fn=lambda: intermediate_app,
+        insecure=True,
+    )
@@ -1,9 +1,15 @@
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from pika import spec
 from pika.channel import Channel
 
 from fl_server import config
-from fl_server.app import get_serverapp
+from fl_server.app import create_artifact_cache, get_serverapp
+from fl_server.checkpoints import DirectoryStore, is_running
 from fl_server.utils.app_utils import run_server_app
+from fl_server.workers import WorkerPool
 
 from interfaces import rabbitmq_client, mlflow_client
 from schemas.task import Task
@@ -12,7 +18,11 @@ SUPERLINK_URL = ""
 
 
 def configure() -> rabbitmq_client.RabbitMQClient:
-    mlflow_client.setup_mlflow(config.MLFLOW_URL, is_central_node=True)
+    mlflow_client.setup_mlflow(
+        config.MLFLOW_URL,
+        is_central_node=True,
+        artifact_cache=create_artifact_cache(),
+    )
     rabbitmq = rabbitmq_client.setup_rabbitmq(
         config.RABBIT_USERNAME,
         config.RABBIT_PASSWORD,
@@ -25,15 +35,80 @@ def configure() -> rabbitmq_client.RabbitMQClient:
     return rabbitmq
 
 
+def run_task(task: Task) -> None:
+    # Each task runs with its own MLflow context and driver session
+    with mlflow_client.use_context(mlflow_client.MlflowContext()):
+        app = get_serverapp(task)
+        run_server_app(app, SUPERLINK_URL)
+
+
+class TaskPool:
+    # Runs up to max_tasks tasks at once, submit blocking the consumer while all
+    # of them are busy. Dispatch messages are acknowledged when delivered, so the
+    # tasks the broker already pushed to this server wait for a free slot here
+    # rather than going to other servers
+    def __init__(self, max_tasks: int) -> None:
+        self._executor = ThreadPoolExecutor(max_tasks, thread_name_prefix="task")
+        self._slots = threading.BoundedSemaphore(max_tasks)
+
+    def submit(self, task: Task) -> Future:
+        self._slots.acquire()
+        future = self._executor.submit(run_task, task)
+        future.add_done_callback(lambda f: self._done(task, f))
+        return future
+
+    def _done(self, task: Task, future: Future) -> None:
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            print(f"Task {task.id} failed:")
+            traceback.print_exception(error)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_task_pool: TaskPool | None = None
+# Started with the server when WARM_WORKERS is set, to warm up before any task
+_worker_pool: WorkerPool | None = None
+
+
 def event_handler(
     channel: Channel,
     method_frame: spec.Basic.Deliver,
     header_frame: spec.Basic.Deliver,
     body: bytes,
 ) -> None:
-    task = Task.model_validate_json(body)
-    app = get_serverapp(task)
-    run_server_app(app, SUPERLINK_URL)
+    dispatch(Task.model_validate_json(body))
+
+
+def dispatch(task: Task) -> None:
+    global _task_pool
+    if _worker_pool is not None:
+        _worker_pool.submit(task)
+        return
+    if config.MAX_CONCURRENT_TASKS <= 1:
+        run_task(task)
+        return
+    if _task_pool is None:
+        _task_pool = TaskPool(config.MAX_CONCURRENT_TASKS)
+    _task_pool.submit(task)
+
+
+def resume_tasks() -> None:
+    # Tasks interrupted with the server carry on from their last checkpoint, as
+    # their dispatch message was acknowledged when it was delivered
+    if config.CHECKPOINT_DIR is None:
+        return
+    store = DirectoryStore(config.CHECKPOINT_DIR)
+    for task in store.pending():
+        if not is_running(task):
+            # Its checkpoints outlived the end of its run
+            print(f"Task {task.id} is no longer running, not resumed")
+            store.clear(task)
+            continue
+        print(f"Resume task {task.id}")
+        dispatch(task)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -48,5 +123,10 @@ if __name__ == "__main__":  # pragma: no cover
     SUPERLINK_URL = args.superlink
 
     rabbitmq = configure()
+    if config.WARM_WORKERS > 0:
+        _worker_pool = WorkerPool(
+            config.WARM_WORKERS, config.WORKER_MAX_TASKS, SUPERLINK_URL
+        )
+    resume_tasks()
     while True:
         rabbitmq.listen(event_handler)
@@ -0,0 +1,34 @@
+import threading
+from collections.abc import Iterable, MutableMapping
+from typing import Any
+
+
+class NodeClaims:
+    # Each client node keeps the model and run config of a single task, so the tasks
+    # running at once are set up on disjoint nodes. The nodes claimed map to the ID
+    # of their task, and tasks pick their nodes one at a time under the lock. Worker
+    # processes share a lock and mapping from a multiprocessing manager
+    def __init__(
+        self, lock: Any = None, claimed: MutableMapping[int, int | None] | None = None
+    ) -> None:
+        self.lock = threading.Lock() if lock is None else lock
+        self._claimed: MutableMapping[int, int | None] = (
+            {} if claimed is None else claimed
+        )
+
+    def free(self, node_ids: Iterable[int]) -> list[int]:
+        return [node_id for node_id in node_ids if node_id not in self._claimed]
+
+    def claim(self, task_id: int | None, node_ids: Iterable[int]) -> None:
+        for node_id in node_ids:
+            self._claimed[node_id] = task_id
+
+    def release(self, task_id: int | None, keep: Iterable[int] = ()) -> None:
+        kept = set(keep)
+        for node_id, claimed_by in list(self._claimed.items()):
+            if claimed_by == task_id and node_id not in kept:
+                self._claimed.pop(node_id, None)
+
+
+# Claims of the tasks running in this process
+NODE_CLAIMS = NodeClaims()
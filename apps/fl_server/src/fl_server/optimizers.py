@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+from flwr.common import NDArray, ParametersRecord
+
+from interfaces.array_serde import (
+    PACKED_KEY,
+    array_to_ndarray,
+    is_packed,
+    ndarray_to_array,
+    pack_parameters,
+    unpack_ndarrays,
+)
+from schemas.task import Task
+
+SERVER_OPTIMIZERS = ("momentum", "adam", "yogi")
+
+
+def _ndarrays(parameters: ParametersRecord) -> OrderedDict[str, NDArray]:
+    if is_packed(parameters):
+        return unpack_ndarrays(parameters[PACKED_KEY])
+    return OrderedDict((k, array_to_ndarray(v)) for k, v in parameters.items())
+
+
+@dataclass
+class ServerOptimizer:
+    # Treats the difference between the aggregated and the current global model as
+    # a pseudo-gradient (Reddi et al., Adaptive Federated Optimization)
+    name: str
+    lr: float | None = None
+    beta1: float = 0.9
+    beta2: float = 0.99
+    tau: float = 1e-3
+    # First and second moments of the pseudo-gradient of each floating array,
+    # kept across rounds
+    m: dict[str, NDArray] = field(default_factory=dict)
+    v: dict[str, NDArray] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.name not in SERVER_OPTIMIZERS:
+            raise ValueError(f"Unknown server optimizer: {self.name}")
+        if self.lr is None:
+            self.lr = 1.0 if self.name == "momentum" else 0.1
+
+    @classmethod
+    def from_task(cls, task: Task) -> "ServerOptimizer | None":
+        if task.server_optimizer is None:
+            return None
+        return cls(
+            task.server_optimizer,
+            lr=task.server_lr,
+            beta1=task.server_beta1,
+            beta2=task.server_beta2,
+            tau=task.server_tau,
+        )
+
+    def _update(self, key: str, delta: NDArray) -> NDArray:
+        m = self.m.setdefault(key, np.zeros_like(delta))
+        if self.name == "momentum":
+            m *= self.beta1
+            m += delta
+            return m
+        m *= self.beta1
+        m += (1 - self.beta1) * delta
+        v = self.v.setdefault(key, np.zeros_like(delta))
+        square = np.square(delta)
+        if self.name == "adam":
+            v *= self.beta2
+            v += (1 - self.beta2) * square
+        else:
+            # Yogi moves v towards the squared update by a fixed step, so a few
+            # large updates do not inflate it as much as Adam's average
+            v -= (1 - self.beta2) * square * np.sign(v - square)
+        update: NDArray = m / (np.sqrt(v) + self.tau)
+        return update
+
+    def step(
+        self, current: ParametersRecord, aggregated: ParametersRecord
+    ) -> ParametersRecord:
+        current_arrays = _ndarrays(current)
+        result = OrderedDict()
+        for k, target in _ndarrays(aggregated).items():
+            base = current_arrays.get(k)
+            # Integer buffers such as batch counters take the aggregated value
+            if base is None or not np.issubdtype(target.dtype, np.floating):
+                result[k] = target
+                continue
+            update = self._update(k, target - base)
+            result[k] = (base + self.lr * update).astype(target.dtype)
+        parameters = ParametersRecord(
+            OrderedDict((k, ndarray_to_array(v)) for k, v in result.items())
+        )
+        return pack_parameters(parameters) if is_packed(aggregated) else parameters
+
+    def get_state(self) -> dict[str, ParametersRecord]:
+        # Moments as records, copied so that the next steps leave them as they are
+        return {
+            name: ParametersRecord(
+                OrderedDict((k, ndarray_to_array(a)) for k, a in moments.items())
+            )
+            for name, moments in [("m", self.m), ("v", self.v)]
+        }
+
+    def set_state(self, state: dict[str, ParametersRecord]) -> None:
+        # Writable copies, the moments being updated in place
+        self.m, self.v = (
+            {
+                k: array_to_ndarray(a).copy()
+                for k, a in state.get(name, ParametersRecord()).items()
+            }
+            for name in ["m", "v"]
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}, lr={self.lr}, beta1={self.beta1}, beta2={self.beta2}, "
+            f"tau={self.tau}"
+        )
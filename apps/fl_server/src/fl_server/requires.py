@@ -1,3 +1,4 @@
+import time
 from typing import Callable
 
 from flwr.common import (
@@ -9,10 +10,20 @@ from flwr.common import (
 )
 from flwr.server import Driver
 
-from fl_server import stages
+from fl_server import config, stages
+from fl_server.rounds import (
+    AsyncPolicy,
+    AsyncReport,
+    RoundPolicy,
+    RoundReport,
+    RoundState,
+)
 from fl_server.utils import driver_utils, requires_utils
 
 import interfaces.recordset
+from interfaces.array_serde import compress_parameters, decode_parameters
+from interfaces.delta import add_parameters, subtract_parameters
+from schemas.task import Task
 
 
 def execution_flow(
@@ -23,13 +34,26 @@ def execution_flow(
     msg_group: str,
     recordset_factory_args: tuple = (),
     check_success: bool = False,
+    on_reply: Callable[[Message], None] | None = None,
 ) -> list[Message]:
     recordset = recordset_factory(*recordset_factory_args)
     messages = driver_utils.create_messages(
         driver, recordset, msg_type, node_ids, msg_group, DEFAULT_TTL
     )
     message_ids = driver_utils.send_messages(driver, messages)
-    all_replies = driver_utils.wait_messages(driver, message_ids)
+    all_replies = driver_utils.wait_messages(
+        driver,
+        message_ids,
+        timeout=config.STAGE_TIMEOUTS.get(msg_group, config.STAGE_TIMEOUT),
+        on_reply=on_reply,
+        poll_interval=config.POLL_INTERVAL,
+        max_poll_interval=config.POLL_MAX_INTERVAL,
+    )
+    n_expected = len([message_id for message_id in message_ids if message_id != ""])
+    if len(all_replies) < n_expected:
+        raise TimeoutError(
+            f"Stage {msg_group} got {len(all_replies)} of {n_expected} replies before the deadline"
+        )
     if check_success:
         requires_utils.check_success_clients(all_replies)
     return all_replies
@@ -118,6 +142,67 @@ def get_parameters_from_one_node(
     return param_record
 
 
+def setup_clients(
+    driver: Driver,
+    node_ids: list[int],
+    task: Task,
+    experiment_id: str,
+    run_id: str,
+) -> tuple[list[int], ParametersRecord]:
+    steps = [
+        interfaces.recordset.create_filter_clients_recordset(task.use_case),
+        interfaces.recordset.create_set_run_cfg_recordset(
+            experiment_id, run_id, task.model_name, task.model_version
+        ),
+        interfaces.recordset.create_load_data_recordset(task.use_case),
+        interfaces.recordset.create_load_model_recordset(),
+        interfaces.recordset.create_prepare_data_recordset(),
+    ]
+    # Initial parameters are only requested from the first node
+    get_parameters = interfaces.recordset.create_get_parameters_recordset(
+        task.compression
+    )
+    messages = driver_utils.create_messages(
+        driver,
+        interfaces.recordset.create_pipeline_recordset(steps + [get_parameters]),
+        MessageType.QUERY,
+        node_ids[:1],
+        "setup",
+        DEFAULT_TTL,
+    ) + driver_utils.create_messages(
+        driver,
+        interfaces.recordset.create_pipeline_recordset(steps),
+        MessageType.QUERY,
+        node_ids[1:],
+        "setup",
+        DEFAULT_TTL,
+    )
+    message_ids = driver_utils.send_messages(driver, messages)
+    all_replies = driver_utils.wait_messages(
+        driver,
+        message_ids,
+        timeout=config.STAGE_TIMEOUTS.get("setup", config.STAGE_TIMEOUT),
+        poll_interval=config.POLL_INTERVAL,
+        max_poll_interval=config.POLL_MAX_INTERVAL,
+    )
+    # Nodes left out of the task once their run config was set are cleaned up
+    configured_node_ids = stages.configured_pipeline_clients(all_replies)
+    n_expected = len([message_id for message_id in message_ids if message_id != ""])
+    if len(all_replies) < n_expected:
+        if configured_node_ids:
+            clean_config(driver, configured_node_ids)
+        raise TimeoutError(
+            f"Stage setup got {len(all_replies)} of {n_expected} replies before the deadline"
+        )
+    filtered_node_ids, parameters = stages.filter_pipeline_clients(all_replies)
+    dropped_node_ids = [i for i in configured_node_ids if i not in filtered_node_ids]
+    if dropped_node_ids:
+        clean_config(driver, dropped_node_ids)
+    if parameters is None:
+        parameters = get_parameters_from_one_node(driver, filtered_node_ids)
+    return filtered_node_ids, decode_parameters(parameters)
+
+
 def set_parameters(
     driver: Driver, node_ids: list[int], parametersrecord: ParametersRecord
 ) -> None:
@@ -151,29 +236,291 @@ def set_run_config(
     )
 
 
-def train_model(
+def _send_train_messages(
     driver: Driver,
     node_ids: list[int],
-    parametersrecord: ParametersRecord,
+    state: RoundState,
     current_global_iter: int,
-) -> list[tuple[ParametersRecord, MetricsRecord]]:
-    all_replies = execution_flow(
-        driver=driver,
-        node_ids=node_ids,
-        recordset_factory=interfaces.recordset.create_train_model_recordset,
-        msg_type=MessageType.TRAIN,
-        msg_group="train_model",
-        recordset_factory_args=(parametersrecord, current_global_iter),
-        check_success=True,
+) -> list[str]:
+    full_recordset = interfaces.recordset.create_train_model_recordset(
+        state.outgoing(),
+        current_global_iter,
+        state.version,
+        delta_reply=state.delta_transport,
+        codec=state.codec,
+        error_feedback=state.error_feedback,
+        topk=state.topk,
+        compression=state.compression,
+        packed=state.packed,
+    )
+    delta_node_ids = state.delta_node_ids(node_ids)
+    full_node_ids = [i for i in node_ids if i not in delta_node_ids]
+    messages = driver_utils.create_messages(
+        driver,
+        full_recordset,
+        MessageType.TRAIN,
+        full_node_ids,
+        "train_model",
+        DEFAULT_TTL,
     )
+    if delta_node_ids:
+        delta_recordset = interfaces.recordset.create_train_model_recordset(
+            compress_parameters(state.delta(), state.compression),
+            current_global_iter,
+            state.version,
+            base_version=state.version - 1,
+            delta_reply=True,
+            codec=state.codec,
+            error_feedback=state.error_feedback,
+            topk=state.topk,
+            compression=state.compression,
+        )
+        messages += driver_utils.create_messages(
+            driver,
+            delta_recordset,
+            MessageType.TRAIN,
+            delta_node_ids,
+            "train_model",
+            DEFAULT_TTL,
+        )
+    message_ids = driver_utils.send_messages(driver, messages)
+    return [message_id for message_id in message_ids if message_id != ""]
 
-    return [
-        (
-            msg.content.parameters_records["parameters"],
-            msg.content.metrics_records["metrics"],
+
+def _read_train_reply(
+    msg: Message, state: RoundState
+) -> tuple[ParametersRecord, MetricsRecord]:
+    # With delta transport, the parameters returned are the node's update against
+    # the current global model, and sparse updates are kept as they are. Packed
+    # parameters are left packed for the aggregator.
+    config = msg.content.configs_records["config"]
+    parameters = decode_parameters(
+        msg.content.parameters_records["parameters"],
+        keep_sparse=state.delta_transport,
+        keep_packed=state.packed,
+    )
+    if "base_version" in config:
+        if config["base_version"] != state.version:
+            raise ValueError(
+                f"Client {msg.metadata.src_node_id} replied with a delta against "
+                f"version {str(config['base_version'])}, expected {state.version}"
+            )
+        if not state.delta_transport:
+            parameters = add_parameters(state.parameters, parameters)
+    elif state.delta_transport:
+        parameters = subtract_parameters(parameters, state.parameters)
+    if state.delta_transport:
+        state.confirm(msg.metadata.src_node_id)
+    return parameters, msg.content.metrics_records["metrics"]
+
+
+def train_model(
+    driver: Driver,
+    node_ids: list[int],
+    state: RoundState,
+    current_global_iter: int,
+    policy: RoundPolicy | None = None,
+    stale_message_ids: list[str] | None = None,
+    accumulate: Callable[[ParametersRecord, float], None] | None = None,
+    sampling_weights: dict[int, float] | None = None,
+) -> tuple[list[tuple[ParametersRecord, MetricsRecord]], RoundReport]:
+    # With accumulate, the parameters of each successful reply are handed over with
+    # their weight as soon as it is pulled, then dropped from the message, and the
+    # results only carry an empty ParametersRecord in their place. The weight of a
+    # sampled node is multiplied by its entry in sampling_weights.
+    policy = RoundPolicy() if policy is None else policy
+    latencies: dict[int, float] = {}
+
+    def on_reply(msg: Message) -> None:
+        node_id = msg.metadata.src_node_id
+        latencies[node_id] = time.monotonic() - start
+        if accumulate is not None and requires_utils.is_successful(msg):
+            parameters, _ = _read_train_reply(msg, state)
+            weight = requires_utils.reply_weight(msg)
+            if sampling_weights is not None:
+                weight *= sampling_weights.get(node_id, 1.0)
+            accumulate(parameters, weight)
+            del msg.content.parameters_records["parameters"]
+
+    # Replies to earlier rounds that arrived after their round closed
+    n_stale = driver_utils.discard_messages(driver, stale_message_ids or [])
+
+    message_ids = _send_train_messages(driver, node_ids, state, current_global_iter)
+    n_sent = len([message_id for message_id in message_ids if message_id != ""])
+    n_required = policy.required_replies(len(message_ids))
+    timeout = policy.deadline
+    if timeout is None:
+        timeout = config.STAGE_TIMEOUTS.get("train_model", config.STAGE_TIMEOUT)
+
+    start = time.monotonic()
+    all_replies = driver_utils.wait_messages(
+        driver,
+        message_ids,
+        timeout=timeout,
+        on_reply=on_reply,
+        poll_interval=config.POLL_INTERVAL,
+        max_poll_interval=config.POLL_MAX_INTERVAL,
+        min_replies=n_required,
+        # Failed replies do not make the quorum
+        counts=requires_utils.is_successful,
+    )
+    # Nodes that lost their base version get the full model once more
+    missing_base = [msg for msg in all_replies if requires_utils.is_missing_base(msg)]
+    if missing_base:
+        missing_node_ids = [msg.metadata.src_node_id for msg in missing_base]
+        print(f"Resending the full model to {missing_node_ids}")
+        for node_id in missing_node_ids:
+            state.node_versions.pop(node_id, None)
+        retry_ids = _send_train_messages(
+            driver, missing_node_ids, state, current_global_iter
         )
+        message_ids += retry_ids
+        remaining = None
+        if timeout is not None:
+            remaining = max(timeout - (time.monotonic() - start), 0.0)
+        all_replies = [
+            msg for msg in all_replies if msg not in missing_base
+        ] + driver_utils.wait_messages(
+            driver,
+            retry_ids,
+            timeout=remaining,
+            on_reply=on_reply,
+            poll_interval=config.POLL_INTERVAL,
+            max_poll_interval=config.POLL_MAX_INTERVAL,
+        )
+    elapsed = time.monotonic() - start
+    n_successful = len(
+        [msg for msg in all_replies if requires_utils.is_successful(msg)]
+    )
+    if len(all_replies) < n_sent and n_successful < n_required:
+        if policy.deadline is None or not n_successful:
+            raise TimeoutError(
+                f"Stage train_model got {n_successful} of {n_required} successful replies before the deadline"
+            )
+    requires_utils.check_success_clients(all_replies)
+
+    replied = {msg.metadata.reply_to_message for msg in all_replies} | {
+        msg.metadata.reply_to_message for msg in missing_base
+    }
+    report = RoundReport(
+        round=current_global_iter,
+        policy=str(policy),
+        requested=len(node_ids),
+        received=len(all_replies),
+        stale=n_stale,
+        elapsed=elapsed,
+        replied_node_ids=[msg.metadata.src_node_id for msg in all_replies],
+        pending_message_ids=[i for i in message_ids if i not in replied],
+        latencies=latencies,
+    )
+    results = [
+        (ParametersRecord(), msg.content.metrics_records["metrics"])
+        if accumulate is not None
+        else _read_train_reply(msg, state)
         for msg in all_replies
+        if requires_utils.is_successful(msg)
     ]
+    if not results:
+        raise RuntimeError(f"No successful replies in round {current_global_iter}")
+    return results, report
+
+
+def train_async(
+    driver: Driver,
+    node_ids: list[int],
+    state: RoundState,
+    n_versions: int,
+    policy: AsyncPolicy,
+    accumulate: Callable[[ParametersRecord, float], None],
+    publish: Callable[[list[MetricsRecord], float, AsyncReport], None],
+) -> list[str]:
+    # Every node is sent the latest global model as soon as it replies. Replies are
+    # handed over to accumulate as updates against the version the node trained
+    # from, weighted by its number of examples and staleness, and publish is called
+    # with the metrics of every buffer_size updates and the fraction of their
+    # weight kept after the staleness discount. publish updates the state to the
+    # next global version. A node replying with an error is dropped from training.
+    # The ids of the messages still unanswered once n_versions versions were
+    # published are returned.
+    if state.delta_transport:
+        raise ValueError(
+            "Asynchronous training cannot be combined with delta transport"
+        )
+    timeout = config.STAGE_TIMEOUTS.get("train_model", config.STAGE_TIMEOUT)
+    last_version = state.version + n_versions
+    # Version each message in flight was sent, and the parameters of these versions
+    sent: dict[str, int] = {}
+    bases: dict[int, ParametersRecord] = {}
+
+    def send(ids: list[int]) -> None:
+        bases[state.version] = state.parameters
+        for message_id in _send_train_messages(driver, ids, state, state.version):
+            sent[message_id] = state.version
+
+    metrics: list[MetricsRecord] = []
+    staleness: list[int] = []
+    replied_node_ids: list[int] = []
+    weight = discounted = 0.0
+    send(node_ids)
+    start = last_reply = time.monotonic()
+    interval = config.POLL_INTERVAL
+    while state.version < last_version:
+        replies = list(driver.pull_messages(message_ids=list(sent)))
+        if not replies:
+            if timeout is not None and time.monotonic() - last_reply > timeout:
+                raise TimeoutError(
+                    f"No train reply for {timeout}s with {len(sent)} nodes training"
+                )
+            time.sleep(interval)
+            interval = min(interval * 2, config.POLL_MAX_INTERVAL)
+            continue
+        interval = config.POLL_INTERVAL
+        last_reply = time.monotonic()
+        for msg in replies:
+            version = sent.pop(msg.metadata.reply_to_message)
+            requires_utils.check_success_clients([msg])
+            if not requires_utils.is_successful(msg):
+                # Not sent the model again, as it would likely fail the same way
+                print(f"Client {msg.metadata.src_node_id} left asynchronous training")
+                continue
+            parameters = decode_parameters(msg.content.parameters_records["parameters"])
+            del msg.content.parameters_records["parameters"]
+            reply_staleness = state.version - version
+            reply_weight = requires_utils.reply_weight(msg)
+            discount = policy.staleness_weight(reply_staleness)
+            accumulate(
+                subtract_parameters(parameters, bases[version]),
+                reply_weight * discount,
+            )
+            weight += reply_weight
+            discounted += reply_weight * discount
+            metrics.append(msg.content.metrics_records["metrics"])
+            staleness.append(reply_staleness)
+            replied_node_ids.append(msg.metadata.src_node_id)
+            if len(metrics) == policy.buffer_size:
+                report = AsyncReport(
+                    version=state.version + 1,
+                    policy=str(policy),
+                    received=len(metrics),
+                    elapsed=time.monotonic() - start,
+                    staleness=staleness,
+                    replied_node_ids=replied_node_ids,
+                )
+                publish(metrics, discounted / weight, report)
+                metrics, staleness, replied_node_ids = [], [], []
+                weight = discounted = 0.0
+                start = time.monotonic()
+            if state.version < last_version:
+                send([msg.metadata.src_node_id])
+        if not sent and state.version < last_version:
+            raise RuntimeError(
+                f"No node left training at version {state.version} of {last_version}"
+            )
+        # Only the versions nodes are still training from are kept
+        in_flight = set(sent.values())
+        for version in [v for v in bases if v not in in_flight]:
+            del bases[version]
+    return list(sent)
 
 
 def clean_config(
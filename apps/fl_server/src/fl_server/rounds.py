@@ -0,0 +1,321 @@
+import math
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+from flwr.common import ParametersRecord
+
+from interfaces.array_serde import (
+    CODECS,
+    COMPRESSORS,
+    compress_parameters,
+    pack_parameters,
+)
+from interfaces.delta import add_parameters, subtract_parameters
+from schemas.task import Task
+
+
+@dataclass
+class RoundPolicy:
+    min_replies: int | None = None
+    min_fraction: float | None = None
+    deadline: float | None = None
+
+    @classmethod
+    def from_task(cls, task: Task) -> "RoundPolicy":
+        return cls(
+            min_replies=task.min_replies,
+            min_fraction=task.min_reply_fraction,
+            deadline=task.round_deadline,
+        )
+
+    def required_replies(self, n_nodes: int) -> int:
+        required = n_nodes
+        if self.min_replies is not None:
+            required = min(required, self.min_replies)
+        if self.min_fraction is not None:
+            required = min(required, math.ceil(self.min_fraction * n_nodes))
+        return max(required, 1)
+
+    def __str__(self) -> str:
+        return (
+            f"min_replies={self.min_replies}, "
+            f"min_fraction={self.min_fraction}, deadline={self.deadline}"
+        )
+
+
+@dataclass
+class RoundReport:
+    round: int
+    policy: str
+    requested: int
+    received: int
+    stale: int
+    elapsed: float
+    replied_node_ids: list[int] = field(default_factory=list)
+    pending_message_ids: list[str] = field(default_factory=list)
+    # Seconds each node that replied took to do so
+    latencies: dict[int, float] = field(default_factory=dict)
+
+    def to_metrics(self) -> dict[str, float]:
+        return {
+            "round_requested": self.requested,
+            "round_received": self.received,
+            "round_stale": self.stale,
+            "round_latency": self.elapsed,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"Round {self.round} ({self.policy}): {self.received}/{self.requested} "
+            f"replies in {self.elapsed:.2f}s, {self.stale} stale discarded"
+        )
+
+
+@dataclass
+class RoundPlan:
+    round: int
+    node_ids: list[int]
+    strata: list[list[int]]
+    # Inverse of the probability of each sampled node to be sampled
+    weights: dict[int, float]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "round": self.round,
+            "node_ids": self.node_ids,
+            "strata": self.strata,
+            "weights": {str(k): v for k, v in self.weights.items()},
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"Round {self.round} plan: {len(self.node_ids)} nodes sampled from "
+            f"{len(self.strata)} strata, {self.node_ids}"
+        )
+
+
+@dataclass
+class SamplingPolicy:
+    # Train a seeded random sample of count nodes, or of a fraction of the nodes,
+    # every round. With several strata, the nodes are split by the latency of their
+    # latest reply into strata of similar speed, sampled in proportion to their
+    # size, and the nodes not timed yet form a stratum of their own
+    count: int | None = None
+    fraction: float | None = None
+    seed: int = 0
+    strata: int = 1
+
+    def __post_init__(self) -> None:
+        if self.count is None and self.fraction is None:
+            raise ValueError("Sampling needs a count or a fraction of the nodes")
+        if self.count is not None and self.count < 1:
+            raise ValueError(f"Sample count must be positive, got {self.count}")
+        if self.fraction is not None and not 0 < self.fraction <= 1:
+            raise ValueError(f"Sample fraction must be in (0, 1], got {self.fraction}")
+        if self.strata < 1:
+            raise ValueError(f"Number of strata must be positive, got {self.strata}")
+
+    @classmethod
+    def from_task(cls, task: Task) -> "SamplingPolicy | None":
+        if task.sample_count is None and task.sample_fraction is None:
+            return None
+        return cls(
+            count=task.sample_count,
+            fraction=task.sample_fraction,
+            seed=task.sample_seed,
+            strata=task.sample_strata,
+        )
+
+    def sample_size(self, n_nodes: int) -> int:
+        size = n_nodes
+        if self.count is not None:
+            size = min(size, self.count)
+        if self.fraction is not None:
+            size = min(size, math.ceil(self.fraction * n_nodes))
+        return max(size, 1)
+
+    def stratify(
+        self, node_ids: list[int], latencies: dict[int, float]
+    ) -> list[list[int]]:
+        timed = sorted(
+            (i for i in node_ids if i in latencies), key=latencies.__getitem__
+        )
+        if self.strata == 1 or not timed:
+            return [list(node_ids)]
+        untimed = [i for i in node_ids if i not in latencies]
+        strata = [
+            [int(i) for i in s]
+            for s in np.array_split(timed, min(self.strata, len(timed)))
+        ]
+        return strata + ([untimed] if untimed else [])
+
+    def _allocate(self, sizes: list[int], n: int) -> list[int]:
+        # Largest remainder allocation in proportion to the stratum sizes, every
+        # stratum getting at least one node when there are enough to go round
+        total = sum(sizes)
+        quotas = [n * size / total for size in sizes]
+        counts = [math.floor(q) for q in quotas]
+        by_remainder = sorted(
+            range(len(sizes)), key=lambda h: quotas[h] - counts[h], reverse=True
+        )
+        for h in by_remainder[: n - sum(counts)]:
+            counts[h] += 1
+        if n >= len(sizes):
+            for h in range(len(sizes)):
+                if counts[h] == 0:
+                    counts[max(range(len(sizes)), key=lambda k: counts[k])] -= 1
+                    counts[h] = 1
+        return counts
+
+    def plan(
+        self, node_ids: list[int], round: int, latencies: dict[int, float]
+    ) -> RoundPlan:
+        strata = self.stratify(node_ids, latencies)
+        counts = self._allocate(
+            [len(s) for s in strata], self.sample_size(len(node_ids))
+        )
+        # Seeded by round, so that a round draws the same nodes from the same strata
+        rng = np.random.default_rng([self.seed, round])
+        sampled: set[int] = set()
+        weights = {}
+        for stratum, count in zip(strata, counts):
+            if not count:
+                continue
+            chosen = rng.choice(stratum, size=count, replace=False)
+            for i in chosen.tolist():
+                sampled.add(i)
+                weights[i] = len(stratum) / count
+        return RoundPlan(
+            round=round,
+            node_ids=[i for i in node_ids if i in sampled],
+            strata=strata,
+            weights={i: weights[i] for i in node_ids if i in sampled},
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"count={self.count}, fraction={self.fraction}, seed={self.seed}, "
+            f"strata={self.strata}"
+        )
+
+
+@dataclass
+class AsyncPolicy:
+    # Publish a new global version every buffer_size updates, each update weighted
+    # down by (1 + staleness) ** -staleness_exponent, its staleness being the
+    # number of versions published since the node was sent its model
+    buffer_size: int
+    staleness_exponent: float = 0.5
+
+    def __post_init__(self) -> None:
+        if self.buffer_size < 1:
+            raise ValueError(f"Buffer size must be positive, got {self.buffer_size}")
+        if self.staleness_exponent < 0:
+            raise ValueError(
+                f"Staleness exponent must be non-negative, got {self.staleness_exponent}"
+            )
+
+    @classmethod
+    def from_task(cls, task: Task) -> "AsyncPolicy | None":
+        if task.async_buffer_size is None:
+            return None
+        return cls(task.async_buffer_size, task.staleness_exponent)
+
+    def staleness_weight(self, staleness: int) -> float:
+        return float((1 + staleness) ** -self.staleness_exponent)
+
+    def __str__(self) -> str:
+        return (
+            f"async, buffer_size={self.buffer_size}, "
+            f"staleness_exponent={self.staleness_exponent}"
+        )
+
+
+@dataclass
+class AsyncReport:
+    version: int
+    policy: str
+    received: int
+    elapsed: float
+    staleness: list[int] = field(default_factory=list)
+    replied_node_ids: list[int] = field(default_factory=list)
+
+    def to_metrics(self) -> dict[str, float]:
+        return {
+            "round_received": self.received,
+            "round_latency": self.elapsed,
+            "round_mean_staleness": sum(self.staleness) / len(self.staleness),
+            "round_max_staleness": max(self.staleness),
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"Version {self.version} ({self.policy}): {self.received} updates in "
+            f"{self.elapsed:.2f}s, staleness up to {max(self.staleness)}"
+        )
+
+
+@dataclass
+class RoundState:
+    parameters: ParametersRecord
+    version: int = 0
+    delta_transport: bool = False
+    codec: str | None = None
+    error_feedback: bool = False
+    topk: float | None = None
+    compression: str | None = None
+    packed: bool = False
+    previous: ParametersRecord | None = None
+    # Global version each node confirmed holding in its last reply
+    node_versions: dict[int, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.codec is not None and self.codec not in CODECS:
+            raise ValueError(f"Unknown codec: {self.codec}")
+        if self.compression is not None and self.compression not in COMPRESSORS:
+            raise ValueError(f"Unknown or unavailable compressor: {self.compression}")
+        if self.topk is not None:
+            if not self.delta_transport:
+                raise ValueError("Top-k updates require delta transport")
+            if self.codec is not None:
+                raise ValueError("Top-k updates cannot be combined with a codec")
+            if not 0 < self.topk <= 1:
+                raise ValueError(f"Top-k fraction must be in (0, 1], got {self.topk}")
+        if self.packed and (
+            self.delta_transport or self.codec is not None or self.topk is not None
+        ):
+            raise ValueError(
+                "Packed parameters cannot be combined with deltas, codecs or top-k"
+            )
+
+    def update(self, parameters: ParametersRecord) -> None:
+        if self.delta_transport:
+            # Keep the model exactly as the nodes rebuild it from the delta, so
+            # that the next delta applies to the same values on both sides
+            parameters = add_parameters(
+                self.parameters, subtract_parameters(parameters, self.parameters)
+            )
+            self.previous = self.parameters
+        self.parameters = parameters
+        self.version += 1
+
+    def outgoing(self) -> ParametersRecord:
+        parameters = (
+            pack_parameters(self.parameters) if self.packed else self.parameters
+        )
+        return compress_parameters(parameters, self.compression)
+
+    def delta_node_ids(self, node_ids: list[int]) -> list[int]:
+        if not self.delta_transport or self.previous is None:
+            return []
+        return [i for i in node_ids if self.node_versions.get(i) == self.version - 1]
+
+    def delta(self) -> ParametersRecord:
+        if self.previous is None:
+            raise ValueError(f"No base version to compute a delta for {self.version}")
+        return subtract_parameters(self.parameters, self.previous)
+
+    def confirm(self, node_id: int) -> None:
+        self.node_versions[node_id] = self.version
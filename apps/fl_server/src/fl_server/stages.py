@@ -1,7 +1,40 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+
+import numpy as np
 from flwr.common import Message, ParametersRecord, MetricsRecord
 
+from fl_server import config
 from interfaces import mlflow_client
+import interfaces.recordset
+from interfaces.array_serde import (
+    PACKED_KEY,
+    FlatValues,
+    array_to_ndarray,
+    decode_parameters,
+    flat_arrays,
+    is_packed,
+    packed_segments,
+    replace_segments,
+    same_layout,
+)
+from interfaces.robust import RobustAggregator
+
+# Aggregation thread pools by size, shared by the tasks of the server
+_executors: dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _aggregation_executor(workers: int) -> ThreadPoolExecutor:
+    # Tasks loading their model at once get the same pool
+    with _executors_lock:
+        if workers not in _executors:
+            _executors[workers] = ThreadPoolExecutor(
+                workers, thread_name_prefix="aggregation"
+            )
+        return _executors[workers]
 
 
 def load_model(
@@ -10,6 +43,24 @@ def load_model(
     mlf_model = mlflow_client.load_model()
     global_vars["model"] = mlf_model
     global_vars["aggregator"] = mlf_model.unwrap_python_model().create_aggregator()
+    set_aggregation_workers(global_vars, config.AGGREGATION_WORKERS)
+
+
+def set_aggregation_workers(global_vars: dict[str, Any], workers: int) -> None:
+    # Aggregators splitting their work over a thread pool
+    set_executor = getattr(global_vars["aggregator"], "set_executor", None)
+    if callable(set_executor):
+        set_executor(_aggregation_executor(workers) if workers > 1 else None)
+
+
+def set_robust_aggregation(
+    global_vars: dict[str, Any], method: str, trim_fraction: float
+) -> None:
+    # The model's aggregator is kept for the metrics; robust statistics need every
+    # reply, so the replies are collected rather than streamed
+    global_vars["aggregator"] = RobustAggregator(
+        global_vars["aggregator"], method, trim_fraction
+    )
 
 
 def aggregate_parameters(
@@ -17,6 +68,10 @@ def aggregate_parameters(
     global_vars: dict[str, Any],
 ) -> ParametersRecord:
     aggregator = global_vars["aggregator"]
+    # Robust aggregation reads sparse and packed updates in place, the model's
+    # aggregator gets them densified and unpacked
+    if not isinstance(aggregator, RobustAggregator):
+        parameter_list = [decode_parameters(p) for p in parameter_list]
     agg_parameters = aggregator.aggregate_parameters(parameter_list)
     if not isinstance(agg_parameters, ParametersRecord):
         raise TypeError(
@@ -25,6 +80,73 @@ def aggregate_parameters(
     return agg_parameters
 
 
+def supports_streaming(global_vars: dict[str, Any]) -> bool:
+    # Aggregators folding the replies in one at a time as they arrive
+    aggregator = global_vars["aggregator"]
+    return all(
+        callable(getattr(aggregator, name, None))
+        for name in ["begin_round", "accumulate", "finalize"]
+    )
+
+
+def _reset_layout(global_vars: dict[str, Any]) -> None:
+    # Packed parameters of the round, the first of which gives the layout
+    global_vars["packed_layout"] = None
+    global_vars["unpacked_round"] = False
+
+
+def begin_round(global_vars: dict[str, Any]) -> None:
+    global_vars["aggregator"].begin_round()
+    _reset_layout(global_vars)
+
+
+def accumulate_parameters(
+    parameters: ParametersRecord,
+    global_vars: dict[str, Any],
+    weight: float = 1.0,
+) -> None:
+    # The aggregator gets the arrays decoded rather than the stypes they were sent
+    # with, sparse updates as their indices and values. Packed parameters are
+    # handed over as one flat vector per dtype, averaged as a whole and packed
+    # again with the layout of the first reply of the round
+    layout = global_vars.get("packed_layout")
+    if is_packed(parameters):
+        array = parameters[PACKED_KEY]
+        if layout is None:
+            if global_vars.get("unpacked_round", False):
+                raise ValueError("Cannot mix packed and unpacked parameters")
+            global_vars["packed_layout"] = layout = array
+        elif not same_layout(array, layout):
+            raise ValueError("Cannot average packed parameters of another layout")
+        arrays: OrderedDict[str, tuple[tuple[int, ...], np.dtype, FlatValues]] = (
+            OrderedDict(
+                (k, (v.shape, v.dtype, v)) for k, v in packed_segments(array).items()
+            )
+        )
+    elif layout is not None:
+        raise ValueError("Cannot mix packed and unpacked parameters")
+    else:
+        global_vars["unpacked_round"] = True
+        arrays = flat_arrays(parameters)
+    global_vars["aggregator"].accumulate(arrays, weight)
+
+
+def finalize_parameters(global_vars: dict[str, Any]) -> ParametersRecord:
+    agg_parameters = global_vars["aggregator"].finalize()
+    if not isinstance(agg_parameters, ParametersRecord):
+        raise TypeError(
+            f"Aggregated parameters must be a ParametersRecord, got {type(agg_parameters)}"
+        )
+    layout = global_vars.get("packed_layout")
+    _reset_layout(global_vars)
+    if layout is not None:
+        segments = {k: array_to_ndarray(v) for k, v in agg_parameters.items()}
+        return ParametersRecord(
+            OrderedDict({PACKED_KEY: replace_segments(layout, segments)})
+        )
+    return agg_parameters
+
+
 def aggregate_metrics(
     metrics_list: list[MetricsRecord],
     global_vars: dict[str, Any],
@@ -51,3 +173,39 @@ def filter_clients(
             print(f"Client {msg.metadata.src_node_id} will not participate")
 
     return filtered_node_ids
+
+
+def filter_pipeline_clients(
+    messages: list[Message],
+) -> tuple[list[int], ParametersRecord | None]:
+    filtered_node_ids = []
+    parameters = None
+    for msg in messages:
+        node_id = msg.metadata.src_node_id
+        if msg.has_error():
+            print(f"Client {node_id} raised error {msg.error.code}: {msg.error.reason}")
+            continue
+        steps = interfaces.recordset.read_pipeline_reply_recordset(msg.content)
+        if not msg.content.configs_records["config"]["success"]:
+            print(
+                f"Client {node_id} will not participate: {str(msg.content.configs_records['config']['message'])}"
+            )
+            continue
+        print(f"Client {node_id} will participate")
+        filtered_node_ids.append(node_id)
+        for mode, _, reply in steps:
+            if mode == "get_parameters":
+                parameters = reply.parameters_records["parameters"]
+    return filtered_node_ids, parameters
+
+
+def configured_pipeline_clients(messages: list[Message]) -> list[int]:
+    # Nodes whose run config was set, including those failing a later step
+    node_ids = []
+    for msg in messages:
+        if msg.has_error():
+            continue
+        steps = interfaces.recordset.read_pipeline_reply_recordset(msg.content)
+        if any(mode == "set_run_config" and success for mode, success, _ in steps):
+            node_ids.append(msg.metadata.src_node_id)
+    return node_ids
@@ -3,6 +3,8 @@ from logging import INFO
 
 from flwr.common import event, EventType, Context, RecordSet
 from flwr.server.driver import GrpcDriver
+from flwr.server.driver.grpc_driver import GrpcDriverHelper
+from flwr.proto.driver_pb2 import CreateRunRequest
 from flwr.server import ServerApp
 from flwr.common.logger import update_console_handler
 
@@ -11,6 +13,7 @@ def run_server_app(
     server_app: ServerApp,
     superlink_url: str,
     root_certificates: Optional[bytes] = None,
+    driver_helper: Optional[GrpcDriverHelper] = None,
 ) -> None:
     update_console_handler(
         level=INFO,
@@ -22,9 +25,16 @@ def run_server_app(
         driver_service_address=superlink_url, root_certificates=root_certificates
     )
 
+    if driver_helper is not None:
+        # Reuse the connected channel of a warm worker, with a new run per task
+        driver.driver_helper = driver_helper
+        driver.run_id = driver_helper.create_run(CreateRunRequest()).run_id
+
     context = Context(state=RecordSet())
     server_app(driver, context)
 
-    driver.close()
+    # A reused channel stays open for the next task of the worker
+    if driver_helper is None:
+        driver.close()
 
     event(EventType.RUN_SERVER_APP_LEAVE)
@@ -1,4 +1,5 @@
 import time
+from typing import Callable
 
 from flwr.common import DEFAULT_TTL, Message, RecordSet
 from flwr.server import Driver
@@ -31,14 +32,64 @@ def send_messages(driver: Driver, messages: list[Message]) -> list[str]:
     return message_ids
 
 
-def wait_messages(driver: Driver, message_ids: list[str]) -> list[Message]:
+def wait_messages(
+    driver: Driver,
+    message_ids: list[str],
+    timeout: float | None = None,
+    on_reply: Callable[[Message], None] | None = None,
+    poll_interval: float = 0.01,
+    max_poll_interval: float = 3.0,
+    min_replies: int | None = None,
+    counts: Callable[[Message], bool] | None = None,
+) -> list[Message]:
+    """
+    Collect the replies to the given messages.
+
+    The superlink is polled with an exponential backoff that starts at
+    `poll_interval` and doubles up to `max_poll_interval`, falling back to the
+    shortest interval whenever new replies show up. `on_reply` is called for every
+    reply as soon as it is pulled. Collection stops once every message was replied
+    to, `min_replies` replies for which `counts` holds (any reply by default)
+    arrived or `timeout` seconds elapsed, returning the replies collected so far.
+    """
     message_ids = [message_id for message_id in message_ids if message_id != ""]
+    n_required = len(message_ids) if min_replies is None else min_replies
+    deadline = None if timeout is None else time.monotonic() + timeout
+    interval = poll_interval
     all_replies: list[Message] = []
+    n_counted = 0
     while True:
         replies = list(driver.pull_messages(message_ids=message_ids))
-        print(f"Got {len(replies)} results")
-        all_replies += replies
-        if len(all_replies) == len(message_ids):
+        if replies:
+            print(f"Got {len(replies)} results")
+            interval = poll_interval
+        for reply in replies:
+            if on_reply is not None:
+                on_reply(reply)
+            all_replies.append(reply)
+            if counts is None or counts(reply):
+                n_counted += 1
+        if n_counted >= n_required or len(all_replies) >= len(message_ids):
             break
-        time.sleep(3)
+        sleep_for = interval
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(
+                    f"Timed out with {len(message_ids) - len(all_replies)} replies missing"
+                )
+                break
+            sleep_for = min(sleep_for, remaining)
+        time.sleep(sleep_for)
+        interval = min(interval * 2, max_poll_interval)
     return all_replies
+
+
+def discard_messages(driver: Driver, message_ids: list[str]) -> int:
+    message_ids = [message_id for message_id in message_ids if message_id != ""]
+    if not message_ids:
+        return 0
+    replies = list(driver.pull_messages(message_ids=message_ids))
+    if replies:
+        print(f"Discarded {len(replies)} stale results")
+    return len(replies)
@@ -17,3 +17,26 @@ def check_success_clients(
                 print(
                     f"Client {msg.metadata.src_node_id} {str(msg.content.configs_records['config']['message'])}"
                 )
+
+
+def is_missing_base(msg: Message) -> bool:
+    return not msg.has_error() and bool(
+        msg.content.configs_records["config"].get("missing_base", False)
+    )
+
+
+def is_successful(msg: Message) -> bool:
+    return not msg.has_error() and bool(
+        msg.content.configs_records["config"]["success"]
+    )
+
+
+def reply_weight(msg: Message) -> float:
+    # Replies are weighted by the number of examples the node trained on
+    config = msg.content.configs_records["config"]
+    num_examples = config["num_examples"] if "num_examples" in config else 1
+    if not isinstance(num_examples, int):
+        raise TypeError(
+            f"num_examples must be an integer, received {type(num_examples)}"
+        )
+    return float(num_examples)
@@ -0,0 +1,267 @@
+import multiprocessing
+import threading
+import traceback
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Callable, cast
+
+import grpc
+import mlflow
+from flwr.server.driver.grpc_driver import GrpcDriverHelper
+from pika.exceptions import AMQPError
+
+from fl_server import config
+from fl_server.app import (
+    create_artifact_cache,
+    create_status_client,
+    get_serverapp,
+    open_status_client,
+)
+from fl_server.checkpoints import end_runs
+from fl_server.nodes import NodeClaims
+from fl_server.utils.app_utils import run_server_app
+
+from interfaces import mlflow_client, rabbitmq_client
+from schemas.task import Task
+
+# Modules the forkserver imports once, every worker being forked with them
+PRELOAD = [
+    "torch",
+    "mlflow.pyfunc",
+    "mlflow.pytorch",
+    "flwr.server",
+    "fl_server.app",
+]
+
+
+@dataclass
+class WarmResources:
+    driver_helper: GrpcDriverHelper
+    rabbitmq: rabbitmq_client.RabbitMQClient
+
+
+def _warm_mlflow() -> None:
+    # Set up once per process when the first model is loaded: the tracer, and the
+    # map of modules to packages the model requirements are checked against
+    mlflow.tracing.enable()
+    init_map = getattr(
+        mlflow.utils.requirements_utils, "_init_packages_to_modules_map", None
+    )
+    if callable(init_map):
+        init_map()
+
+
+def _warm_up(superlink_url: str) -> WarmResources:
+    if config.MLFLOW_URL is None:
+        raise ValueError("MLFLOW_URL must be set for the workers")
+    mlflow_client.setup_mlflow(
+        config.MLFLOW_URL,
+        is_central_node=True,
+        artifact_cache=create_artifact_cache(),
+    )
+    _warm_mlflow()
+    driver_helper = GrpcDriverHelper(driver_service_address=superlink_url)
+    driver_helper.connect()
+    if driver_helper.channel is not None:
+        try:
+            grpc.channel_ready_future(driver_helper.channel).result(
+                timeout=config.WORKER_CONNECT_TIMEOUT
+            )
+        except grpc.FutureTimeoutError:
+            # The channel connects with the first task instead
+            print(f"Superlink {superlink_url} not reachable while warming up")
+    rabbitmq = create_status_client()
+    return WarmResources(driver_helper, rabbitmq)
+
+
+def _run(
+    task: Task, superlink_url: str, resources: WarmResources, claims: NodeClaims
+) -> None:
+    # Each task runs with its own MLflow context and run on the superlink
+    with mlflow_client.use_context(mlflow_client.MlflowContext()):
+        # The connection is replaced for the next tasks too when it was lost
+        resources.rabbitmq = open_status_client(resources.rabbitmq)
+        app = get_serverapp(task, resources.rabbitmq, claims)
+        run_server_app(app, superlink_url, driver_helper=resources.driver_helper)
+
+
+def _worker_main(
+    connection: Connection,
+    superlink_url: str,
+    max_tasks: int,
+    initializer: Callable[[], None] | None,
+    claims: NodeClaims,
+) -> None:
+    if initializer is not None:
+        initializer()
+    resources = _warm_up(superlink_url)
+    # An empty message tells the pool the worker is ready
+    connection.send(None)
+    for _ in range(max_tasks):
+        try:
+            body = connection.recv_bytes()
+        except EOFError:
+            # The pool shut down
+            break
+        task = Task.model_validate_json(body)
+        error = None
+        try:
+            _run(task, superlink_url, resources, claims)
+        except Exception:
+            error = traceback.format_exc()
+        connection.send((task.id, error))
+    resources.driver_helper.disconnect()
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    remaining: int
+    ready: bool = False
+    task: Task | None = None
+
+
+class WorkerPool:
+    # Worker processes forked from a forkserver that imported the heavy modules,
+    # each warming up its MLflow client, superlink channel and RabbitMQ connection
+    # before it is handed a task over a pipe. Workers are replaced after max_tasks
+    # tasks to keep their memory bounded, the replacement warming up in the
+    # background, and submit blocks while every worker is busy. The workers claim
+    # the nodes of their tasks through a manager process, so that tasks running at
+    # once in different workers get disjoint nodes.
+    def __init__(
+        self,
+        size: int,
+        max_tasks: int,
+        superlink_url: str,
+        initializer: Callable[[], None] | None = None,
+        preload: list[str] | None = None,
+    ) -> None:
+        if size < 1 or max_tasks < 1:
+            raise ValueError("A worker pool needs workers running at least one task")
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(PRELOAD if preload is None else preload)
+        self._max_tasks = max_tasks
+        self._superlink_url = superlink_url
+        self._initializer = initializer
+        self._manager = self._context.Manager()
+        self._claims = NodeClaims(self._manager.Lock(), self._manager.dict())
+        self._workers: dict[Connection, _Worker] = {}
+        # Reports the tasks of the workers that died, opened with the first one
+        self._status: rabbitmq_client.RabbitMQClient | None = None
+        self._condition = threading.Condition()
+        self._closed = False
+        with self._condition:
+            for _ in range(size):
+                self._start()
+        self._monitor = threading.Thread(target=self._watch, daemon=True)
+        self._monitor.start()
+
+    def _start(self) -> None:
+        parent_end, child_end = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                child_end,
+                self._superlink_url,
+                self._max_tasks,
+                self._initializer,
+                self._claims,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_end.close()
+        self._workers[parent_end] = _Worker(process, self._max_tasks)
+
+    def _receive(self, connection: Connection) -> Task | None:
+        # Returns the task of a worker that exited while running it
+        worker = self._workers[connection]
+        try:
+            message = connection.recv()
+        except EOFError:
+            # The worker exited, after its last task or by crashing
+            if worker.task is not None:
+                print(
+                    f"Worker {worker.process.pid} exited during task {worker.task.id}"
+                )
+            elif worker.remaining:
+                print(f"Worker {worker.process.pid} exited")
+            del self._workers[connection]
+            connection.close()
+            worker.process.join()
+            if not self._closed:
+                self._start()
+            return worker.task
+        if message is None:
+            worker.ready = True
+            return None
+        task_id, error = message
+        if error is not None:
+            print(f"Task {task_id} failed:\n{error}")
+        worker.task = None
+        worker.remaining -= 1
+        return None
+
+    def _fail(self, task: Task) -> None:
+        # The task of a worker that died could neither end its runs nor report its
+        # status, which would stay running
+        try:
+            end_runs(task, "FAILED")
+        except Exception:
+            print(f"Could not end the runs of task {task.id}:")
+            traceback.print_exc()
+        try:
+            self._status = open_status_client(self._status)
+            self._status.publish_message(f"Task {task.id} failed")
+        except AMQPError:
+            print(f"Could not report task {task.id} as failed:")
+            traceback.print_exc()
+
+    def _watch(self) -> None:
+        while not self._closed:
+            with self._condition:
+                connections = list(self._workers)
+            for connection in wait(connections, timeout=0.1):
+                failed = None
+                with self._condition:
+                    if connection in self._workers:
+                        failed = self._receive(connection)
+                    self._condition.notify_all()
+                if failed is not None:
+                    self._fail(failed)
+
+    def _idle(self) -> Connection | None:
+        for connection, worker in self._workers.items():
+            if worker.ready and worker.task is None and worker.remaining:
+                return connection
+        return None
+
+    def submit(self, task: Task) -> None:
+        with self._condition:
+            # Waits without a timeout, until a worker is idle
+            connection = cast(Connection, self._condition.wait_for(self._idle))
+            self._workers[connection].task = task
+            connection.send_bytes(task.model_dump_json().encode())
+
+    def wait(self, timeout: float | None = None) -> bool:
+        # Wait for every worker to be idle and ready, as after warming up
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: all(
+                    w.ready and w.task is None and w.remaining
+                    for w in self._workers.values()
+                ),
+                timeout,
+            )
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._closed = True
+            workers = list(self._workers.items())
+        self._monitor.join()
+        for connection, worker in workers:
+            connection.close()
+            worker.process.join()
+        self._manager.shutdown()
@@ -1,12 +1,33 @@
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 
 from flwr.common import ParametersRecord, MetricsRecord
-
-from fl_server.app import _mlflow_config, _model_and_data, _training_loop, get_serverapp
+from pika.exceptions import StreamLostError
+
+from fl_server.app import (
+    _async_training_loop,
+    _mlflow_config,
+    _training_loop,
+    create_artifact_cache,
+    get_serverapp,
+    open_status_client,
+)
 from fl_server import config
-
+from fl_server.checkpoints import Checkpoint, CheckpointWriter
+from fl_server.control import ControlledDriver, TaskCancelled
+from fl_server.nodes import NodeClaims
+from fl_server.rounds import (
+    AsyncPolicy,
+    AsyncReport,
+    RoundPolicy,
+    RoundReport,
+    RoundState,
+    SamplingPolicy,
+)
+
+from interfaces.array_serde import array_to_ndarray, ndarray_to_array
 from schemas.task import Task
 
 
@@ -58,11 +79,11 @@ def config_dict():
     }
 
 
-def test_mlflow_config(task, driver, node_ids):
+def test_mlflow_config(task):
     with (
         patch("fl_server.app.mlflow_utils.create_mlflow_runs") as mock_create_runs,
         patch("fl_server.app.mlflow_client.set_current_config") as mock_set_config,
-        patch("fl_server.app.requires.set_run_config") as mock_set_run_config,
+        patch("fl_server.app.tag_run") as mock_tag_run,
     ):
         mock_create_runs.return_value = (
             "experiment_id",
@@ -70,7 +91,7 @@ def test_mlflow_config(task, driver, node_ids):
             "child_run_id",
         )
 
-        _mlflow_config(task, driver, node_ids)
+        result = _mlflow_config(task)
 
         mock_create_runs.assert_called_once_with(task.run_name, task.experiment_name)
         mock_set_config.assert_called_once_with(
@@ -80,36 +101,16 @@ def test_mlflow_config(task, driver, node_ids):
             task.model_name,
             task.model_version,
         )
-        mock_set_run_config.assert_called_once_with(
-            driver,
-            node_ids,
-            "experiment_id",
-            "parent_run_id",
-            task.model_name,
-            task.model_version,
-        )
-
-
-def test_model_and_data(task, driver, node_ids, config_dict):
-    with (
-        patch("fl_server.app.stages.load_model") as mock_stages_load_model,
-        patch("fl_server.app.requires.load_data") as mock_requires_load_data,
-        patch("fl_server.app.requires.load_model") as mock_requires_load_model,
-        patch("fl_server.app.requires.prepare_data") as mock_requires_prepare_data,
-        patch.dict(config.global_vars, config_dict) as mock_global_vars,
-    ):
-        _model_and_data(task, driver, node_ids)
-
-        mock_stages_load_model.assert_called_once_with(mock_global_vars)
-        mock_requires_load_data.assert_called_once_with(driver, node_ids, task.use_case)
-        mock_requires_load_model.assert_called_once_with(
-            driver, node_ids, task.model_name, task.model_version
-        )
-        mock_requires_prepare_data.assert_called_once_with(driver, node_ids)
+        # Both runs are tagged with the task
+        assert mock_tag_run.call_count == 2
+        mock_tag_run.assert_any_call("parent_run_id", task)
+        mock_tag_run.assert_any_call("child_run_id", task)
+        assert result == ("experiment_id", "parent_run_id")
 
 
 def test_training_loop(driver, node_ids, parameters, metrics, config_dict):
     n_global_iter = 10
+    aggregated_parameters = ParametersRecord()
 
     with (
         patch("fl_server.app.requires.train_model") as mock_requires_train_model,
@@ -122,16 +123,31 @@ def test_training_loop(driver, node_ids, parameters, metrics, config_dict):
         patch(
             "fl_server.app.mlflow_client.log_metrics"
         ) as mock_mlflow_client_log_metrics,
-        patch("fl_server.app.requires.set_parameters") as mock_requires_set_parameters,
         patch.dict(config.global_vars, config_dict),
     ):
-        mock_requires_train_model.return_value = [
-            (parameters, metrics) for _ in range(n_global_iter)
-        ]
-        mock_stages_aggregate_parameters.return_value = parameters
+        report = RoundReport(
+            round=0,
+            policy="policy",
+            requested=3,
+            received=2,
+            stale=0,
+            elapsed=1.0,
+            replied_node_ids=node_ids[:2],
+            pending_message_ids=["3"],
+        )
+        sent = []
+
+        def train_model(driver, node_ids, state, **kwargs):
+            sent.append((state.parameters, state.version))
+            return [(parameters, metrics) for _ in range(n_global_iter)], report
+
+        mock_requires_train_model.side_effect = train_model
+        mock_stages_aggregate_parameters.return_value = aggregated_parameters
         mock_stages_aggregate_metrics.return_value = metrics
+        policy = RoundPolicy(min_replies=2)
+        state = RoundState(parameters)
 
-        _training_loop(driver, node_ids, parameters, n_global_iter)
+        _training_loop(driver, node_ids, state, n_global_iter, policy)
 
         mock_stages_aggregate_parameters.assert_called_with(
             [parameters] * n_global_iter, config_dict
@@ -140,29 +156,221 @@ def test_training_loop(driver, node_ids, parameters, metrics, config_dict):
             [metrics] * n_global_iter, config_dict
         )
         mock_mlflow_client_log_metrics.assert_called_with(
-            metrics, step=n_global_iter - 1
+            {**metrics, **report.to_metrics()}, step=n_global_iter - 1
+        )
+        mock_requires_train_model.assert_called_with(
+            driver,
+            node_ids,
+            state,
+            current_global_iter=n_global_iter - 1,
+            policy=policy,
+            stale_message_ids=["3"],
+            accumulate=None,
+            sampling_weights=None,
         )
-        mock_requires_set_parameters.assert_called_with(driver, node_ids, parameters)
 
         assert mock_requires_train_model.call_count == n_global_iter
         assert mock_stages_aggregate_metrics.call_count == n_global_iter
         assert mock_mlflow_client_log_metrics.call_count == n_global_iter
-        assert mock_requires_set_parameters.call_count == n_global_iter
         assert mock_stages_aggregate_parameters.call_count == n_global_iter
+        # Each round trains on the model aggregated in the previous one
+        assert sent == [(parameters, 0)] + [
+            (aggregated_parameters, version) for version in range(1, n_global_iter)
+        ]
+        assert state.parameters is aggregated_parameters
+        assert state.version == n_global_iter
+
+
+def test_training_loop_server_optimizer(driver, node_ids, metrics, config_dict):
+    aggregated_parameters = ParametersRecord()
+    optimizer = MagicMock()
+    stepped = [ParametersRecord() for _ in range(2)]
+    optimizer.step.side_effect = stepped
+
+    with (
+        patch("fl_server.app.requires.train_model") as mock_requires_train_model,
+        patch(
+            "fl_server.app.stages.aggregate_parameters",
+            return_value=aggregated_parameters,
+        ),
+        patch("fl_server.app.stages.aggregate_metrics", return_value=metrics),
+        patch("fl_server.app.mlflow_client.log_metrics"),
+        patch.dict(config.global_vars, config_dict),
+    ):
+        mock_requires_train_model.return_value = (
+            [],
+            RoundReport(
+                round=0, policy="", requested=3, received=0, stale=0, elapsed=0
+            ),
+        )
+        initial = ParametersRecord()
+        state = RoundState(initial)
+
+        _training_loop(driver, node_ids, state, 2, RoundPolicy(), optimizer)
+
+    # The server steps from the current global model along the aggregated update
+    assert [c.args for c in optimizer.step.call_args_list] == [
+        (initial, aggregated_parameters),
+        (stepped[0], aggregated_parameters),
+    ]
+    assert state.parameters is stepped[1]
 
 
-def test_get_serverapp(task, driver, node_ids, parameters):
+def test_training_loop_streaming(driver, node_ids, metrics, config_dict):
+    aggregator = MagicMock()
+    aggregated_parameters = ParametersRecord()
+    aggregator.finalize.return_value = aggregated_parameters
+    report = RoundReport(
+        round=0, policy="policy", requested=3, received=3, stale=0, elapsed=1.0
+    )
+    update = ParametersRecord()
+
+    def train_model(driver, node_ids, state, accumulate, **kwargs):
+        # Replies are handed over while the round is still waiting
+        for node_id in node_ids:
+            accumulate(update, float(node_id))
+        return [(ParametersRecord(), metrics) for _ in node_ids], report
+
+    with (
+        patch("fl_server.app.requires.train_model", side_effect=train_model),
+        patch(
+            "fl_server.app.stages.aggregate_parameters"
+        ) as mock_stages_aggregate_parameters,
+        patch("fl_server.app.stages.aggregate_metrics", return_value=metrics),
+        patch("fl_server.app.mlflow_client.log_metrics"),
+        patch.dict(config.global_vars, {**config_dict, "aggregator": aggregator}),
+    ):
+        state = RoundState(ParametersRecord())
+        _training_loop(driver, node_ids, state, 2, RoundPolicy())
+
+    assert aggregator.begin_round.call_count == 2
+    assert aggregator.accumulate.call_count == 2 * len(node_ids)
+    aggregator.accumulate.assert_called_with(update, float(node_ids[-1]))
+    mock_stages_aggregate_parameters.assert_not_called()
+    assert state.parameters is aggregated_parameters
+
+
+def test_training_loop_sampling(driver, metrics, config_dict):
+    node_ids = list(range(1, 11))
+    sampling = SamplingPolicy(count=3, seed=7)
+    calls = []
+
+    def train_model(driver, node_ids, state, current_global_iter, **kwargs):
+        calls.append((node_ids, kwargs["sampling_weights"]))
+        report = RoundReport(
+            round=current_global_iter,
+            policy="policy",
+            requested=len(node_ids),
+            received=len(node_ids),
+            stale=0,
+            elapsed=1.0,
+            latencies={i: float(i) for i in node_ids},
+        )
+        return [(ParametersRecord(), metrics) for _ in node_ids], report
+
+    with (
+        patch("fl_server.app.requires.train_model", side_effect=train_model),
+        patch("fl_server.app.stages.aggregate_parameters"),
+        patch("fl_server.app.stages.aggregate_metrics", return_value=metrics),
+        patch("fl_server.app.mlflow_client.log_metrics"),
+        patch("fl_server.app.mlflow_client.log_dict") as mock_log_dict,
+        patch.dict(config.global_vars, config_dict),
+    ):
+        _training_loop(
+            driver,
+            node_ids,
+            RoundState(ParametersRecord()),
+            2,
+            RoundPolicy(),
+            sampling=sampling,
+        )
+
+    # Only the sampled nodes are sent train messages, with the plan logged
+    assert [len(sampled) for sampled, _ in calls] == [3, 3]
+    assert calls[0][1] == {i: 10 / 3 for i in calls[0][0]}
+    assert calls[0][0] == sampling.plan(node_ids, 0, {}).node_ids
+    assert [c.args[1] for c in mock_log_dict.call_args_list] == [
+        "round_plans/round_0.json",
+        "round_plans/round_1.json",
+    ]
+    assert mock_log_dict.call_args_list[0].args[0]["node_ids"] == calls[0][0]
+
+
+def test_async_training_loop(driver, node_ids, metrics, config_dict):
+    aggregator = MagicMock()
+    aggregator.finalize.return_value = ParametersRecord(
+        {"weight": ndarray_to_array(np.full(3, 2.0, dtype=np.float32))}
+    )
+    update = ParametersRecord()
+
+    def train_async(driver, node_ids, state, n_versions, policy, accumulate, publish):
+        for version in range(n_versions):
+            accumulate(update, 1.0)
+            report = AsyncReport(
+                version=version + 1,
+                policy=str(policy),
+                received=1,
+                elapsed=1.0,
+                staleness=[1],
+            )
+            publish([metrics], 0.5, report)
+        return ["3@1"]
+
+    with (
+        patch("fl_server.app.requires.train_async", side_effect=train_async),
+        patch("fl_server.app.stages.aggregate_metrics", return_value=metrics),
+        patch("fl_server.app.mlflow_client.log_metrics") as mock_log_metrics,
+        patch.dict(config.global_vars, {**config_dict, "aggregator": aggregator}),
+    ):
+        state = RoundState(
+            ParametersRecord(
+                {"weight": ndarray_to_array(np.zeros(3, dtype=np.float32))}
+            )
+        )
+        _async_training_loop(driver, node_ids, state, 2, AsyncPolicy(buffer_size=1))
+
+    # Each published version steps along the buffered update, scaled down by the
+    # staleness discount
+    assert state.version == 2
+    assert np.array_equal(array_to_ndarray(state.parameters["weight"]), [2.0] * 3)
+    assert aggregator.accumulate.call_count == 2
+    assert aggregator.begin_round.call_count == 3
+    assert [c.kwargs["step"] for c in mock_log_metrics.call_args_list] == [0, 1]
+    # The replies still to come are dropped
+    driver.pull_messages.assert_called_once_with(message_ids=["3@1"])
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        {"async_buffer_size": 2},
+        {"sample_count": 2, "sample_strata": 2},
+    ],
+)
+def test_get_serverapp_weighted_robust(task, driver, update):
+    task = task.model_copy(update={**update, "robust_aggregation": "median"})
+    status_client = MagicMock(is_open=True)
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch("fl_server.app.requires.setup_clients") as mock_setup_clients,
+    ):
+        with pytest.raises(ValueError):
+            get_serverapp(task, status_client)._main(driver, MagicMock())
+
+    # The task fails before the nodes are set up
+    mock_setup_clients.assert_not_called()
+
+
+def test_get_serverapp(task, driver, node_ids, parameters, config_dict):
     context = MagicMock()
     filtered_node_ids = [2, 3]
 
     with (
-        patch("fl_server.app.requires.filter_clients") as mock_requires_filter_clients,
         patch("fl_server.app._mlflow_config") as mock_mlflow_config,
-        patch("fl_server.app._model_and_data") as mock_model_and_data,
-        patch(
-            "fl_server.app.requires.get_parameters_from_one_node"
-        ) as mock_requires_get_parameters_from_one_node,
-        patch("fl_server.app.requires.set_parameters") as mock_requires_set_parameters,
+        patch("fl_server.app.stages.load_model") as mock_stages_load_model,
+        patch("fl_server.app.requires.setup_clients") as mock_requires_setup_clients,
         patch("fl_server.app._training_loop") as mock_training_loop,
         patch("fl_server.app.requires.upload_model") as mock_requires_upload_model,
         patch(
@@ -170,30 +378,325 @@ def test_get_serverapp(task, driver, node_ids, parameters):
         ) as mock_mlflow_client_clean_current_config,
         patch("fl_server.app.requires.clean_config") as mock_requires_clean_config,
         patch("fl_server.app.rabbitmq_client.setup_rabbitmq") as mock_setup_rabbitmq,
+        patch.dict(config.global_vars, config_dict) as mock_global_vars,
     ):
-        mock_requires_filter_clients.return_value = filtered_node_ids
-        mock_requires_get_parameters_from_one_node.return_value = parameters
+        mock_mlflow_config.return_value = ("experiment_id", "parent_run_id")
+        mock_requires_setup_clients.return_value = (filtered_node_ids, parameters)
         mock_setup_rabbitmq.return_value = MagicMock()
 
         app = get_serverapp(task)
         app._main(driver, context)
 
-        mock_requires_filter_clients.assert_called_once_with(
-            driver, node_ids, task.use_case
-        )
-        mock_mlflow_config.assert_called_once_with(task, driver, filtered_node_ids)
-        mock_model_and_data.assert_called_once_with(task, driver, filtered_node_ids)
-        mock_requires_get_parameters_from_one_node.assert_called_once_with(
-            driver, filtered_node_ids
-        )
-        mock_requires_set_parameters.assert_called_once_with(
-            driver, filtered_node_ids, parameters
+        mock_mlflow_config.assert_called_once_with(task)
+        # The task loads its model into state of its own
+        task_vars = mock_stages_load_model.call_args.args[0]
+        assert task_vars is not mock_global_vars
+        assert task_vars == config.new_global_vars()
+        # The nodes are reached through a driver checking for cancellations
+        controlled = mock_requires_setup_clients.call_args.args[0]
+        assert isinstance(controlled, ControlledDriver)
+        assert controlled.driver is driver
+        mock_requires_setup_clients.assert_called_once_with(
+            controlled, node_ids, task, "experiment_id", "parent_run_id"
         )
         mock_training_loop.assert_called_once_with(
-            driver, filtered_node_ids, parameters, task.num_global_iterations
+            controlled,
+            filtered_node_ids,
+            RoundState(parameters),
+            task.num_global_iterations,
+            RoundPolicy.from_task(task),
+            None,
+            None,
+            task_vars,
+            controlled.control,
+            None,
         )
         mock_requires_upload_model.assert_called_once_with(
-            driver, filtered_node_ids, parameters
+            controlled, filtered_node_ids, parameters
         )
         mock_mlflow_client_clean_current_config.assert_called_once()
         mock_requires_clean_config.assert_called_once_with(driver, filtered_node_ids)
+
+
+def test_get_serverapp_status_client(task, driver, parameters):
+    status_client = MagicMock(is_open=True)
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch(
+            "fl_server.app.requires.setup_clients", return_value=([2, 3], parameters)
+        ),
+        patch("fl_server.app._training_loop"),
+        patch("fl_server.app.requires.upload_model"),
+        patch("fl_server.app.mlflow_client.clean_current_config"),
+        patch("fl_server.app.requires.clean_config"),
+        patch("fl_server.app.rabbitmq_client.setup_rabbitmq") as mock_setup_rabbitmq,
+    ):
+        get_serverapp(task, status_client)._main(driver, MagicMock())
+        # A closed connection of the worker is replaced for the task
+        status_client.is_open = False
+        get_serverapp(task, status_client)._main(driver, MagicMock())
+
+    status_client.publish_message.assert_any_call(f"Task {task.id} running")
+    mock_setup_rabbitmq.assert_called_once()
+
+
+def test_open_status_client():
+    status_client = MagicMock(is_open=True)
+    assert open_status_client(status_client) is status_client
+
+    # The broker closed the idle connection, still seen as open
+    status_client.probe.side_effect = StreamLostError()
+    with patch("fl_server.app.rabbitmq_client.setup_rabbitmq") as mock_setup_rabbitmq:
+        assert open_status_client(status_client) is mock_setup_rabbitmq.return_value
+
+
+def test_get_serverapp_cancelled(task, driver, parameters):
+    status_client = MagicMock(is_open=True)
+    control_client = status_client.for_topic.return_value
+
+    def cancel(*args):
+        control_client.listen.return_value = "cancel"
+        args[-2].check()
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch(
+            "fl_server.app.requires.setup_clients", return_value=([2, 3], parameters)
+        ),
+        patch("fl_server.app._training_loop", side_effect=cancel),
+        patch("fl_server.app.requires.upload_model") as mock_upload_model,
+        patch("fl_server.app.mlflow_client.current_context") as mock_context,
+        patch("fl_server.app.mlflow_client.clean_current_config") as mock_clean,
+        patch("fl_server.app.requires.clean_config") as mock_clean_config,
+        patch.object(config, "CONTROL_POLL_INTERVAL", 0.0),
+    ):
+        mock_context.return_value.configured = True
+        get_serverapp(task, status_client)._main(driver, MagicMock())
+
+    # The federation stops, the nodes set up and the MLflow runs are cleaned, and
+    # the control queue of the task is removed
+    status_client.for_topic.assert_called_once_with(f"control.{task.id}", True)
+    mock_upload_model.assert_not_called()
+    mock_clean.assert_called_once_with("KILLED")
+    mock_clean_config.assert_called_once_with(driver, [2, 3])
+    status_client.publish_message.assert_called_with(f"Task {task.id} cancelled")
+    control_client.delete.assert_called_once()
+
+
+def test_get_serverapp_disjoint_nodes(task, driver, parameters):
+    claims = NodeClaims()
+    claims.claim(7, [1])
+    free_node_ids = []
+
+    def setup_clients(driver, node_ids, *args):
+        free_node_ids.append(node_ids)
+        # The nodes the task is set up on are claimed while it runs
+        assert claims.free([1, 2, 3]) == []
+        return [2], parameters
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch("fl_server.app.requires.setup_clients", side_effect=setup_clients),
+        patch("fl_server.app._training_loop") as mock_training_loop,
+        patch("fl_server.app.requires.upload_model"),
+        patch("fl_server.app.mlflow_client.clean_current_config"),
+        patch("fl_server.app.requires.clean_config"),
+    ):
+
+        def train(*args):
+            # Only the nodes kept after the setup stay claimed
+            assert claims.free([1, 2, 3]) == [3]
+
+        mock_training_loop.side_effect = train
+        get_serverapp(task, MagicMock(is_open=True), claims)._main(driver, MagicMock())
+
+    # The node running another task is left out, and the task's nodes are released
+    assert free_node_ids == [[2, 3]]
+    assert claims.free([1, 2, 3]) == [2, 3]
+
+
+def test_get_serverapp_waits_for_free_nodes(task, driver, parameters):
+    claims = NodeClaims()
+    claims.claim(7, [1, 2, 3])
+
+    def sleep(seconds):
+        claims.release(7)
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch(
+            "fl_server.app.requires.setup_clients", return_value=([2, 3], parameters)
+        ) as mock_setup_clients,
+        patch("fl_server.app._training_loop"),
+        patch("fl_server.app.requires.upload_model"),
+        patch("fl_server.app.mlflow_client.clean_current_config"),
+        patch("fl_server.app.requires.clean_config"),
+        patch("fl_server.app.time.sleep", side_effect=sleep) as mock_sleep,
+    ):
+        get_serverapp(task, MagicMock(is_open=True), claims)._main(driver, MagicMock())
+
+    # The task is held until the other task released the nodes
+    mock_sleep.assert_called_once()
+    assert mock_setup_clients.call_args.args[1] == [1, 2, 3]
+
+
+def test_get_serverapp_cancelled_while_pending(task, driver):
+    status_client = MagicMock(is_open=True)
+    control_client = status_client.for_topic.return_value
+    control_client.listen.return_value = "cancel"
+
+    with (
+        patch("fl_server.app._mlflow_config") as mock_mlflow_config,
+        patch("fl_server.app.requires.clean_config") as mock_clean_config,
+    ):
+        get_serverapp(task, status_client)._main(driver, MagicMock())
+
+    # The task is not started, nor reported as running over its cancellation
+    mock_mlflow_config.assert_not_called()
+    mock_clean_config.assert_not_called()
+    status_client.publish_message.assert_called_once_with(f"Task {task.id} cancelled")
+    control_client.delete.assert_called_once()
+
+
+def test_get_serverapp_cancelled_before_setup(task, driver):
+    status_client = MagicMock(is_open=True)
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model", side_effect=TaskCancelled()),
+        patch("fl_server.app.requires.setup_clients") as mock_setup_clients,
+        patch("fl_server.app.mlflow_client.current_context") as mock_context,
+        patch("fl_server.app.mlflow_client.clean_current_config") as mock_clean,
+        patch("fl_server.app.requires.clean_config") as mock_clean_config,
+    ):
+        mock_context.return_value.configured = True
+        get_serverapp(task, status_client)._main(driver, MagicMock())
+
+    # No node was set up, so none is cleaned
+    mock_setup_clients.assert_not_called()
+    mock_clean.assert_called_once_with("KILLED")
+    mock_clean_config.assert_not_called()
+    status_client.publish_message.assert_called_with(f"Task {task.id} cancelled")
+
+
+def test_training_loop_cancelled(driver, parameters):
+    control = MagicMock()
+    control.check.side_effect = TaskCancelled()
+
+    with patch("fl_server.app.requires.train_model") as mock_train_model:
+        with pytest.raises(TaskCancelled):
+            _training_loop(
+                driver,
+                [1, 2],
+                RoundState(parameters),
+                3,
+                RoundPolicy(),
+                global_vars=config.new_global_vars(),
+                control=control,
+            )
+
+    # The round is not started once the task is cancelled
+    mock_train_model.assert_not_called()
+
+
+def test_get_serverapp_resumed(task, driver, parameters):
+    task = task.model_copy(update={"checkpoint_every": 2, "server_optimizer": "adam"})
+    checkpoint = Checkpoint(task, 4, ParametersRecord(), [3, 4], {"m": parameters})
+    store = MagicMock()
+    store.load.return_value = checkpoint
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch(
+            "fl_server.app.requires.setup_clients", return_value=([2, 3], parameters)
+        ),
+        patch("fl_server.app._checkpoint_store", return_value=store),
+        patch("fl_server.app._training_loop") as mock_training_loop,
+        patch("fl_server.app.requires.upload_model"),
+        patch("fl_server.app.mlflow_client.clean_current_config"),
+        patch("fl_server.app.requires.clean_config"),
+    ):
+        get_serverapp(task, MagicMock(is_open=True))._main(driver, MagicMock())
+
+    # The loop carries on from the checkpoint, with its parameters and those of
+    # its nodes still connected
+    args = mock_training_loop.call_args.args
+    assert args[1] == [3]
+    assert args[2].parameters is checkpoint.parameters
+    assert args[2].version == 4
+    assert isinstance(args[-1], CheckpointWriter)
+    store.load.assert_called_once_with(task)
+    # The checkpoints of a completed task are removed
+    store.clear.assert_called_once_with(task)
+
+
+def test_get_serverapp_failed(task, driver, parameters):
+    task = task.model_copy(update={"checkpoint_every": 2})
+    store = MagicMock()
+    store.load.return_value = None
+
+    with (
+        patch("fl_server.app._mlflow_config", return_value=("1", "2")),
+        patch("fl_server.app.stages.load_model"),
+        patch(
+            "fl_server.app.requires.setup_clients", return_value=([2, 3], parameters)
+        ),
+        patch("fl_server.app._checkpoint_store", return_value=store),
+        patch("fl_server.app._training_loop", side_effect=RuntimeError),
+        patch("fl_server.app.mlflow_client.current_context") as mock_context,
+        patch("fl_server.app.mlflow_client.clean_current_config") as mock_clean,
+    ):
+        mock_context.return_value.configured = True
+        with pytest.raises(RuntimeError):
+            get_serverapp(task, MagicMock(is_open=True))._main(driver, MagicMock())
+
+    # A failed task ends its runs and drops its checkpoints, not to be resumed
+    mock_clean.assert_called_once_with("FAILED")
+    store.clear.assert_called_once_with(task)
+
+
+def test_training_loop_checkpoints(driver, node_ids, metrics, config_dict):
+    checkpoints = MagicMock()
+
+    with (
+        patch("fl_server.app.requires.train_model") as mock_train_model,
+        patch("fl_server.app.stages.aggregate_parameters"),
+        patch("fl_server.app.stages.aggregate_metrics", return_value=metrics),
+        patch("fl_server.app.mlflow_client.log_metrics"),
+        patch.dict(config.global_vars, config_dict),
+    ):
+        mock_train_model.return_value = (
+            [],
+            RoundReport(
+                round=0, policy="", requested=3, received=0, stale=0, elapsed=0
+            ),
+        )
+        state = RoundState(ParametersRecord(), version=3)
+        _training_loop(
+            driver, node_ids, state, 5, RoundPolicy(), checkpoints=checkpoints
+        )
+
+    # A resumed loop runs the rounds left, offering each version to the writer
+    assert mock_train_model.call_count == 2
+    assert checkpoints.after_version.call_count == 2
+    assert state.version == 5
+
+
+def test_create_artifact_cache(tmp_path):
+    with patch.object(config, "ARTIFACT_CACHE_DIR", None):
+        assert create_artifact_cache() is None
+    with (
+        patch.object(config, "ARTIFACT_CACHE_DIR", str(tmp_path)),
+        patch.object(config, "ARTIFACT_CACHE_MB", 10),
+    ):
+        cache = create_artifact_cache()
+
+    # The models are loaded through a cache shared with the processes of the host
+    assert cache.root == str(tmp_path)
+    assert cache.max_bytes == 10 * 2**20
@@ -24,3 +24,23 @@ def test_run_server_app():
     )
     server_app.assert_called_once()
     mock_driver.return_value.close.assert_called_once()
+
+
+def test_run_server_app_reuses_driver_helper():
+    server_app = MagicMock(ServerApp)
+    driver_helper = MagicMock()
+    driver_helper.create_run.return_value.run_id = 7
+
+    with (
+        patch.object(app_utils, "update_console_handler"),
+        patch.object(app_utils, "GrpcDriver") as mock_driver,
+    ):
+        app_utils.run_server_app(server_app, "url", driver_helper=driver_helper)
+
+    # The task gets a run of its own over the channel, which stays open
+    driver = mock_driver.return_value
+    assert driver.driver_helper is driver_helper
+    assert driver.run_id == 7
+    server_app.assert_called_once_with(driver, server_app.call_args.args[1])
+    driver.close.assert_not_called()
+    driver_helper.disconnect.assert_not_called()
@@ -0,0 +1,159 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from fl_server.checkpoints import (
+    Checkpoint,
+    CheckpointWriter,
+    DirectoryStore,
+    MlflowStore,
+    TASK_TAG,
+    end_runs,
+    is_running,
+    tag_run,
+)
+from fl_server.optimizers import ServerOptimizer
+from fl_server.rounds import RoundState
+
+from interfaces.array_serde import array_to_ndarray
+from schemas.task import Task
+from interfaces.testing import full_parameters
+
+
+@pytest.fixture
+def task():
+    return Task(
+        user_id="user_id",
+        use_case="use_case",
+        model_name="model_name",
+        model_version=1,
+        num_global_iterations=10,
+        id=1,
+        status="pending",
+        created_at="2021-08-01T00:00:00",
+        run_name="run_name",
+        experiment_name="experiment_name",
+        checkpoint_every=2,
+    )
+
+
+def _checkpoint(task, version):
+    return Checkpoint(
+        task, version, full_parameters(version), [2, 3], {"m": full_parameters(0.5)}
+    )
+
+
+def test_checkpoint_bytes(task):
+    checkpoint = Checkpoint.from_bytes(_checkpoint(task, 4).to_bytes())
+
+    assert checkpoint.task == task
+    assert checkpoint.version == 4
+    assert checkpoint.node_ids == [2, 3]
+    assert np.array_equal(array_to_ndarray(checkpoint.parameters["weight"]), [4] * 3)
+    assert list(checkpoint.optimizer) == ["m"]
+
+
+def test_directory_store(task, tmp_path):
+    store = DirectoryStore(str(tmp_path))
+    other = task.model_copy(update={"id": 2})
+    assert store.load(task) is None
+
+    store.save(_checkpoint(task, 2))
+    store.save(_checkpoint(task, 4))
+    store.save(_checkpoint(other, 2))
+
+    # Only the latest checkpoint of each task is kept
+    assert len(list((tmp_path / "task_1").iterdir())) == 1
+    assert store.load(task).version == 4
+    assert [t.id for t in store.pending()] == [1, 2]
+
+    store.clear(task)
+    assert store.load(task) is None
+    assert [t.id for t in store.pending()] == [2]
+
+
+def test_mlflow_store(task):
+    store = MlflowStore("new_run")
+    with patch("fl_server.checkpoints.mlflow_client") as mock_client:
+        store.save(_checkpoint(task, 2))
+        store.save(_checkpoint(task, 4))
+        mock_client.find_runs.return_value = ["new_run", "old_run"]
+        mock_client.list_artifacts.return_value = [MlflowStore.PATH]
+        mock_client.load_artifact_bytes.return_value = _checkpoint(task, 6).to_bytes()
+        checkpoint = store.load(task)
+
+    # Each checkpoint is logged as an artifact over the previous one
+    assert [c.args[2] for c in mock_client.log_artifact_bytes.call_args_list] == [
+        MlflowStore.PATH
+    ] * 2
+    # The interrupted run is resumed from, and ends as killed
+    mock_client.list_artifacts.assert_called_once_with("old_run", "checkpoints")
+    mock_client.set_run_status.assert_called_once_with("old_run", "KILLED")
+    assert checkpoint.version == 6
+
+
+def test_is_running(task):
+    with patch("fl_server.checkpoints.mlflow_client") as mock_client:
+        tag_run("run", task)
+        mock_client.find_runs.return_value = []
+        assert not is_running(task)
+        mock_client.find_runs.return_value = ["run"]
+        assert is_running(task)
+
+    mock_client.set_run_tag.assert_called_once_with("run", TASK_TAG, "1")
+    assert mock_client.find_runs.call_args.args[1] == (
+        f"tags.{TASK_TAG} = '1' and attributes.status = 'RUNNING'"
+    )
+
+
+def test_end_runs(task):
+    with patch("fl_server.checkpoints.mlflow_client") as mock_client:
+        mock_client.find_runs.return_value = ["parent", "child"]
+        end_runs(task, "FAILED")
+
+    mock_client.set_run_status.assert_any_call("parent", "FAILED")
+    mock_client.set_run_status.assert_any_call("child", "FAILED")
+
+
+def test_checkpoint_writer(task):
+    store = MagicMock()
+    saving = threading.Event()
+    release = threading.Event()
+
+    def save(checkpoint):
+        saving.set()
+        release.wait(5)
+
+    store.save.side_effect = save
+    writer = CheckpointWriter(store, task, 2)
+    state = RoundState(full_parameters(0))
+    optimizer = ServerOptimizer("adam")
+    optimizer.step(full_parameters(0), full_parameters(1))
+
+    for version in range(1, 7):
+        state.version = version
+        writer.after_version(state, [1, 2], optimizer)
+        if version == 2:
+            saving.wait(5)
+    release.set()
+    writer.close()
+
+    # Every second version is taken, the loop not waiting for the store: version 4
+    # is replaced by version 6 while version 2 is still being saved
+    assert [c.args[0].version for c in store.save.call_args_list] == [2, 6]
+    assert set(store.save.call_args.args[0].optimizer) == {"m", "v"}
+
+
+def test_checkpoint_writer_failure(task):
+    store = MagicMock()
+    store.save.side_effect = [OSError("disk full"), None]
+    writer = CheckpointWriter(store, task, 1)
+    state = RoundState(full_parameters(0), version=1)
+
+    writer.after_version(state, [1])
+    writer.close()
+
+    # A failed checkpoint leaves the training running
+    store.save.assert_called_once()
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flwr.server import Driver
+
+from fl_server.control import ControlChannel, ControlledDriver, TaskCancelled
+from fl_server.utils.driver_utils import wait_messages
+
+from interfaces.rabbitmq_client import RabbitMQClient
+
+
+def test_control_channel_reads_at_most_every_interval():
+    client = MagicMock(RabbitMQClient)
+    client.listen.return_value = None
+    control = ControlChannel(client, interval=60)
+
+    control.check()
+    client.listen.return_value = "cancel"
+    control.check()
+
+    # The queue is read once per interval, the first time at once
+    client.listen.assert_called_once_with(None, blocking=False)
+
+    control = ControlChannel(client, interval=0)
+    with pytest.raises(TaskCancelled):
+        control.check()
+    # The cancellation holds without reading the queue again
+    client.listen.return_value = None
+    with pytest.raises(TaskCancelled):
+        control.check()
+    assert client.listen.call_count == 2
+
+
+def test_controlled_driver_stops_waiting():
+    driver = MagicMock(Driver)
+    driver.pull_messages.return_value = []
+    client = MagicMock(RabbitMQClient)
+    client.listen.side_effect = [None, None, "cancel"]
+    controlled = ControlledDriver(driver, ControlChannel(client, interval=0))
+
+    with pytest.raises(TaskCancelled):
+        wait_messages(controlled, ["1", "2"], poll_interval=0.0)
+
+    # Replies were pulled until the cancellation was read
+    assert driver.pull_messages.call_count == 2
@@ -1,11 +1,12 @@
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 from flwr.common import DEFAULT_TTL, Message, RecordSet, Metadata
 from flwr.server.driver import GrpcDriver as Driver
 
 from fl_server.utils.driver_utils import (
     create_messages,
+    discard_messages,
     send_messages,
     wait_messages,
 )
@@ -75,3 +76,87 @@ def test_wait_messages(driver, message_ids):
     ) as mock_pull_messages:
         _ = wait_messages(driver, message_ids)
     mock_pull_messages.assert_called_with(message_ids=message_ids)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_wait_messages_backoff(message_ids):
+    driver = MagicMock(spec=Driver)
+    driver.pull_messages.side_effect = [[], [], [], ["1"], [], ["2", "3"]]
+    clock = FakeClock()
+    received = []
+
+    with patch("fl_server.utils.driver_utils.time", clock):
+        replies = wait_messages(
+            driver,
+            message_ids,
+            on_reply=received.append,
+            poll_interval=0.01,
+            max_poll_interval=0.03,
+        )
+
+    assert replies == ["1", "2", "3"]
+    assert received == replies
+    assert clock.sleeps == [0.01, 0.02, 0.03, 0.01, 0.02]
+
+
+def test_wait_messages_timeout(message_ids):
+    driver = MagicMock(spec=Driver)
+    driver.pull_messages.side_effect = (
+        lambda message_ids: ["1"] if clock.now == 0 else []
+    )
+    clock = FakeClock()
+
+    with patch("fl_server.utils.driver_utils.time", clock):
+        replies = wait_messages(
+            driver, message_ids, timeout=1.0, poll_interval=0.5, max_poll_interval=0.8
+        )
+
+    assert replies == ["1"]
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_wait_messages_min_replies(message_ids):
+    driver = MagicMock(spec=Driver)
+    driver.pull_messages.side_effect = [["1"], ["2"], ["3"]]
+    clock = FakeClock()
+
+    with patch("fl_server.utils.driver_utils.time", clock):
+        replies = wait_messages(driver, message_ids, min_replies=2)
+
+    assert replies == ["1", "2"]
+    assert driver.pull_messages.call_count == 2
+
+
+def test_wait_messages_counts(message_ids):
+    driver = MagicMock(spec=Driver)
+    driver.pull_messages.side_effect = [["failed"], ["1"], ["2"]]
+    clock = FakeClock()
+
+    with patch("fl_server.utils.driver_utils.time", clock):
+        replies = wait_messages(
+            driver, message_ids, min_replies=2, counts=lambda r: r != "failed"
+        )
+
+    # Replies not counted are collected, without making up the replies required
+    assert replies == ["failed", "1", "2"]
+
+
+def test_discard_messages(message_ids):
+    driver = MagicMock(spec=Driver)
+    driver.pull_messages.return_value = ["1"]
+
+    assert discard_messages(driver, message_ids) == 1
+    driver.pull_messages.assert_called_once_with(message_ids=message_ids)
+    assert discard_messages(driver, []) == 0
@@ -0,0 +1,230 @@
+from typing import Callable, Iterable, Optional
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from flwr.common import (
+    DEFAULT_TTL,
+    ConfigsRecord,
+    Message,
+    MessageType,
+    Metadata,
+    MetricsRecord,
+    ParametersRecord,
+    RecordSet,
+)
+from flwr.server import Driver
+
+from fl_server import config, intermediate, requires
+from fl_server.rounds import RoundState
+import interfaces.recordset
+from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+
+
+class ReplyingDriver(Driver):
+    # Answers each message with reply(node_id, content) when it is pulled
+    def __init__(
+        self, node_ids: list[int], reply: Callable[[int, Message], RecordSet]
+    ) -> None:
+        self.node_ids = node_ids
+        self.reply = reply
+        self.pending: dict[str, Message] = {}
+
+    def create_message(
+        self,
+        content: RecordSet,
+        message_type: str,
+        dst_node_id: int,
+        group_id: str,
+        ttl: Optional[float] = None,
+    ) -> Message:
+        metadata = Metadata(
+            run_id=0,
+            message_id="",
+            src_node_id=0,
+            dst_node_id=dst_node_id,
+            reply_to_message="",
+            group_id=group_id,
+            ttl=DEFAULT_TTL if ttl is None else ttl,
+            message_type=message_type,
+        )
+        return Message(metadata=metadata, content=content)
+
+    def get_node_ids(self) -> list[int]:
+        return self.node_ids
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        message_ids = []
+        for message in messages:
+            message_id = str(len(self.pending) + 1)
+            message.metadata._message_id = message_id
+            self.pending[message_id] = message
+            message_ids.append(message_id)
+        return message_ids
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        replies = []
+        for message_id in list(message_ids):
+            message = self.pending.pop(message_id, None)
+            if message is not None:
+                content = self.reply(message.metadata.dst_node_id, message)
+                reply = message.create_reply(content, ttl=DEFAULT_TTL)
+                replies.append(reply)
+        return replies
+
+    def send_and_receive(
+        self, messages: Iterable[Message], *, timeout: Optional[float] = None
+    ) -> Iterable[Message]:
+        raise NotImplementedError()
+
+
+def _train_content(node_id: int, msg: Message) -> RecordSet:
+    # Leaf i replies with parameters equal to i, trained on 10 * i examples
+    parameters = ParametersRecord(
+        {
+            "weight": ndarray_to_array(np.full(3, node_id, dtype=np.float32)),
+            "steps": ndarray_to_array(np.array(node_id, dtype=np.int64)),
+        }
+    )
+    configsrecord = ConfigsRecord(
+        {"success": True, "message": "", "num_examples": 10 * node_id}
+    )
+    return RecordSet(
+        parameters_records={"parameters": parameters},
+        metrics_records={"metrics": MetricsRecord({"loss": float(node_id)})},
+        configs_records={"config": configsrecord},
+    )
+
+
+def _train_message(driver: Driver) -> Message:
+    content = interfaces.recordset.create_train_model_recordset(ParametersRecord(), 0)
+    return driver.create_message(content, MessageType.TRAIN, 1, "train_model")
+
+
+@pytest.fixture(autouse=True)
+def no_polling():
+    with patch.object(config, "POLL_INTERVAL", 0.0):
+        yield
+
+
+def test_relay_train():
+    driver = ReplyingDriver([1, 2, 4], _train_content)
+
+    reply = intermediate.relay_train(
+        _train_message(driver), driver, {"leaf_ids": [1, 2, 4]}
+    )
+
+    # One update weighted by the examples of each leaf, standing for all of them
+    parameters = reply.content.parameters_records["parameters"]
+    assert np.allclose(array_to_ndarray(parameters["weight"]), 3.0)
+    assert array_to_ndarray(parameters["steps"]) == 3
+    assert reply.content.configs_records["config"]["num_examples"] == 70
+    assert reply.content.metrics_records["metrics"]["loss"] == 3.0
+
+
+def test_relay_train_counts_folded_leaves():
+    def reply(node_id: int, msg: Message) -> RecordSet:
+        if node_id == 2:
+            config = ConfigsRecord({"success": False, "message": "out of memory"})
+            return RecordSet(configs_records={"config": config})
+        return _train_content(node_id, msg)
+
+    driver = ReplyingDriver([1, 2, 4], reply)
+
+    result = intermediate.relay_train(
+        _train_message(driver), driver, {"leaf_ids": [1, 2, 4]}
+    )
+
+    # The failed leaf is left out of the average and of the count
+    config = result.content.configs_records["config"]
+    assert config["message"] == "aggregated 2 leaves"
+    assert config["num_examples"] == 50
+
+
+def test_hierarchy_matches_flat_aggregation():
+    leaves = {10: [1, 2], 20: [3, 4, 5]}
+    leaf_drivers = {i: ReplyingDriver(ids, _train_content) for i, ids in leaves.items()}
+
+    def relay(node_id: int, msg: Message) -> RecordSet:
+        driver = leaf_drivers[node_id]
+        reply = intermediate.relay_train(msg, driver, {"leaf_ids": leaves[node_id]})
+        return reply.content
+
+    root = ReplyingDriver(list(leaves), relay)
+    flat = ReplyingDriver([1, 2, 3, 4, 5], _train_content)
+    state = RoundState(ParametersRecord())
+    results = {}
+    for name, driver in [("root", root), ("flat", flat)]:
+        sums, total = np.zeros(3), 0.0
+
+        def accumulate(parameters: ParametersRecord, weight: float) -> None:
+            nonlocal sums, total
+            sums = sums + weight * array_to_ndarray(parameters["weight"])
+            total += weight
+
+        requires.train_model(
+            driver, driver.get_node_ids(), state, 0, accumulate=accumulate
+        )
+        results[name] = sums / total
+
+    # The root sees two nodes, and gets the same weighted average as with all leaves
+    assert np.allclose(results["root"], results["flat"])
+    assert np.allclose(results["flat"], 55 / 15)
+
+
+def test_relay_query_filters_leaves():
+    def reply(node_id: int, msg: Message) -> RecordSet:
+        mode = msg.content.configs_records["config"]["mode"]
+        if mode == "filter_clients":
+            config = ConfigsRecord({"participate": node_id != 2})
+        else:
+            config = ConfigsRecord({"success": node_id != 3, "message": ""})
+        return RecordSet(configs_records={"config": config})
+
+    driver = ReplyingDriver([1, 2, 3], reply)
+    relay_vars = {"leaf_ids": None}
+
+    filtered = intermediate.relay_query(
+        driver.create_message(
+            interfaces.recordset.create_filter_clients_recordset("iris"),
+            MessageType.QUERY,
+            1,
+            "filter_message",
+        ),
+        driver,
+        relay_vars,
+    )
+    assert filtered.content.configs_records["config"]["participate"]
+    assert relay_vars["leaf_ids"] == [1, 3]
+
+    # A stage succeeds only if every leaf succeeded
+    loaded = intermediate.relay_query(
+        driver.create_message(
+            interfaces.recordset.create_prepare_data_recordset(),
+            MessageType.QUERY,
+            1,
+            "prepare_data",
+        ),
+        driver,
+        relay_vars,
+    )
+    assert not loaded.content.configs_records["config"]["success"]
+
+
+def test_relay_train_missing_base():
+    def reply(node_id: int, msg: Message) -> RecordSet:
+        if node_id == 2:
+            config = ConfigsRecord(
+                {"success": False, "missing_base": True, "message": ""}
+            )
+            return RecordSet(configs_records={"config": config})
+        return _train_content(node_id, msg)
+
+    driver = ReplyingDriver([1, 2], reply)
+
+    result = intermediate.relay_train(
+        _train_message(driver), driver, {"leaf_ids": [1, 2]}
+    )
+
+    # The root resends the full model to the intermediate, for all its leaves
+    assert result.content.configs_records["config"]["missing_base"]
@@ -1,12 +1,18 @@
 import importlib
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
+from flwr.common import ParametersRecord
 from flwr.server import ServerApp
 
-from fl_server.main import event_handler
+from fl_server import main
+from fl_server.main import TaskPool, event_handler
 from fl_server import config
+from fl_server.checkpoints import Checkpoint, DirectoryStore
 
+from interfaces import mlflow_client
 from schemas.task import TaskRead
 
 
@@ -89,3 +95,112 @@ def test_event_handler(task):
         mock_model_validate_json.assert_called_once_with(task.model_dump_json())
         mock_get_serverapp.assert_called_once_with(task)
         mock_run_server_app.assert_called_once_with(mock_get_serverapp.return_value, "")
+
+
+def test_event_handler_concurrent(task):
+    with (
+        patch.object(config, "MAX_CONCURRENT_TASKS", 2),
+        patch.object(main, "_task_pool", None),
+        patch("fl_server.main.TaskPool") as mock_task_pool,
+        patch("fl_server.main.run_task") as mock_run_task,
+    ):
+        event_handler(MagicMock(), MagicMock(), MagicMock(), task.model_dump_json())
+        event_handler(MagicMock(), MagicMock(), MagicMock(), task.model_dump_json())
+
+    # Tasks are handed over to a single pool instead of run by the consumer
+    mock_task_pool.assert_called_once_with(2)
+    assert mock_task_pool.return_value.submit.call_count == 2
+    mock_run_task.assert_not_called()
+
+
+def test_task_pool(task):
+    running = []
+    peak = 0
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def run_task(task):
+        nonlocal peak
+        with lock:
+            running.append(task)
+            peak = max(peak, len(running))
+        release.wait(5)
+        with lock:
+            running.remove(task)
+        if task.id == 3:
+            raise RuntimeError("task failed")
+
+    pool = TaskPool(2)
+    tasks = [task.model_copy(update={"id": i}) for i in range(1, 4)]
+    with patch("fl_server.main.run_task", side_effect=run_task):
+        futures = [pool.submit(t) for t in tasks[:2]]
+        # A third task waits for a free slot
+        submitter = threading.Thread(
+            target=lambda: futures.append(pool.submit(tasks[2]))
+        )
+        submitter.start()
+        time.sleep(0.1)
+        assert submitter.is_alive()
+        release.set()
+        submitter.join(5)
+        pool.shutdown()
+
+    assert peak == 2
+    assert [f.exception() is None for f in futures] == [True, True, False]
+
+
+def test_run_task_context(task):
+    contexts = []
+
+    def run_server_app(app, superlink_url):
+        contexts.append(mlflow_client.current_context())
+
+    with (
+        patch("fl_server.main.get_serverapp"),
+        patch("fl_server.main.run_server_app", side_effect=run_server_app),
+    ):
+        threads = [
+            threading.Thread(target=main.run_task, args=(task,)) for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        main.run_task(task)
+
+    # Every task gets a fresh MLflow context, unbound once it is done
+    assert len({id(c) for c in contexts}) == 3
+    assert mlflow_client.current_context() not in contexts
+
+
+def test_event_handler_worker_pool(task):
+    pool = MagicMock()
+    with (
+        patch.object(main, "_worker_pool", pool),
+        patch("fl_server.main.run_task") as mock_run_task,
+    ):
+        event_handler(None, None, None, task.model_dump_json().encode())
+
+    # Warm workers take the task instead of the consumer thread
+    pool.submit.assert_called_once()
+    assert pool.submit.call_args.args[0].id == task.id
+    mock_run_task.assert_not_called()
+
+
+def test_resume_tasks(task, tmp_path):
+    store = DirectoryStore(str(tmp_path))
+    ended = task.model_copy(update={"id": task.id + 1})
+    store.save(Checkpoint(task, 1, ParametersRecord(), [1]))
+    store.save(Checkpoint(ended, 1, ParametersRecord(), [1]))
+    with (
+        patch.object(config, "CHECKPOINT_DIR", str(tmp_path)),
+        patch("fl_server.main.is_running", side_effect=lambda t: t.id == task.id),
+        patch("fl_server.main.dispatch") as mock_dispatch,
+    ):
+        main.resume_tasks()
+
+    # Tasks left with a checkpoint are dispatched again when the server starts,
+    # unless their run ended
+    mock_dispatch.assert_called_once()
+    assert mock_dispatch.call_args.args[0].id == task.id
+    assert [t.id for t in store.pending()] == [task.id]
@@ -0,0 +1,15 @@
+from fl_server.nodes import NodeClaims
+
+
+def test_node_claims():
+    claims = NodeClaims()
+    claims.claim(1, [1, 2, 3])
+    claims.claim(2, [4])
+
+    assert claims.free([1, 2, 3, 4, 5]) == [5]
+
+    # A task keeps the nodes it was set up on, and releases them when it ends
+    claims.release(1, keep=[2])
+    assert claims.free([1, 2, 3, 4, 5]) == [1, 3, 5]
+    claims.release(1)
+    assert claims.free([1, 2, 3, 4, 5]) == [1, 2, 3, 5]
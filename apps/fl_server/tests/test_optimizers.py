@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from fl_server.optimizers import ServerOptimizer
+from interfaces.array_serde import (
+    array_to_ndarray,
+    is_packed,
+    pack_parameters,
+)
+from interfaces.testing import parameters_record
+from schemas.task import Task
+
+
+def _record(weight, steps=0):
+    return parameters_record(weight=weight, steps=np.int64(steps))
+
+
+def _weight(parameters):
+    return array_to_ndarray(parameters["weight"])
+
+
+def test_momentum():
+    optimizer = ServerOptimizer("momentum", beta1=0.5)
+    current = _record([0.0, 0.0])
+
+    first = optimizer.step(current, _record([1.0, -1.0], steps=3))
+    second = optimizer.step(first, _record([2.0, -2.0]))
+
+    # The second step carries half of the first update on top of its own
+    assert np.allclose(_weight(first), [1.0, -1.0])
+    assert np.allclose(_weight(second), [2.5, -2.5])
+    # Integer buffers take the aggregated value
+    assert array_to_ndarray(first["steps"]) == 3
+
+
+def test_momentum_without_decay_is_averaging():
+    optimizer = ServerOptimizer("momentum", beta1=0.0)
+    aggregated = _record([0.3, 0.7])
+
+    result = optimizer.step(_record([1.0, 1.0]), aggregated)
+
+    assert np.array_equal(_weight(result), _weight(aggregated))
+
+
+@pytest.mark.parametrize("name", ["adam", "yogi"])
+def test_adaptive_first_step(name):
+    optimizer = ServerOptimizer(name, lr=0.1, beta1=0.9, beta2=0.99, tau=1e-3)
+    delta = np.array([1.0, -0.01], dtype=np.float32)
+
+    result = optimizer.step(_record([0.0, 0.0]), _record(delta))
+
+    # Both start from zero moments, and scale each coordinate by its magnitude
+    expected = 0.1 * 0.1 * delta / (np.sqrt(0.01 * delta**2) + 1e-3)
+    assert np.allclose(_weight(result), expected, rtol=1e-5)
+
+
+def test_yogi_second_moment():
+    adam, yogi = ServerOptimizer("adam"), ServerOptimizer("yogi")
+    current = _record([0.0])
+    for update in [[10.0]] + [[0.1]] * 10:
+        for optimizer in [adam, yogi]:
+            optimizer.step(current, _record(update))
+
+    # Yogi's second moment only moves by the small updates, where Adam's decays
+    # towards them
+    assert np.isclose(yogi.v["weight"][0], 1.0 - 10 * 0.01 * 0.01)
+    assert yogi.v["weight"][0] > adam.v["weight"][0]
+
+
+def test_step_packed():
+    optimizer = ServerOptimizer("adam")
+    current = pack_parameters(_record([0.0, 0.0]))
+
+    result = optimizer.step(current, pack_parameters(_record([1.0, 2.0])))
+
+    assert is_packed(result)
+    assert optimizer.m["weight"].shape == (2,)
+
+
+def test_from_task():
+    task = Task(
+        user_id="user_id",
+        use_case="use_case",
+        model_name="model_name",
+        model_version=1,
+        num_global_iterations=2,
+        run_name="run_name",
+        experiment_name="experiment_name",
+    )
+    assert ServerOptimizer.from_task(task) is None
+
+    task.server_optimizer = "yogi"
+    task.server_beta1 = 0.5
+    optimizer = ServerOptimizer.from_task(task)
+    assert optimizer == ServerOptimizer("yogi", lr=0.1, beta1=0.5)
+
+    with pytest.raises(ValueError):
+        ServerOptimizer("sgd")
+
+
+def test_state_resumes_steps():
+    optimizer = ServerOptimizer("adam", lr=0.1)
+    first = optimizer.step(_record([0.0, 0.0]), _record([1.0, -0.5]))
+    state = optimizer.get_state()
+    second = optimizer.step(first, _record([2.0, 0.5]))
+
+    # A new optimizer set to the saved moments takes the same next step, the
+    # saved state staying as it was taken
+    resumed = ServerOptimizer("adam", lr=0.1)
+    resumed.set_state(state)
+    assert np.array_equal(
+        _weight(resumed.step(first, _record([2.0, 0.5]))), _weight(second)
+    )
+    assert not np.array_equal(
+        array_to_ndarray(state["m"]["weight"]), optimizer.m["weight"]
+    )
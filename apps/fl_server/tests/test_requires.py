@@ -1,5 +1,6 @@
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 from flwr.common import (
     MessageType,
@@ -13,10 +14,20 @@ from flwr.common import (
 )
 from flwr.server import Driver
 
-from fl_server import requires
+from fl_server import config, requires
+from fl_server.rounds import AsyncPolicy, RoundPolicy, RoundState
 from fl_server.utils import requires_utils, driver_utils
 
 import interfaces.recordset
+from interfaces.array_serde import (
+    NUMPY_STYPE,
+    array_to_ndarray,
+    is_packed,
+    ndarray_to_array,
+    pack_parameters,
+)
+from interfaces.delta import add_parameters
+from interfaces.testing import full_parameters
 
 
 @pytest.fixture
@@ -70,13 +81,35 @@ def test_execution_flow(driver, node_ids):
             driver, create_messages_mock.return_value
         )
         wait_messages_mock.assert_called_once_with(
-            driver, send_messages_mock.return_value
+            driver,
+            send_messages_mock.return_value,
+            timeout=config.STAGE_TIMEOUT,
+            on_reply=None,
+            poll_interval=config.POLL_INTERVAL,
+            max_poll_interval=config.POLL_MAX_INTERVAL,
         )
         check_success_clients_mock.assert_called_once_with(
             wait_messages_mock.return_value
         )
 
 
+def test_execution_flow_timeout(driver, node_ids):
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(
+            driver_utils, "wait_messages", return_value=[MagicMock(spec=Message)]
+        ) as wait_messages_mock,
+        patch.dict(config.STAGE_TIMEOUTS, {"group": 5.0}),
+    ):
+        with pytest.raises(TimeoutError):
+            requires.execution_flow(
+                driver, node_ids, MagicMock(), MessageType.QUERY, "group"
+            )
+
+    assert wait_messages_mock.call_args.kwargs["timeout"] == 5.0
+
+
 def test_filter_clients(driver, node_ids, use_case):
     with (
         patch.object(requires, "execution_flow") as mock_flow,
@@ -186,6 +219,141 @@ def test_get_parameters_from_one_node(driver, node_ids):
     assert param_record == message.content.parameters_records["parameters"]
 
 
+def _pipeline_reply(node_id, steps, success=True):
+    modes = [mode for mode, _ in steps]
+    replies = [rs for _, rs in steps]
+    return Message(
+        MagicMock(src_node_id=node_id),
+        interfaces.recordset.create_pipeline_reply_recordset(
+            modes, replies, [success] * len(steps), "ok"
+        ),
+    )
+
+
+def test_setup_clients(driver, node_ids):
+    task = MagicMock(
+        use_case="iris", model_name="model_name", model_version=1, compression=None
+    )
+    pr = ParametersRecord()
+    ok = RecordSet(configs_records={"config": ConfigsRecord({"success": True})})
+    replies = [
+        _pipeline_reply(
+            1,
+            [
+                ("filter_clients", ok),
+                ("get_parameters", RecordSet(parameters_records={"parameters": pr})),
+            ],
+        ),
+        _pipeline_reply(2, [("filter_clients", ok)], success=False),
+        _pipeline_reply(3, [("filter_clients", ok)]),
+    ]
+
+    with (
+        patch.object(driver_utils, "create_messages", return_value=[]) as mock_create,
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(driver_utils, "wait_messages", return_value=replies),
+        patch.object(requires, "get_parameters_from_one_node") as mock_get_params,
+    ):
+        filtered_node_ids, parameters = requires.setup_clients(
+            driver, node_ids, task, "experiment_id", "run_id"
+        )
+
+    first, rest = mock_create.call_args_list
+    assert first.args[3] == node_ids[:1]
+    assert rest.args[3] == node_ids[1:]
+    first_steps = first.args[1].configs_records["config"]["steps"]
+    assert first_steps == [
+        "filter_clients",
+        "set_run_config",
+        "load_data",
+        "load_model",
+        "prepare_data",
+        "get_parameters",
+    ]
+    assert rest.args[1].configs_records["config"]["steps"] == first_steps[:-1]
+    assert filtered_node_ids == [1, 3]
+    assert parameters is pr
+    mock_get_params.assert_not_called()
+
+
+def test_setup_clients_fallback(driver, node_ids):
+    task = MagicMock(
+        use_case="iris", model_name="model_name", model_version=1, compression=None
+    )
+    ok = RecordSet(configs_records={"config": ConfigsRecord({"success": True})})
+    replies = [_pipeline_reply(2, [("filter_clients", ok)])]
+
+    with (
+        patch.object(driver_utils, "create_messages", return_value=[]),
+        patch.object(driver_utils, "send_messages", return_value=["2"]),
+        patch.object(driver_utils, "wait_messages", return_value=replies),
+        patch.object(requires, "get_parameters_from_one_node") as mock_get_params,
+    ):
+        filtered_node_ids, parameters = requires.setup_clients(
+            driver, node_ids, task, "experiment_id", "run_id"
+        )
+
+    mock_get_params.assert_called_once_with(driver, [2])
+    assert parameters == mock_get_params.return_value
+
+
+def test_setup_clients_cleans_dropped_nodes(driver, node_ids):
+    task = MagicMock(
+        use_case="iris", model_name="model_name", model_version=1, compression=None
+    )
+    ok = RecordSet(configs_records={"config": ConfigsRecord({"success": True})})
+    failed = RecordSet(configs_records={"config": ConfigsRecord({"success": False})})
+    steps = [("filter_clients", ok), ("set_run_config", ok)]
+    replies = [
+        _pipeline_reply(1, steps),
+        # Node 2 fails to load its data once its run config was set
+        Message(
+            MagicMock(src_node_id=2),
+            interfaces.recordset.create_pipeline_reply_recordset(
+                ["filter_clients", "set_run_config", "load_data"],
+                [ok, ok, failed],
+                [True, True, False],
+                "failed",
+            ),
+        ),
+        _pipeline_reply(3, [("filter_clients", failed)], success=False),
+    ]
+
+    with (
+        patch.object(driver_utils, "create_messages", return_value=[]),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(driver_utils, "wait_messages", return_value=replies),
+        patch.object(requires, "get_parameters_from_one_node"),
+        patch.object(requires, "clean_config") as mock_clean_config,
+    ):
+        filtered_node_ids, _ = requires.setup_clients(
+            driver, node_ids, task, "experiment_id", "run_id"
+        )
+
+    assert filtered_node_ids == [1]
+    mock_clean_config.assert_called_once_with(driver, [2])
+
+
+def test_setup_clients_timeout(driver, node_ids):
+    task = MagicMock(
+        use_case="iris", model_name="model_name", model_version=1, compression=None
+    )
+    ok = RecordSet(configs_records={"config": ConfigsRecord({"success": True})})
+    replies = [_pipeline_reply(1, [("filter_clients", ok), ("set_run_config", ok)])]
+
+    with (
+        patch.object(driver_utils, "create_messages", return_value=[]),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(driver_utils, "wait_messages", return_value=replies),
+        patch.object(requires, "clean_config") as mock_clean_config,
+    ):
+        with pytest.raises(TimeoutError):
+            requires.setup_clients(driver, node_ids, task, "experiment_id", "run_id")
+
+    # The nodes set up before the deadline are cleaned up
+    mock_clean_config.assert_called_once_with(driver, [1])
+
+
 def test_set_parameters(driver, node_ids):
     pr = ParametersRecord()
 
@@ -225,41 +393,461 @@ def test_set_run_config(driver, node_ids):
     )
 
 
+def _train_reply(node_id: int, message_id: str) -> Message:
+    metadata = MagicMock()
+    metadata.src_node_id = node_id
+    metadata.reply_to_message = message_id
+    return Message(
+        metadata,
+        RecordSet(
+            parameters_records={"parameters": ParametersRecord()},
+            metrics_records={"metrics": MetricsRecord()},
+            configs_records={
+                "config": ConfigsRecord({"success": True, "message": "ok"})
+            },
+        ),
+    )
+
+
 def test_train_model(driver, node_ids):
-    pr = ParametersRecord()
-    mr = MetricsRecord()
+    state = RoundState(ParametersRecord(), version=4)
     current_global_iter = 1
+    replies = [_train_reply(i, str(i)) for i in node_ids]
 
-    with patch.object(requires, "execution_flow") as mock_flow:
-        mock_flow.return_value = [
-            Message(
-                MagicMock(),
-                RecordSet(
-                    parameters_records={"parameters": pr},
-                    metrics_records={"metrics": mr},
-                ),
-            )
-            for _ in range(3)
-        ]
-        all_replies = requires.train_model(driver, node_ids, pr, current_global_iter)
-
-    mock_flow.assert_called_once_with(
-        driver=driver,
-        node_ids=node_ids,
-        recordset_factory=interfaces.recordset.create_train_model_recordset,
-        msg_type=MessageType.TRAIN,
-        msg_group="train_model",
-        recordset_factory_args=(pr, current_global_iter),
-        check_success=True,
-    )
+    with (
+        patch.object(driver_utils, "create_messages") as create_messages_mock,
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(
+            driver_utils, "wait_messages", return_value=replies
+        ) as wait_messages_mock,
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, report = requires.train_model(
+            driver, node_ids, state, current_global_iter
+        )
 
-    assert all_replies == [
+    assert create_messages_mock.call_args.args[2] == MessageType.TRAIN
+    content = create_messages_mock.call_args.args[1]
+    assert content.parameters_records["parameters"] is state.parameters
+    assert content.configs_records["config"]["global_version"] == 4
+    assert wait_messages_mock.call_args.kwargs["min_replies"] == len(node_ids)
+    assert results == [
         (
             msg.content.parameters_records["parameters"],
             msg.content.metrics_records["metrics"],
         )
-        for msg in mock_flow.return_value
+        for msg in replies
     ]
+    assert report.received == report.requested == len(node_ids)
+    assert report.pending_message_ids == []
+
+
+def test_train_model_quorum(driver, node_ids):
+    state = RoundState(ParametersRecord())
+    policy = RoundPolicy(min_replies=2, deadline=10.0)
+    replies = [_train_reply(1, "1"), _train_reply(3, "3")]
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(
+            driver_utils, "wait_messages", return_value=replies
+        ) as wait_messages_mock,
+        patch.object(
+            driver_utils, "discard_messages", return_value=1
+        ) as discard_messages_mock,
+    ):
+        results, report = requires.train_model(
+            driver, node_ids, state, 2, policy=policy, stale_message_ids=["0"]
+        )
+
+    discard_messages_mock.assert_called_once_with(driver, ["0"])
+    assert wait_messages_mock.call_args.kwargs["min_replies"] == 2
+    assert wait_messages_mock.call_args.kwargs["timeout"] == 10.0
+    assert len(results) == 2
+    assert report.stale == 1
+    assert report.replied_node_ids == [1, 3]
+    assert report.pending_message_ids == ["2"]
+
+
+def test_train_model_failed_reply(driver, node_ids):
+    state = RoundState(ParametersRecord())
+    failed = _train_reply(2, "2")
+    failed.content.configs_records["config"]["success"] = False
+    replies = [_train_reply(1, "1"), failed, _train_reply(3, "3")]
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(
+            driver_utils, "wait_messages", return_value=replies
+        ) as wait_messages_mock,
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, report = requires.train_model(
+            driver, node_ids, state, 0, policy=RoundPolicy(min_replies=2)
+        )
+
+    # Only successful replies make up the quorum, and a round every node replied
+    # to closes with the successful ones
+    counts = wait_messages_mock.call_args.kwargs["counts"]
+    assert [counts(msg) for msg in replies] == [True, False, True]
+    assert len(results) == 2
+    assert report.received == 3
+
+
+def test_train_model_quorum_failed(driver, node_ids):
+    failed = _train_reply(2, "2")
+    failed.content.configs_records["config"]["success"] = False
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(driver_utils, "wait_messages", return_value=[failed]),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        # A failed reply does not stand in for the nodes missing the deadline
+        with pytest.raises(TimeoutError):
+            requires.train_model(
+                driver,
+                node_ids,
+                RoundState(ParametersRecord()),
+                0,
+                policy=RoundPolicy(min_replies=2, deadline=1.0),
+            )
+
+
+def test_train_model_deadline(driver, node_ids):
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(driver_utils, "wait_messages", return_value=[]),
+    ):
+        with pytest.raises(TimeoutError):
+            requires.train_model(
+                driver,
+                node_ids,
+                RoundState(ParametersRecord()),
+                0,
+                RoundPolicy(deadline=1.0),
+            )
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2", "3"]),
+        patch.object(
+            driver_utils, "wait_messages", return_value=[_train_reply(1, "1")]
+        ),
+    ):
+        with pytest.raises(TimeoutError):
+            requires.train_model(
+                driver,
+                node_ids,
+                RoundState(ParametersRecord()),
+                0,
+                RoundPolicy(min_replies=2),
+            )
+
+
+def test_train_model_delta(driver, node_ids):
+    state = RoundState(full_parameters(1.0), delta_transport=True)
+    state.confirm(1)
+    state.confirm(2)
+    state.update(full_parameters(2.0))
+    state.node_versions = {1: 0, 2: 0}
+
+    delta_reply = _train_reply(1, "1")
+    delta_reply.content.parameters_records["parameters"] = full_parameters(0.5)
+    delta_reply.content.configs_records["config"]["base_version"] = 1
+    missing_reply = _train_reply(2, "2")
+    missing_reply.content = RecordSet(
+        configs_records={
+            "config": ConfigsRecord(
+                {"success": False, "missing_base": True, "message": "missing"}
+            )
+        }
+    )
+    full_reply = _train_reply(2, "4")
+    full_reply.content.parameters_records["parameters"] = full_parameters(3.0)
+
+    with (
+        patch.object(driver_utils, "create_messages") as create_messages_mock,
+        patch.object(
+            driver_utils, "send_messages", side_effect=[["1", "2", "3"], ["4"]]
+        ),
+        patch.object(
+            driver_utils,
+            "wait_messages",
+            side_effect=[[delta_reply, missing_reply], [full_reply]],
+        ),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, report = requires.train_model(
+            driver, node_ids, state, 1, RoundPolicy(min_replies=2, deadline=10.0)
+        )
+
+    # Node 3 never confirmed a version, node 2 lost its base and gets a retry
+    sent = [(c.args[1], c.args[3]) for c in create_messages_mock.call_args_list]
+    assert [node_ids for _, node_ids in sent] == [[3], [1, 2], [2]]
+    full, delta, retry = [rs.configs_records["config"] for rs, _ in sent]
+    assert "base_version" not in full and "base_version" not in retry
+    assert delta["base_version"] == 0
+    assert full["delta_reply"] and delta["delta_reply"]
+
+    # Results are the updates against the current global model
+    assert [array_to_ndarray(p["weight"])[0] for p, _ in results] == [0.5, 1.0]
+    assert report.replied_node_ids == [1, 2]
+    assert report.pending_message_ids == ["3"]
+    assert state.node_versions == {1: 1, 2: 1}
+
+
+def test_train_model_codec(driver, node_ids):
+    state = RoundState(full_parameters(1.0), codec="float16", error_feedback=True)
+    reply = _train_reply(1, "1")
+    reply.content.parameters_records["parameters"] = ParametersRecord(
+        {"weight": ndarray_to_array(np.full(3, 2.0, dtype=np.float32), "float16")}
+    )
+
+    with (
+        patch.object(driver_utils, "create_messages") as create_messages_mock,
+        patch.object(driver_utils, "send_messages", return_value=["1"]),
+        patch.object(driver_utils, "wait_messages", return_value=[reply]),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, _ = requires.train_model(driver, [1], state, 0)
+
+    content = create_messages_mock.call_args.args[1]
+    assert interfaces.recordset.read_train_model_codec(content) == (
+        "float16",
+        True,
+        None,
+    )
+    # Replies are decoded to full precision before aggregation
+    parameters = results[0][0]
+    assert parameters["weight"].stype == NUMPY_STYPE
+    assert np.array_equal(array_to_ndarray(parameters["weight"]), np.full(3, 2.0))
+
+
+def test_train_model_packed(driver, node_ids):
+    state = RoundState(full_parameters(1.0), packed=True)
+    reply = _train_reply(1, "1")
+    reply.content.parameters_records["parameters"] = pack_parameters(
+        full_parameters(2.0)
+    )
+
+    with (
+        patch.object(driver_utils, "create_messages") as create_messages_mock,
+        patch.object(driver_utils, "send_messages", return_value=["1"]),
+        patch.object(driver_utils, "wait_messages", return_value=[reply]),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, _ = requires.train_model(driver, [1], state, 0)
+
+    content = create_messages_mock.call_args.args[1]
+    assert interfaces.recordset.read_packed(content)
+    assert is_packed(content.parameters_records["parameters"])
+    # Replies are left packed for the aggregator
+    assert is_packed(results[0][0])
+
+
+def test_train_model_accumulate(driver, node_ids):
+    state = RoundState(full_parameters(1.0))
+    replies = [_train_reply(1, "1"), _train_reply(2, "2")]
+    for reply, value in zip(replies, [2.0, 4.0]):
+        reply.content.parameters_records["parameters"] = full_parameters(value)
+    replies[1].content.configs_records["config"]["num_examples"] = 30
+    accumulated = []
+
+    def wait_messages(driver, message_ids, on_reply, **kwargs):
+        for reply in replies:
+            on_reply(reply)
+        return replies
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2"]),
+        patch.object(driver_utils, "wait_messages", side_effect=wait_messages),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        results, report = requires.train_model(
+            driver,
+            [1, 2],
+            state,
+            0,
+            accumulate=lambda p, w: accumulated.append((p, w)),
+        )
+
+    # Parameters are handed over as replies arrive and not kept afterwards,
+    # weighted by the number of examples when the node reports it
+    assert [(array_to_ndarray(p["weight"])[0], w) for p, w in accumulated] == [
+        (2.0, 1.0),
+        (4.0, 30.0),
+    ]
+    assert all(not reply.content.parameters_records for reply in replies)
+    assert [len(r[0]) for r in results] == [0, 0]
+    assert report.received == 2
+
+
+def test_train_model_sampling_weights(driver):
+    state = RoundState(full_parameters(1.0))
+    replies = [_train_reply(1, "1"), _train_reply(2, "2")]
+    for reply in replies:
+        reply.content.parameters_records["parameters"] = full_parameters(2.0)
+    accumulated = []
+
+    def wait_messages(driver, message_ids, on_reply, **kwargs):
+        for reply in replies:
+            on_reply(reply)
+        return replies
+
+    with (
+        patch.object(driver_utils, "create_messages"),
+        patch.object(driver_utils, "send_messages", return_value=["1", "2"]),
+        patch.object(driver_utils, "wait_messages", side_effect=wait_messages),
+        patch.object(driver_utils, "discard_messages", return_value=0),
+    ):
+        _, report = requires.train_model(
+            driver,
+            [1, 2],
+            state,
+            0,
+            accumulate=lambda p, w: accumulated.append(w),
+            sampling_weights={1: 2.0, 2: 4.0},
+        )
+
+    # Sampled nodes weigh by the inverse of their chance to be sampled
+    assert accumulated == [2.0, 4.0]
+    assert set(report.latencies) == {1, 2}
+
+
+def test_train_async(driver):
+    state = RoundState(full_parameters(0.0))
+    policy = AsyncPolicy(buffer_size=1, staleness_exponent=1.0)
+    # Node 1 replies twice while node 2 trains once, from the first version
+    trained = [("1", 0, 1.0), ("2", 0, 2.0), ("1", 1, 3.0)]
+    pulls = []
+    for node_id, version, value in trained:
+        reply = _train_reply(int(node_id), f"{node_id}@{version}")
+        reply.content.parameters_records["parameters"] = full_parameters(value)
+        pulls += [[], [reply]]
+    driver.pull_messages.side_effect = pulls
+    accumulated = []
+    published = []
+
+    def publish(metrics, discount, report):
+        published.append((discount, report))
+        update = accumulated[-1][0]
+        state.update(add_parameters(state.parameters, update))
+
+    with (
+        patch.object(config, "POLL_INTERVAL", 0.0),
+        patch.object(
+            requires,
+            "_send_train_messages",
+            side_effect=lambda d, ids, s, i: [f"{n}@{s.version}" for n in ids],
+        ) as send_mock,
+    ):
+        pending = requires.train_async(
+            driver,
+            [1, 2],
+            state,
+            3,
+            policy,
+            lambda p, w: accumulated.append((p, w)),
+            publish,
+        )
+
+    # Updates are taken against the version each node trained from, and the node
+    # is sent the latest version as soon as it replied
+    assert [array_to_ndarray(p["weight"])[0] for p, _ in accumulated] == [
+        1.0,
+        2.0,
+        2.0,
+    ]
+    assert [w for _, w in accumulated] == [1.0, 0.5, 0.5]
+    assert [d for d, _ in published] == [1.0, 0.5, 0.5]
+    assert [r.staleness for _, r in published] == [[0], [1], [1]]
+    assert [c.args[1] for c in send_mock.call_args_list] == [[1, 2], [1], [2]]
+    assert state.version == 3
+    assert pending == ["2@2"]
+
+
+def test_train_async_failed_reply(driver):
+    state = RoundState(full_parameters(0.0))
+    policy = AsyncPolicy(buffer_size=1, staleness_exponent=0.0)
+    # Node 2 fails, without parameters, while node 1 trains on
+    failed = _train_reply(2, "2@0")
+    failed.content.configs_records["config"]["success"] = False
+    del failed.content.parameters_records["parameters"]
+    replies = [_train_reply(1, f"1@{version}") for version in range(2)]
+    for reply in replies:
+        reply.content.parameters_records["parameters"] = full_parameters(1.0)
+    driver.pull_messages.side_effect = [[failed, replies[0]], [replies[1]]]
+    accumulated = []
+
+    def publish(metrics, discount, report):
+        state.update(add_parameters(state.parameters, accumulated[-1]))
+
+    with (
+        patch.object(config, "POLL_INTERVAL", 0.0),
+        patch.object(
+            requires,
+            "_send_train_messages",
+            side_effect=lambda d, ids, s, i: [f"{n}@{s.version}" for n in ids],
+        ) as send_mock,
+    ):
+        pending = requires.train_async(
+            driver,
+            [1, 2],
+            state,
+            2,
+            policy,
+            lambda p, w: accumulated.append(p),
+            publish,
+        )
+
+    # The failed node is left out of the updates and is not sent the model again
+    assert len(accumulated) == 2
+    assert [c.args[1] for c in send_mock.call_args_list] == [[1, 2], [1]]
+    assert state.version == 2
+    assert pending == []
+
+
+def test_train_async_all_failed(driver):
+    failed = _train_reply(1, "1")
+    failed.content.configs_records["config"]["success"] = False
+    driver.pull_messages.return_value = [failed]
+
+    with patch.object(requires, "_send_train_messages", return_value=["1"]):
+        with pytest.raises(RuntimeError):
+            requires.train_async(
+                driver,
+                [1],
+                RoundState(ParametersRecord()),
+                1,
+                AsyncPolicy(buffer_size=1),
+                MagicMock(),
+                MagicMock(),
+            )
+
+
+def test_train_async_timeout(driver):
+    driver.pull_messages.return_value = []
+
+    with (
+        patch.object(config, "STAGE_TIMEOUTS", {"train_model": 0.0}),
+        patch.object(requires, "_send_train_messages", return_value=["1"]),
+    ):
+        with pytest.raises(TimeoutError):
+            requires.train_async(
+                driver,
+                [1],
+                RoundState(ParametersRecord()),
+                1,
+                AsyncPolicy(buffer_size=1),
+                MagicMock(),
+                MagicMock(),
+            )
 
 
 def test_clean_config(driver, node_ids):
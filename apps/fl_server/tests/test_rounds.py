@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from fl_server.rounds import (
+    AsyncPolicy,
+    AsyncReport,
+    RoundPolicy,
+    RoundReport,
+    RoundState,
+    SamplingPolicy,
+)
+
+from interfaces.array_serde import array_to_ndarray
+
+from schemas.task import Task
+from interfaces.testing import full_parameters
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        (RoundPolicy(), 10),
+        (RoundPolicy(min_replies=3), 3),
+        (RoundPolicy(min_replies=30), 10),
+        (RoundPolicy(min_fraction=0.25), 3),
+        (RoundPolicy(min_replies=5, min_fraction=0.2), 2),
+        (RoundPolicy(min_fraction=0.0), 1),
+        (RoundPolicy(deadline=10.0), 10),
+    ],
+)
+def test_required_replies(policy, expected):
+    assert policy.required_replies(10) == expected
+
+
+def test_policy_from_task():
+    task = Task(
+        user_id="user_id",
+        use_case="use_case",
+        model_name="model_name",
+        model_version=1,
+        num_global_iterations=2,
+        run_name="run_name",
+        experiment_name="experiment_name",
+        min_replies=2,
+        round_deadline=30.0,
+    )
+
+    policy = RoundPolicy.from_task(task)
+
+    assert policy == RoundPolicy(min_replies=2, min_fraction=None, deadline=30.0)
+
+
+def test_report_metrics():
+    report = RoundReport(
+        round=1, policy="", requested=4, received=3, stale=1, elapsed=2.5
+    )
+
+    assert report.to_metrics() == {
+        "round_requested": 4,
+        "round_received": 3,
+        "round_stale": 1,
+        "round_latency": 2.5,
+    }
+
+
+def test_sampling_policy():
+    node_ids = list(range(1, 21))
+    policy = SamplingPolicy(fraction=0.25, seed=3)
+
+    plan = policy.plan(node_ids, 4, {})
+
+    # Seeded by round: a round is drawn again identically, another one differs
+    assert len(plan.node_ids) == 5
+    assert plan.node_ids == sorted(plan.node_ids)
+    assert plan == policy.plan(node_ids, 4, {})
+    assert plan.node_ids != policy.plan(node_ids, 5, {}).node_ids
+    assert plan.weights == {i: 4.0 for i in plan.node_ids}
+    assert SamplingPolicy(count=50).sample_size(20) == 20
+    with pytest.raises(ValueError):
+        SamplingPolicy()
+
+
+def test_sampling_policy_strata():
+    node_ids = list(range(1, 11))
+    # Nodes 1-3 are fast, 4-8 slow, and 9-10 never replied
+    latencies = {i: 1.0 if i <= 3 else 10.0 + i for i in range(1, 9)}
+    policy = SamplingPolicy(count=4, strata=2)
+
+    plan = policy.plan(node_ids, 0, latencies)
+
+    assert plan.strata == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+    # Every stratum is represented, and the weights undo the unequal chances
+    counts = [len(set(plan.node_ids) & set(s)) for s in plan.strata]
+    assert counts == [2, 1, 1]
+    assert sorted(plan.weights.values()) == [2.0, 2.0, 2.0, 4.0]
+    assert plan.to_dict()["strata"] == plan.strata
+
+
+def test_async_policy():
+    task = Task(
+        user_id="user_id",
+        use_case="use_case",
+        model_name="model_name",
+        model_version=1,
+        num_global_iterations=2,
+        run_name="run_name",
+        experiment_name="experiment_name",
+    )
+    assert AsyncPolicy.from_task(task) is None
+
+    task.async_buffer_size = 4
+    policy = AsyncPolicy.from_task(task)
+
+    assert policy == AsyncPolicy(buffer_size=4, staleness_exponent=0.5)
+    assert policy.staleness_weight(0) == 1.0
+    assert policy.staleness_weight(3) == 0.5
+    with pytest.raises(ValueError):
+        AsyncPolicy(buffer_size=0)
+
+
+def test_async_report_metrics():
+    report = AsyncReport(
+        version=2, policy="", received=3, elapsed=1.5, staleness=[0, 1, 2]
+    )
+
+    assert report.to_metrics() == {
+        "round_received": 3,
+        "round_latency": 1.5,
+        "round_mean_staleness": 1.0,
+        "round_max_staleness": 2,
+    }
+
+
+def test_state_delta_nodes():
+    state = RoundState(full_parameters(1.0), delta_transport=True)
+    state.confirm(1)
+    state.confirm(2)
+
+    # No delta before the first aggregation
+    assert state.delta_node_ids([1, 2, 3]) == []
+
+    state.update(full_parameters(1.5))
+    state.confirm(2)
+
+    assert state.version == 1
+    assert state.delta_node_ids([1, 2, 3]) == [1]
+    assert np.array_equal(
+        array_to_ndarray(state.delta()["weight"]), np.full(3, 0.5, dtype=np.float32)
+    )
+
+
+def test_state_without_delta_transport():
+    state = RoundState(full_parameters(1.0))
+    state.confirm(1)
+    state.update(full_parameters(2.0))
+
+    assert state.previous is None
+    assert state.delta_node_ids([1]) == []
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"codec": "int4"},
+        {"topk": 0.1},
+        {"topk": 0.1, "delta_transport": True, "codec": "int8"},
+        {"topk": 1.5, "delta_transport": True},
+        {"compression": "brotli"},
+        {"packed": True, "delta_transport": True},
+        {"packed": True, "codec": "int8"},
+    ],
+)
+def test_state_invalid_transport(kwargs):
+    with pytest.raises(ValueError):
+        RoundState(full_parameters(1.0), **kwargs)
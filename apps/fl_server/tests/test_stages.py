@@ -1,12 +1,29 @@
 from unittest.mock import MagicMock, Mock, patch
 
+import numpy as np
 import pytest
 
 from mlflow.pyfunc import PyFuncModel
-from flwr.common import ParametersRecord, MetricsRecord, Message
+from flwr.common import (
+    ConfigsRecord,
+    Error,
+    ParametersRecord,
+    MetricsRecord,
+    Message,
+    RecordSet,
+)
 
 from fl_server import stages
 from fl_models.iris.fl_model import FLModel
+import interfaces.recordset
+from interfaces.array_serde import (
+    array_to_ndarray,
+    is_packed,
+    ndarray_to_array,
+    ndarray_to_sparse_array,
+    pack_parameters,
+    unpack_parameters,
+)
 
 
 @pytest.fixture(scope="session")
@@ -58,6 +75,21 @@ def test_load_model(fl_model_wrapper):
     assert global_vars["model"] is not None
 
 
+def test_load_model_aggregation_workers():
+    global_vars = {}
+    wrapper = Mock(spec=PyFuncModel)
+    aggregator = wrapper.unwrap_python_model.return_value.create_aggregator.return_value
+
+    with (
+        patch("fl_server.stages.mlflow_client.load_model", return_value=wrapper),
+        patch("fl_server.stages.config.AGGREGATION_WORKERS", 2),
+    ):
+        stages.load_model(global_vars)
+
+    executor = aggregator.set_executor.call_args.args[0]
+    assert executor._max_workers == 2
+
+
 def test_aggregate_paramemters(global_vars_dict):
     mock_parameters = MagicMock(spec=ParametersRecord)
     parameter_list = [mock_parameters, mock_parameters]
@@ -72,6 +104,193 @@ def test_aggregate_paramemters(global_vars_dict):
     mock_agg_params.assert_called_once_with(parameter_list)
 
 
+def test_aggregate_sparse_updates(global_vars_dict):
+    dense = np.arange(6, dtype=np.float32).reshape(2, 3)
+    sparse = np.zeros((2, 3), dtype=np.float32)
+    sparse[1, 1] = 6.0
+    updates = [
+        ParametersRecord(
+            {"weight": ndarray_to_array(dense), "bias": ndarray_to_array(np.ones(2))}
+        ),
+        # Top-k update, with the unchanged bias left out
+        ParametersRecord({"weight": ndarray_to_sparse_array(sparse, 0.1)}),
+    ]
+
+    result = stages.aggregate_parameters(updates, global_vars_dict)
+
+    assert list(result.keys()) == ["weight", "bias"]
+    assert np.array_equal(array_to_ndarray(result["weight"]), (dense + sparse) / 2)
+    assert np.array_equal(array_to_ndarray(result["bias"]), np.full(2, 0.5))
+
+
+def test_accumulate_sparse_updates(global_vars_dict):
+    dense = np.arange(6, dtype=np.float32).reshape(2, 3)
+    sparse = np.zeros((2, 3), dtype=np.float32)
+    sparse[1, 1] = 6.0
+    updates = [
+        ParametersRecord({"weight": ndarray_to_sparse_array(sparse, 0.1)}),
+        ParametersRecord(
+            {"weight": ndarray_to_array(dense), "bias": ndarray_to_array(np.ones(2))}
+        ),
+    ]
+
+    # The aggregator scatters the entries of the top-k update into its sums
+    stages.begin_round(global_vars_dict)
+    stages.accumulate_parameters(updates[0], global_vars_dict, weight=3.0)
+    stages.accumulate_parameters(updates[1], global_vars_dict)
+    result = stages.finalize_parameters(global_vars_dict)
+
+    assert list(result.keys()) == ["weight", "bias"]
+    assert np.array_equal(array_to_ndarray(result["weight"]), (3 * sparse + dense) / 4)
+    assert np.array_equal(array_to_ndarray(result["bias"]), np.full(2, 0.25))
+
+
+def test_aggregate_packed_parameters(global_vars_dict):
+    parameters = [
+        ParametersRecord(
+            {
+                "weight": ndarray_to_array(np.full((2, 3), v, dtype=np.float32)),
+                "steps": ndarray_to_array(np.array(v, dtype=np.int64)),
+            }
+        )
+        for v in [1, 2, 6]
+    ]
+
+    result = stages.aggregate_parameters(
+        [pack_parameters(p) for p in parameters], global_vars_dict
+    )
+
+    # The model's aggregator averages them unpacked
+    assert not is_packed(result)
+    assert np.array_equal(array_to_ndarray(result["weight"]), np.full((2, 3), 3.0))
+    assert array_to_ndarray(result["steps"]) == 3
+
+
+def test_streaming_aggregation(global_vars_dict):
+    assert stages.supports_streaming(global_vars_dict)
+    updates = [
+        ParametersRecord({"weight": ndarray_to_array(np.full(3, v, dtype=np.float32))})
+        for v in [1.0, 4.0]
+    ]
+
+    stages.begin_round(global_vars_dict)
+    stages.accumulate_parameters(updates[0], global_vars_dict, weight=2.0)
+    stages.accumulate_parameters(updates[1], global_vars_dict)
+    result = stages.finalize_parameters(global_vars_dict)
+
+    weight = array_to_ndarray(result["weight"])
+    assert weight.dtype == np.float32
+    assert np.allclose(weight, np.full(3, 2.0))
+    # Finalizing starts over
+    with pytest.raises(ValueError):
+        stages.finalize_parameters(global_vars_dict)
+
+
+def test_weighted_aggregation(global_vars_dict):
+    updates = [
+        ParametersRecord(
+            {
+                "weight": ndarray_to_array(np.full(3, v, dtype=np.float32)),
+                "steps": ndarray_to_array(np.array(int(v), dtype=np.int64)),
+            }
+        )
+        for v in [1.0, 4.0]
+    ]
+    aggregator = global_vars_dict["aggregator"]
+
+    result = aggregator.aggregate_parameters(updates, weights=[10.0, 30.0])
+
+    assert np.allclose(array_to_ndarray(result["weight"]), 3.25)
+    # Integer buffers keep their dtype and are rounded
+    steps = array_to_ndarray(result["steps"])
+    assert steps.dtype == np.int64 and steps == 3
+
+
+def test_parallel_aggregation(global_vars_dict):
+    rng = np.random.default_rng(0)
+    updates = [
+        ParametersRecord(
+            {
+                "weight": ndarray_to_array(rng.random((700, 1000), dtype=np.float32)),
+                "bias": ndarray_to_array(rng.random(10, dtype=np.float32)),
+                "steps": ndarray_to_array(np.array(seed, dtype=np.int64)),
+            }
+        )
+        for seed in range(3)
+    ]
+    aggregator = global_vars_dict["aggregator"]
+
+    for weights in [None, [10.0, 30.0, 7.0]]:
+        stages.set_aggregation_workers(global_vars_dict, 1)
+        serial = aggregator.aggregate_parameters(updates, weights)
+        stages.set_aggregation_workers(global_vars_dict, 4)
+        parallel = aggregator.aggregate_parameters(updates, weights)
+
+        # Chunks are summed on other threads into the very same values
+        assert parallel.keys() == serial.keys()
+        for key in serial:
+            assert parallel[key].data == serial[key].data
+    stages.set_aggregation_workers(global_vars_dict, 1)
+
+
+def test_robust_aggregation(global_vars_dict):
+    updates = [
+        ParametersRecord({"weight": ndarray_to_array(np.full(3, v, dtype=np.float32))})
+        for v in [1.0, 2.0, 3.0, 1e6]
+    ]
+    metrics = [MetricsRecord({"loss": v}) for v in [1.0, 3.0]]
+
+    stages.set_robust_aggregation(global_vars_dict, "trimmed_mean", 0.25)
+    result = stages.aggregate_parameters(updates, global_vars_dict)
+
+    # The replies are collected, the outlier is trimmed and the model's aggregator
+    # still averages the metrics
+    assert not stages.supports_streaming(global_vars_dict)
+    assert np.allclose(array_to_ndarray(result["weight"]), 2.5)
+    assert stages.aggregate_metrics(metrics, global_vars_dict)["loss"] == 2.0
+
+
+def test_streaming_aggregation_packed(global_vars_dict):
+    updates = [
+        ParametersRecord(
+            {
+                "weight": ndarray_to_array(np.full((2, 3), v, dtype=np.float32)),
+                "bias": ndarray_to_array(np.full(3, v, dtype=np.float32)),
+                "steps": ndarray_to_array(np.array(v, dtype=np.int64)),
+            }
+        )
+        for v in [1, 4]
+    ]
+
+    # Each dtype group is averaged as one vector, and packed again
+    stages.begin_round(global_vars_dict)
+    for update in updates:
+        stages.accumulate_parameters(pack_parameters(update), global_vars_dict)
+    result = stages.finalize_parameters(global_vars_dict)
+
+    assert is_packed(result)
+    unpacked = unpack_parameters(result)
+    assert list(unpacked.keys()) == ["weight", "bias", "steps"]
+    assert np.array_equal(array_to_ndarray(unpacked["weight"]), np.full((2, 3), 2.5))
+    assert np.array_equal(array_to_ndarray(unpacked["bias"]), np.full(3, 2.5))
+    assert array_to_ndarray(unpacked["steps"]) == 2
+
+
+def test_streaming_aggregation_mixed_formats(global_vars_dict):
+    update = ParametersRecord({"weight": ndarray_to_array(np.ones(3))})
+    other = ParametersRecord({"bias": ndarray_to_array(np.ones(3))})
+
+    for first, second in [
+        (update, pack_parameters(update)),
+        (pack_parameters(update), update),
+        (pack_parameters(update), pack_parameters(other)),
+    ]:
+        stages.begin_round(global_vars_dict)
+        stages.accumulate_parameters(first, global_vars_dict)
+        with pytest.raises(ValueError):
+            stages.accumulate_parameters(second, global_vars_dict)
+
+
 def test_aggregate_metrics(global_vars_dict):
     mock_metrics = MagicMock(MetricsRecord)
     metrics_list = [mock_metrics, mock_metrics]
@@ -98,3 +317,34 @@ def test_filter_clients():
     filtered_node_ids = stages.filter_clients(messages_mock)
 
     assert filtered_node_ids == [1, 3]
+
+
+def test_filter_pipeline_clients():
+    pr = ParametersRecord()
+    participate = RecordSet(
+        configs_records={"config": ConfigsRecord({"participate": True})}
+    )
+    parameters = RecordSet(parameters_records={"parameters": pr})
+
+    def reply(node_id, modes, success):
+        return Message(
+            MagicMock(src_node_id=node_id),
+            interfaces.recordset.create_pipeline_reply_recordset(
+                modes,
+                [participate, parameters][: len(modes)],
+                success,
+                "message",
+            ),
+        )
+
+    messages = [
+        reply(1, ["filter_clients", "get_parameters"], [True, True]),
+        reply(2, ["filter_clients"], [False]),
+        Message(MagicMock(src_node_id=3), error=Error(0, "error")),
+        reply(4, ["filter_clients"], [True]),
+    ]
+
+    filtered_node_ids, result = stages.filter_pipeline_clients(messages)
+
+    assert filtered_node_ids == [1, 4]
+    assert result is pr
@@ -0,0 +1,107 @@
+import functools
+import os
+from unittest.mock import MagicMock
+
+import pytest
+
+from fl_server import workers
+from fl_server.workers import WorkerPool
+
+from schemas.task import TaskRead
+
+
+def _record(path, task, superlink_url, resources, claims):
+    with open(path, "a") as file:
+        file.write(f"{os.getpid()} {task.id} {resources.driver_helper}\n")
+    claims.claim(task.id, [task.id])
+    if task.id == 99:
+        raise RuntimeError("task failed")
+    if task.id == 13:
+        # The worker dies with its task
+        os._exit(1)
+
+
+def _initialize(path):
+    # Runs in the worker, before it warms up
+    workers._warm_up = lambda superlink_url: workers.WarmResources(
+        superlink_url, MagicMock()
+    )
+    workers._run = functools.partial(_record, path)
+
+
+def _task(task_id):
+    return TaskRead(
+        user_id="user_id",
+        use_case="use_case",
+        model_name="model_name",
+        model_version=1,
+        num_global_iterations=2,
+        id=task_id,
+        status="pending",
+        created_at="2021-08-01T00:00:00",
+        run_name="run_name",
+        experiment_name="experiment_name",
+    )
+
+
+def test_worker_pool_recycles_workers(tmp_path):
+    path = tmp_path / "runs.txt"
+    pool = WorkerPool(
+        1, 2, "superlink", functools.partial(_initialize, str(path)), preload=[]
+    )
+    try:
+        assert pool.wait(60)
+        for task_id in [1, 99, 3]:
+            pool.submit(_task(task_id))
+        assert pool.wait(60)
+        # The workers claim nodes in the mapping shared by the pool
+        assert pool._claims.free([1, 99, 3, 4]) == [4]
+    finally:
+        pool.shutdown()
+
+    runs = [line.split() for line in path.read_text().splitlines()]
+    # Every task runs with the resources warmed up for the superlink, a failed task
+    # counting towards the tasks after which the worker is replaced
+    assert [task_id for _, task_id, _ in runs] == ["1", "99", "3"]
+    assert {url for _, _, url in runs} == {"superlink"}
+    assert runs[0][0] == runs[1][0] != runs[2][0]
+
+
+def test_worker_pool_fails_tasks_of_dead_workers(tmp_path, monkeypatch):
+    path = tmp_path / "runs.txt"
+    failed = []
+    monkeypatch.setattr(WorkerPool, "_fail", lambda self, task: failed.append(task.id))
+    pool = WorkerPool(
+        1, 2, "superlink", functools.partial(_initialize, str(path)), preload=[]
+    )
+    try:
+        assert pool.wait(60)
+        for task_id in [13, 2]:
+            pool.submit(_task(task_id))
+        assert pool.wait(60)
+    finally:
+        pool.shutdown()
+
+    # The task of the dead worker is reported, and a new worker takes the next one
+    runs = [line.split() for line in path.read_text().splitlines()]
+    assert failed == [13]
+    assert [task_id for _, task_id, _ in runs] == ["13", "2"]
+    assert runs[0][0] != runs[1][0]
+
+
+def test_worker_pool_fail(monkeypatch):
+    pool = WorkerPool.__new__(WorkerPool)
+    pool._status = None
+    status = MagicMock()
+    monkeypatch.setattr(workers, "end_runs", MagicMock())
+    monkeypatch.setattr(workers, "open_status_client", lambda client: status)
+
+    pool._fail(_task(13))
+
+    workers.end_runs.assert_called_once_with(_task(13), "FAILED")
+    status.publish_message.assert_called_once_with("Task 13 failed")
+
+
+def test_worker_pool_needs_workers():
+    with pytest.raises(ValueError):
+        WorkerPool(0, 1, "superlink")
@@ -1,3 +1,5 @@
+from sqlalchemy import Column, Engine, inspect, literal, text
+from sqlalchemy.sql.schema import ScalarElementColumnDefault
 from sqlmodel import create_engine, SQLModel
 
 from restapi import config
@@ -16,5 +18,45 @@ else:
 engine = create_engine(url, echo=config.DB_ECHO, connect_args=connect_args)
 
 
+def _column_definition(column: Column, engine: Engine) -> str:
+    definition = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+    default = column.default
+    if isinstance(default, ScalarElementColumnDefault):
+        value = literal(default.arg, column.type).compile(
+            dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+        # Rows already in the table take the default
+        definition += f" DEFAULT {value}"
+        if not column.nullable:
+            definition += " NOT NULL"
+    elif not column.nullable:
+        raise RuntimeError(
+            f"Column {column.table.name}.{column.name} has no default to add it "
+            "with, the database must be recreated"
+        )
+    return definition
+
+
+def add_missing_columns(engine: Engine) -> None:
+    # create_all leaves existing tables as they are, so the columns added to the
+    # models since a table was created are added to it
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        with engine.begin() as connection:
+            for column in missing:
+                print(f"Adding column {column.name} to table {table.name}")
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {_column_definition(column, engine)}"
+                    )
+                )
+
+
 def create_db_and_tables() -> None:
     SQLModel.metadata.create_all(engine)
+    add_missing_columns(engine)
@@ -7,8 +7,8 @@ from sqlmodel import Session, select, delete
 from restapi.db import engine
 from restapi import config
 
-from interfaces.rabbitmq_client import RabbitMQClient
-from schemas.task import TaskCreate, TaskRead, Task
+from interfaces.rabbitmq_client import RabbitMQClient, control_topic
+from schemas.task import Status, TaskCreate, TaskRead, Task
 
 router = APIRouter(prefix="/tasks", tags=["tasks"], dependencies=None)
 
@@ -54,6 +54,12 @@ async def cancel_task(task_id: int) -> Task | Response:
         task = session.get(Task, task_id)
         if not task:
             return JSONResponse(status_code=404, content="Task not found")
+        # The server reads the task's control queue between rounds, the queue
+        # holding the cancellation until a pending task starts
+        if task.status in (Status.PENDING, Status.RUNNING):
+            rabbitmq: RabbitMQClient = config.obj["rabbitmq_dispatch"]
+            control = rabbitmq.for_topic(control_topic(task_id), True)
+            control.publish_message("cancel")
         task.change_status("cancelled")
         session.commit()
         session.refresh(task)
@@ -0,0 +1,41 @@
+from sqlmodel import create_engine, inspect, text
+
+from restapi.db import add_missing_columns
+
+from schemas.task import Task
+
+
+def test_add_missing_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tasks.db'}")
+    # A table created before the round policy and later columns were added
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE task (id INTEGER PRIMARY KEY, user_id VARCHAR NOT NULL, "
+                "use_case VARCHAR NOT NULL, model_name VARCHAR NOT NULL, "
+                "model_version INTEGER NOT NULL, num_global_iterations INTEGER NOT NULL, "
+                "run_name VARCHAR NOT NULL, experiment_name VARCHAR NOT NULL, "
+                "status VARCHAR(9), created_at DATETIME NOT NULL)"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO task VALUES (1, 'user', 'iris', 'model', 1, 2, 'run', "
+                "'experiment', 'PENDING', '2024-01-01 00:00:00')"
+            )
+        )
+
+    add_missing_columns(engine)
+    add_missing_columns(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("task")}
+    assert columns == set(Task.__table__.columns.keys())
+    # Existing rows take the defaults of the new columns
+    with engine.connect() as connection:
+        row = connection.execute(
+            text(
+                "SELECT delta_transport, trim_fraction, sample_strata, min_replies "
+                "FROM task"
+            )
+        ).one()
+    assert tuple(row) == (0, 0.1, 1, None)
@@ -88,7 +88,7 @@ def test_delete_tasks(session, task_attrs):
     assert len(tasks) == 0
 
 
-def test_cancel_task(session, task_attrs):
+def test_cancel_task(session, task_attrs, rabbitmq):
     task = Task.model_validate(task_attrs)
     session.add(task)
     session.commit()
@@ -101,3 +101,21 @@ def test_cancel_task(session, task_attrs):
     session.refresh(task)
 
     assert task.status == "cancelled"
+    # The server running the task is told through the task's control queue
+    dispatch = config.obj["rabbitmq_dispatch"]
+    dispatch.for_topic.assert_called_once_with(f"control.{task.id}", True)
+    dispatch.for_topic.return_value.publish_message.assert_called_once_with("cancel")
+
+
+def test_cancel_finished_task(session, task_attrs, rabbitmq):
+    task = Task.model_validate(task_attrs)
+    task.change_status("success")
+    session.add(task)
+    session.commit()
+    session.refresh(task)
+
+    response = client.put(f"/tasks/cancel/{task.id}")
+    assert response.status_code == 200
+
+    # No server runs the task anymore
+    config.obj["rabbitmq_dispatch"].for_topic.assert_not_called()
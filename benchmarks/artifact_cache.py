@@ -0,0 +1,177 @@
+"""
+Time for several processes of a host to load the same model, each downloading its
+artifacts and sharing the artifact cache, and the bytes served to them.
+
+The iris model is registered in a file MLflow registry along with `--size` MB of
+weights, its artifacts stored behind a local HTTP server speaking the MLflow
+artifacts API, as a tracking server proxying them does, over a `--bandwidth` MB/s
+link the downloads share. `--processes` processes then load it at once with their
+own MLflow client, as the clients and servers of a host do.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+PREFIX = "/api/2.0/mlflow-artifacts/artifacts"
+REGISTER = """
+import os
+import sys
+import mlflow
+from mlflow.pyfunc import log_model
+from fl_models.iris.fl_model import FLModel
+path = os.path.join(os.getcwd(), "weights.bin")
+with open(path, "wb") as file:
+    file.write(os.urandom(int(sys.argv[1]) * 2**20))
+mlflow.set_experiment("artifact_cache")
+log_model(
+    artifact_path="model",
+    python_model=FLModel(),
+    artifacts={"weights": path},
+    registered_model_name="iris_model",
+)
+"""
+
+
+def serve(root: str, bandwidth: float) -> tuple[ThreadingHTTPServer, list[int]]:
+    # The list, upload and download endpoints of the MLflow artifacts API
+    served = [0]
+    # Time the link is busy until
+    link = [0.0]
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args: object) -> None:
+            pass
+
+        def _path(self) -> str:
+            path = unquote(urlparse(self.path).path)[len(PREFIX) :].lstrip("/")
+            return os.path.join(root, path)
+
+        def do_PUT(self) -> None:
+            path = self._path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path == PREFIX:
+                directory = os.path.join(root, parse_qs(url.query)["path"][0])
+                files = (
+                    [
+                        {
+                            "path": name,
+                            "is_dir": os.path.isdir(os.path.join(directory, name)),
+                            "file_size": os.path.getsize(os.path.join(directory, name)),
+                        }
+                        for name in sorted(os.listdir(directory))
+                    ]
+                    if os.path.isdir(directory)
+                    else []
+                )
+                body = json.dumps({"files": files}).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            with open(self._path(), "rb") as file:
+                data = file.read()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            chunk = 2**20
+            for start in range(0, len(data), chunk):
+                # The downloads share the bandwidth, as the network of a host
+                with lock:
+                    link[0] = max(link[0], time.monotonic()) + chunk / bandwidth / 2**20
+                    until = link[0]
+                time.sleep(max(0.0, until - time.monotonic()))
+                self.wfile.write(data[start : start + chunk])
+            served[0] += len(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, served
+
+
+def load(cache_dir: str | None, start: float, results: multiprocessing.Queue) -> None:
+    from interfaces import mlflow_client
+    from interfaces.artifact_cache import ArtifactCache
+
+    mlflow_client.setup_mlflow(
+        os.environ["MLFLOW_URL"],
+        artifact_cache=ArtifactCache(cache_dir, 2**32) if cache_dir else None,
+    )
+    context = mlflow_client.current_context()
+    context.model_name, context.model_version = "iris_model", 1
+    context.configured = True
+    # Imports done, all processes load at the same time
+    time.sleep(max(0.0, start - time.time()))
+    begin = time.perf_counter()
+    mlflow_client.load_model()
+    results.put(time.perf_counter() - begin)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--bandwidth", type=float, default=100.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+    os.environ["MLFLOW_URL"] = f"file://{directory}/mlruns"
+    server, served = serve(os.path.join(directory, "artifacts"), args.bandwidth)
+    import mlflow
+
+    mlflow.set_tracking_uri(os.environ["MLFLOW_URL"])
+    mlflow.create_experiment(
+        "artifact_cache",
+        f"http://127.0.0.1:{server.server_port}{PREFIX}/experiment",
+    )
+    subprocess.run([sys.executable, "-c", REGISTER, str(args.size)], check=True)
+
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{args.processes} processes loading a model with {args.size} MB of weights "
+        f"at {args.bandwidth:.0f} MB/s"
+    )
+    print(f"{'artifacts':<14}{'slowest (s)':>12}{'mean (s)':>10}{'served (MB)':>13}")
+    for name in ["downloaded", "cached"]:
+        cache_dir = os.path.join(directory, "cache") if name == "cached" else None
+        results = context.Queue()
+        start = time.time() + 10
+        processes = [
+            context.Process(target=load, args=(cache_dir, start, results))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        served[0] = 0
+        latencies = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        print(
+            f"{name:<14}{max(latencies):>12.2f}"
+            f"{sum(latencies) / len(latencies):>10.2f}"
+            f"{served[0] / 2**20:>13.0f}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Node utilisation and global versions published per second with synchronous rounds
+and with asynchronous buffered training, for nodes of heterogeneous speeds.
+
+Each node takes a fixed time to train, spread from `--fastest` to `--slowest`
+seconds, and replies with the model it was sent. Synchronous rounds wait for every
+node, the fast ones idling at the barrier. Asynchronous training sends each node the
+latest model as soon as it replies, and publishes a version every `--buffer`
+updates. Utilisation is the fraction of the elapsed time the nodes spent training.
+"""
+
+import argparse
+import time
+from typing import Iterable
+from unittest.mock import patch
+
+import numpy as np
+from flwr.common import (
+    DEFAULT_TTL,
+    ConfigsRecord,
+    Message,
+    MetricsRecord,
+    ParametersRecord,
+    RecordSet,
+)
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_server import config, requires
+from fl_server.rounds import AsyncPolicy, AsyncReport, RoundState
+from interfaces.array_serde import ndarray_to_array
+from interfaces.delta import add_parameters, scale_parameters
+from simulation import FakeDriver
+
+
+class TimedDriver(FakeDriver):
+    # Node i replies durations[i] seconds after it was sent a message
+    def __init__(self, durations: dict[int, float]) -> None:
+        super().__init__(list(durations))
+        self.durations = durations
+        self.pending: dict[str, tuple[float, Message]] = {}
+        self.busy = 0.0
+        self.count = 0
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        message_ids = []
+        for message in messages:
+            self.count += 1
+            message.metadata._message_id = str(self.count)
+            duration = self.durations[message.metadata.dst_node_id]
+            self.pending[str(self.count)] = (time.monotonic() + duration, message)
+            message_ids.append(str(self.count))
+        return message_ids
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        now = time.monotonic()
+        replies = []
+        for message_id in message_ids:
+            if message_id in self.pending and self.pending[message_id][0] <= now:
+                _, message = self.pending.pop(message_id)
+                self.busy += self.durations[message.metadata.dst_node_id]
+                content = RecordSet(
+                    parameters_records={
+                        "parameters": message.content.parameters_records["parameters"]
+                    },
+                    metrics_records={"metrics": MetricsRecord({"loss": 0.0})},
+                    configs_records={
+                        "config": ConfigsRecord(
+                            {"success": True, "message": "", "num_examples": 10}
+                        )
+                    },
+                )
+                replies.append(message.create_reply(content, ttl=DEFAULT_TTL))
+        return replies
+
+
+def initial_state() -> RoundState:
+    weight = np.zeros(1000, dtype=np.float32)
+    return RoundState(ParametersRecord({"weight": ndarray_to_array(weight)}))
+
+
+def run_sync(driver: TimedDriver, n_versions: int) -> float:
+    aggregator = create_aggregator()
+    state = initial_state()
+    start = time.perf_counter()
+    for version in range(n_versions):
+        aggregator.begin_round()
+        requires.train_model(
+            driver,
+            driver.get_node_ids(),
+            state,
+            version,
+            accumulate=aggregator.accumulate,
+        )
+        state.update(aggregator.finalize())
+    return time.perf_counter() - start
+
+
+def run_async(driver: TimedDriver, n_versions: int, buffer_size: int) -> float:
+    aggregator = create_aggregator()
+    state = initial_state()
+
+    def publish(
+        metrics: list[MetricsRecord], discount: float, report: AsyncReport
+    ) -> None:
+        update = scale_parameters(aggregator.finalize(), discount)
+        state.update(add_parameters(state.parameters, update))
+        aggregator.begin_round()
+
+    start = time.perf_counter()
+    aggregator.begin_round()
+    requires.train_async(
+        driver,
+        driver.get_node_ids(),
+        state,
+        n_versions,
+        AsyncPolicy(buffer_size),
+        aggregator.accumulate,
+        publish,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--fastest", type=float, default=0.02)
+    parser.add_argument("--slowest", type=float, default=0.2)
+    parser.add_argument("--versions", type=int, default=20)
+    parser.add_argument("--buffer", type=int, nargs="+", default=[2, 5, 10])
+    args = parser.parse_args()
+
+    durations = dict(
+        enumerate(np.linspace(args.fastest, args.slowest, args.nodes).tolist(), 1)
+    )
+    print(
+        f"{args.nodes} nodes training in {args.fastest}s to {args.slowest}s, "
+        f"{args.versions} versions"
+    )
+    print(f"{'mode':<14}{'time (s)':>10}{'versions/s':>12}{'utilisation':>13}")
+    runs = [("sync", None)] + [(f"async, B={b}", b) for b in args.buffer]
+    with (
+        patch.object(config, "POLL_INTERVAL", 1e-3),
+        patch.object(config, "POLL_MAX_INTERVAL", 1e-3),
+        patch("builtins.print"),
+    ):
+        rows = []
+        for name, buffer_size in runs:
+            driver = TimedDriver(durations)
+            if buffer_size is None:
+                elapsed = run_sync(driver, args.versions)
+            else:
+                elapsed = run_async(driver, args.versions, buffer_size)
+            rows.append((name, elapsed, driver.busy))
+    for name, elapsed, busy in rows:
+        print(
+            f"{name:<14}{elapsed:>10.2f}{args.versions / elapsed:>12.1f}"
+            f"{busy / (elapsed * args.nodes):>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
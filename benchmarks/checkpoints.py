@@ -0,0 +1,98 @@
+"""
+Time the training loop spends checkpointing, with the checkpoint written in the loop
+and handed to the background writer, and the time to resume from the checkpoint.
+
+Each round is `--round` seconds of sleep standing in for the nodes training, a
+checkpoint being taken every `--every` rounds of a model of `--size` float32
+parameters with Adam moments, written to a directory store.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from fl_server.checkpoints import Checkpoint, CheckpointWriter, DirectoryStore
+from fl_server.optimizers import ServerOptimizer
+from fl_server.rounds import RoundState
+from interfaces.array_serde import ndarray_to_array
+from schemas.task import Task
+
+
+def record(values: np.ndarray) -> ParametersRecord:
+    return ParametersRecord({"weight": ndarray_to_array(values)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=25_000_000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--every", type=int, default=2)
+    parser.add_argument("--round", type=float, default=0.5)
+    args = parser.parse_args()
+
+    task = Task(
+        user_id="user",
+        use_case="iris",
+        model_name="model",
+        model_version=1,
+        num_global_iterations=args.rounds,
+        id=1,
+        status="pending",
+        created_at="2024-01-01T00:00:00",
+        run_name="run",
+        experiment_name="checkpoints",
+        checkpoint_every=args.every,
+    )
+    rng = np.random.default_rng(0)
+    parameters = record(rng.random(args.size, np.float32))
+    optimizer = ServerOptimizer("adam")
+    optimizer.step(parameters, record(rng.random(args.size, np.float32)))
+
+    print(
+        f"{args.size * 4 / 1e6:.0f} MB model, {args.rounds} rounds of "
+        f"{args.round} s, a checkpoint every {args.every}"
+    )
+    print(f"{'checkpoints':<14}{'loop (s)':>10}{'blocked (s)':>13}")
+    for name in ["none", "in the loop", "background"]:
+        with tempfile.TemporaryDirectory() as directory:
+            store = DirectoryStore(directory)
+            writer = CheckpointWriter(store, task, args.every)
+            state = RoundState(parameters)
+            blocked = 0.0
+            start = time.perf_counter()
+            for version in range(1, args.rounds + 1):
+                time.sleep(args.round)
+                state.version = version
+                begin = time.perf_counter()
+                if name == "in the loop" and version % args.every == 0:
+                    store.save(
+                        Checkpoint(
+                            task,
+                            version,
+                            state.parameters,
+                            [1],
+                            optimizer.get_state(),
+                        )
+                    )
+                elif name == "background":
+                    writer.after_version(state, [1], optimizer)
+                blocked += time.perf_counter() - begin
+            writer.close()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<14}{elapsed:>10.2f}{blocked:>13.2f}")
+            if name == "background":
+                begin = time.perf_counter()
+                checkpoint = store.load(task)
+                assert checkpoint is not None
+                ServerOptimizer("adam").set_state(checkpoint.optimizer)
+                print(
+                    f"resume from version {checkpoint.version}: "
+                    f"{time.perf_counter() - begin:.2f} s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Size, error and aggregation cost of the parameter encodings on a large update.
+
+Encodes a random update the size of a dense layer with every codec and
+top-k fraction, then times the server-side aggregation of sparse updates straight
+into dense buffers against densifying each update first.
+"""
+
+import argparse
+import time
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from fl_models.iris.aggregator import create_aggregator
+from interfaces.array_serde import (
+    CODECS,
+    array_to_ndarray,
+    decode_parameters,
+    encode_ndarray,
+    flat_arrays,
+    ndarray_to_array,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.rows, args.columns)
+    update = rng.normal(scale=1e-3, size=shape).astype(np.float32)
+    raw = len(ndarray_to_array(update).data)
+
+    print(f"{args.rows}x{args.columns} float32 update, {raw / 1e6:.1f} MB raw")
+    print(f"{'encoding':<12}{'size (MB)':>12}{'ratio':>8}{'rel. error':>12}")
+    encodings: list[tuple[str, dict]] = [
+        (codec, {"codec": codec}) for codec in CODECS
+    ] + [(f"top{fraction:.0%}", {"topk": fraction}) for fraction in (0.1, 0.01)]
+    for name, kwargs in encodings:
+        array = encode_ndarray(update, **kwargs)
+        error = np.linalg.norm(array_to_ndarray(array) - update) / np.linalg.norm(
+            update
+        )
+        print(
+            f"{name:<12}{len(array.data) / 1e6:>12.2f}"
+            f"{raw / len(array.data):>8.1f}{error:>12.4f}"
+        )
+
+    updates = [
+        ParametersRecord({"weight": encode_ndarray(rng.normal(size=shape), topk=0.01)})
+        for _ in range(args.clients)
+    ]
+    # The server hands the aggregator the indices and values of each update, as
+    # stages.accumulate_parameters does
+    aggregator = create_aggregator()
+    start = time.perf_counter()
+    aggregator.begin_round()
+    for parameters in updates:
+        aggregator.accumulate(flat_arrays(parameters))
+    aggregator.finalize()
+    scattered = time.perf_counter() - start
+    start = time.perf_counter()
+    aggregator.begin_round()
+    for parameters in updates:
+        aggregator.accumulate(flat_arrays(decode_parameters(parameters)))
+    aggregator.finalize()
+    densified = time.perf_counter() - start
+    print(f"\nAggregating {args.clients} top1% updates")
+    print(f"{'scatter-add':<14}{scattered * 1e3:>8.1f} ms")
+    print(f"{'densify first':<14}{densified * 1e3:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Compression ratio and throughput of the lossless Array compressors.
+
+Runs every available compressor over the state dicts of a few typical PyTorch models
+and over encoded updates, reporting the ratio and the encoding and decoding
+throughput in MB/s of raw data, including the byte shuffling and the chunking.
+"""
+
+import argparse
+import os
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+import torch
+from flwr.common import ParametersRecord
+from torch import nn
+
+from interfaces.array_serde import (
+    COMPRESSORS,
+    compress_parameters,
+    decode_parameters,
+    encode_parameters,
+    ndarray_to_array,
+)
+from interfaces.pytorch import pytorch_to_parameter_record
+
+
+def mlp() -> nn.Module:
+    return nn.Sequential(
+        nn.Linear(784, 1024), nn.ReLU(), nn.Linear(1024, 1024), nn.Linear(1024, 10)
+    )
+
+
+def cnn() -> nn.Module:
+    return nn.Sequential(
+        nn.Conv2d(3, 64, 3),
+        nn.BatchNorm2d(64),
+        nn.Conv2d(64, 128, 3),
+        nn.BatchNorm2d(128),
+        nn.Conv2d(128, 256, 3),
+        nn.BatchNorm2d(256),
+        nn.Flatten(),
+        nn.Linear(256 * 26 * 26, 10),
+    )
+
+
+def update(parameters: ParametersRecord, **kwargs: object) -> ParametersRecord:
+    # A small training step worth of change, encoded as the nodes would send it
+    rng = np.random.default_rng(0)
+    delta = ParametersRecord(
+        OrderedDict(
+            (k, ndarray_to_array(rng.normal(0, 1e-3, v.shape).astype(np.float32)))
+            for k, v in parameters.items()
+        )
+    )
+    return encode_parameters(delta, **kwargs)  # type: ignore[arg-type]
+
+
+def size(parameters: ParametersRecord) -> int:
+    return sum(len(v.data) for v in parameters.values())
+
+
+def timed(function: Callable[[], ParametersRecord]) -> tuple[ParametersRecord, float]:
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+    torch.manual_seed(0)
+
+    mlp_parameters = pytorch_to_parameter_record(mlp())
+    payloads = [
+        ("mlp", mlp_parameters),
+        ("cnn", pytorch_to_parameter_record(cnn())),
+        ("mlp update", update(mlp_parameters, codec=None)),
+        ("mlp update int8", update(mlp_parameters, codec="int8")),
+        ("mlp update top1%", update(mlp_parameters, codec=None, topk=0.01)),
+    ]
+    print(f"{os.cpu_count()} CPUs, compressors: {', '.join(COMPRESSORS)}")
+    print(
+        f"{'payload':<18}{'MB':>8}{'compressor':>12}{'ratio':>8}"
+        f"{'enc MB/s':>10}{'dec MB/s':>10}"
+    )
+    for name, parameters in payloads:
+        raw = size(parameters)
+        for compressor in COMPRESSORS:
+            compressed, encoding = timed(
+                lambda: compress_parameters(parameters, compressor)
+            )
+            _, decoding = timed(lambda: decode_parameters(compressed, keep_sparse=True))
+            print(
+                f"{name:<18}{raw / 1e6:>8.2f}{compressor:>12}"
+                f"{raw / size(compressed):>8.2f}"
+                f"{raw / 1e6 / encoding:>10.0f}{raw / 1e6 / decoding:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Time to average the parameters of many nodes with the iris aggregator.
+
+Compares the former aggregation, which added each array into a buffer of its own
+dtype and weighted every node equally, against the current one, which weights each
+node by its number of examples into float64 sums without temporaries per node. The
+replies cycle over two distinct records, so that large models fit in memory; cells
+processing more than `--max-gb` of parameters per mode are skipped. The largest
+error of each average against the exact one is reported alongside.
+"""
+
+import argparse
+import time
+from collections import OrderedDict
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_models.iris.utils import Utils
+from interfaces.array_serde import array_to_ndarray
+from simulation import create_parameters
+
+
+def former_aggregate(parameter_list: list[ParametersRecord]) -> ParametersRecord:
+    # The iris aggregator as it was, Utils.parameters_to_dict inlined
+    parameters = [
+        OrderedDict(
+            (k, np.frombuffer(buffer=v.data, dtype=v.dtype).reshape(v.shape))
+            for k, v in param.items()
+        )
+        for param in parameter_list
+    ]
+    keys = parameters[0].keys()
+    result = OrderedDict()
+    for key in keys:
+        # Init array
+        this_array: np.ndarray = np.zeros_like(parameters[0][key])
+        for p in parameters:
+            this_array += p[key]
+        result[key] = this_array / len(parameter_list)
+    return Utils.dict_to_parameter_record(result)
+
+
+def max_error(
+    result: ParametersRecord, records: list[ParametersRecord], weights: list[float]
+) -> float:
+    # Exact weighted average of the float tensors, the replies cycling over two
+    # records; integer counters are rounded on purpose
+    totals = [sum(weights[i::2]) for i in range(2)]
+    error = 0.0
+    for key in result:
+        if result[key].dtype != "float32":
+            continue
+        exact = sum(
+            total * array_to_ndarray(record[key]).astype(np.float64)
+            for total, record in zip(totals, records)
+        ) / sum(totals)
+        error = max(error, float(np.abs(array_to_ndarray(result[key]) - exact).max()))
+    return error
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--max-gb", type=float, default=5.0)
+    args = parser.parse_args()
+
+    aggregator = create_aggregator()
+    print(
+        f"{'model (MB)':>11}{'nodes':>7}{'former (s)':>12}{'error':>10}"
+        f"{'weighted (s)':>14}{'error':>10}"
+    )
+    for size in args.sizes:
+        records = [create_parameters(size, seed) for seed in range(2)]
+        for n_nodes in args.nodes:
+            if size * n_nodes / 1000 > args.max_gb:
+                print(f"{size:>11}{n_nodes:>7}{'skipped':>12}{'':>10}{'skipped':>14}")
+                continue
+            replies = [records[i % 2] for i in range(n_nodes)]
+            weights = [float(10 + i % 7) for i in range(n_nodes)]
+            start = time.perf_counter()
+            former_result = former_aggregate(replies)
+            former = time.perf_counter() - start
+            former_error = max_error(former_result, records, [1.0] * n_nodes)
+            del former_result
+            start = time.perf_counter()
+            weighted_result = aggregator.aggregate_parameters(replies, weights)
+            weighted = time.perf_counter() - start
+            weighted_error = max_error(weighted_result, records, weights)
+            del weighted_result
+            print(
+                f"{size:>11}{n_nodes:>7}{former:>12.3f}{former_error:>10.1e}"
+                f"{weighted:>14.3f}{weighted_error:>10.1e}"
+            )
+        del records
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Per-round cost of the root server with a flat federation and with intermediate
+aggregators, as the number of leaves grows.
+
+Leaves are simulated by a driver answering train messages with prebuilt replies,
+going through the Flower protobuf serialisation both ways as the superlink does. In
+the flat federation, the root trains with every leaf itself. In the hierarchical
+one, it trains with `--intermediates` intermediate aggregators, each a separate
+process relaying the train message to its share of the leaves with `relay_train`
+and replying with one weighted update. The root's CPU time per round is reported,
+its wall time depending on how many cores run the intermediates and leaves.
+"""
+
+import argparse
+import multiprocessing
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from typing import Iterable, Iterator
+from unittest.mock import patch
+
+import numpy as np
+from flwr.common import (
+    DEFAULT_TTL,
+    Array,
+    ConfigsRecord,
+    Message,
+    MetricsRecord,
+    ParametersRecord,
+    RecordSet,
+)
+from flwr.common.serde import recordset_from_proto, recordset_to_proto
+from flwr.proto.recordset_pb2 import RecordSet as ProtoRecordSet
+from flwr.server import Driver
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_server import config, intermediate, requires
+from fl_server.rounds import RoundState
+from interfaces.array_serde import NUMPY_STYPE
+from simulation import FakeDriver
+
+
+@contextmanager
+def polling() -> Iterator[None]:
+    # Short intervals, the leaves replying at once
+    with patch.object(config, "POLL_INTERVAL", 1e-3):
+        with patch.object(config, "POLL_MAX_INTERVAL", 1e-2):
+            yield
+
+
+def serialise(content: RecordSet) -> bytes:
+    return recordset_to_proto(content).SerializeToString()
+
+
+def parse(payload: bytes) -> RecordSet:
+    return recordset_from_proto(ProtoRecordSet.FromString(payload))
+
+
+def train_reply(size: int, value: float) -> bytes:
+    data = np.float32(value).tobytes() * size
+    parameters = ParametersRecord(
+        OrderedDict(
+            {
+                "weight": Array(
+                    data=data, dtype="float32", stype=NUMPY_STYPE, shape=[size]
+                )
+            }
+        )
+    )
+    return serialise(
+        RecordSet(
+            parameters_records={"parameters": parameters},
+            metrics_records={"metrics": MetricsRecord({"loss": value})},
+            configs_records={
+                "config": ConfigsRecord(
+                    {"success": True, "message": "", "num_examples": 10}
+                )
+            },
+        )
+    )
+
+
+class MessageDriver(FakeDriver):
+    # Numbers the messages pushed and keeps them until they are answered
+    def __init__(self, node_ids: list[int]) -> None:
+        super().__init__(node_ids)
+        self.pending: dict[str, Message] = {}
+        self.count = 0
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        message_ids = []
+        for message in messages:
+            self.count += 1
+            message.metadata._message_id = str(self.count)
+            self.pending[str(self.count)] = message
+            self.send(message)
+            message_ids.append(str(self.count))
+        return message_ids
+
+    @abstractmethod
+    def send(self, message: Message) -> None:
+        pass
+
+
+class LeafDriver(MessageDriver):
+    # Leaves answer with one of two prebuilt replies, one reply per poll
+    def __init__(self, node_ids: list[int], replies: list[bytes]) -> None:
+        super().__init__(node_ids)
+        self.replies = replies
+
+    def send(self, message: Message) -> None:
+        serialise(message.content)
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        for message_id in message_ids:
+            if message_id in self.pending:
+                message = self.pending.pop(message_id)
+                payload = self.replies[message.metadata.dst_node_id % 2]
+                return [message.create_reply(parse(payload), ttl=DEFAULT_TTL)]
+        return []
+
+
+class ProcessDriver(MessageDriver):
+    # Intermediate aggregators are processes at the other end of a pipe
+    def __init__(self, connections: dict[int, Connection]) -> None:
+        super().__init__(list(connections))
+        self.connections = connections
+
+    def send(self, message: Message) -> None:
+        connection = self.connections[message.metadata.dst_node_id]
+        connection.send_bytes(serialise(message.content))
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        replies = []
+        for message_id in message_ids:
+            message = self.pending.get(message_id)
+            if message is None:
+                continue
+            connection = self.connections[message.metadata.dst_node_id]
+            if connection.poll():
+                del self.pending[message_id]
+                content = parse(connection.recv_bytes())
+                replies.append(message.create_reply(content, ttl=DEFAULT_TTL))
+        return replies
+
+
+def run_intermediate(connection: Connection, leaf_ids: list[int], size: int) -> None:
+    driver = LeafDriver(leaf_ids, [train_reply(size, 1.0), train_reply(size, 2.0)])
+    relay_vars = {"leaf_ids": leaf_ids}
+    with polling(), patch("builtins.print"):
+        while True:
+            payload = connection.recv_bytes()
+            if not payload:
+                return
+            message = driver.create_message(parse(payload), "train", 0, "train_model")
+            reply = intermediate.relay_train(message, driver, relay_vars)
+            connection.send_bytes(serialise(reply.content))
+
+
+def run_round(driver: Driver, size: int) -> tuple[float, float]:
+    aggregator = create_aggregator()
+    state = RoundState(
+        ParametersRecord(
+            {"weight": Array("float32", [size], NUMPY_STYPE, bytes(4 * size))}
+        )
+    )
+    start_cpu, start = time.process_time(), time.perf_counter()
+    aggregator.begin_round()
+    requires.train_model(
+        driver, driver.get_node_ids(), state, 0, accumulate=aggregator.accumulate
+    )
+    aggregator.finalize()
+    return time.process_time() - start_cpu, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--leaves", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--intermediates", type=int, default=4)
+    args = parser.parse_args()
+
+    replies = [train_reply(args.size, 1.0), train_reply(args.size, 2.0)]
+    print(
+        f"Model of {args.size * 4 / 1e6:.1f} MB, {args.intermediates} intermediates, "
+        f"{multiprocessing.cpu_count()} CPUs"
+    )
+    print(
+        f"{'leaves':>7}{'mode':>14}{'root messages':>15}{'root CPU (s)':>14}"
+        f"{'wall (s)':>10}"
+    )
+    for n_leaves in args.leaves:
+        leaf_ids = list(range(1, n_leaves + 1))
+        connections = {}
+        processes = []
+        for i in range(args.intermediates):
+            root_end, intermediate_end = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_intermediate,
+                args=(intermediate_end, leaf_ids[i :: args.intermediates], args.size),
+            )
+            process.start()
+            connections[1000 + i] = root_end
+            processes.append(process)
+
+        drivers = [
+            ("flat", LeafDriver(leaf_ids, replies)),
+            ("hierarchical", ProcessDriver(connections)),
+        ]
+        try:
+            with polling(), patch("builtins.print"):
+                rows = [
+                    (name, len(driver.get_node_ids()), *run_round(driver, args.size))
+                    for name, driver in drivers
+                ]
+        finally:
+            for connection in connections.values():
+                connection.send_bytes(b"")
+            for process in processes:
+                process.join()
+        for name, n_messages, cpu, wall in rows:
+            print(f"{n_leaves:>7}{name:>14}{n_messages:>15}{cpu:>14.2f}{wall:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
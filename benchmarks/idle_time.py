@@ -0,0 +1,61 @@
+"""
+Time a full server_main task spends sleeping while it waits for replies.
+
+Compares the former fixed 3 second polling against the adaptive backoff used by
+`driver_utils.wait_messages`, and reports how long the setup phase takes before the
+first train message is sent. Runs on a virtual clock, so it finishes instantly.
+"""
+
+import argparse
+from unittest.mock import patch
+
+from simulation import (
+    SimulatedDriver,
+    VirtualClock,
+    create_nodes,
+    create_task,
+    run_task,
+    simulated_services,
+)
+
+
+def measure(
+    n_nodes: int, n_rounds: int, poll_interval: float, max_poll_interval: float
+) -> tuple[VirtualClock, SimulatedDriver]:
+    from fl_server import config
+
+    clock = VirtualClock()
+    driver = SimulatedDriver(create_nodes(n_nodes), clock)
+    with (
+        simulated_services(clock),
+        patch.object(config, "POLL_INTERVAL", poll_interval),
+        patch.object(config, "POLL_MAX_INTERVAL", max_poll_interval),
+    ):
+        run_task(create_task(n_rounds), driver)
+    return clock, driver
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    modes = [
+        ("fixed 3s polling", 3.0, 3.0),
+        ("adaptive backoff", 0.01, 3.0),
+    ]
+    print(f"{args.nodes} nodes, {args.rounds} rounds")
+    print(f"{'mode':<20}{'wall (s)':>12}{'idle (s)':>12}{'polls':>8}{'setup (s)':>12}")
+    for name, poll_interval, max_poll_interval in modes:
+        clock, driver = measure(
+            args.nodes, args.rounds, poll_interval, max_poll_interval
+        )
+        print(
+            f"{name:<20}{clock.now:>12.2f}{clock.idle:>12.2f}{clock.sleeps:>8}"
+            f"{driver.first_train_at:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
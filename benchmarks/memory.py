@@ -0,0 +1,115 @@
+"""
+Peak memory of receiving parameters into a large PyTorch model.
+
+The model's state_dict is serialised to a ParametersRecord and through the Flower
+protobuf serialisation like a message. In a fresh process, the payload is parsed back
+and loaded into a second model, with tensors rebuilt either as copies of the received
+bytes or as read-only views on them, which `load_state_dict` copies into the model,
+or with the bytes copied straight into the model's tensors by the iris learner's
+`Utils.load_parameters`.
+Sending is identical in both modes: the protobuf messages only accept `bytes`, so
+the arrays are copied once out of the tensors whatever the mode.
+
+The peak resident set size of parsing and of loading are reported separately, over
+the memory in use when each phase starts, using the Linux peak reset of
+`/proc/self/clear_refs`.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+MODES = ["copy", "view", "in-place"]
+
+
+def create_model(n_layers: int, width: int):
+    from torch import nn
+
+    return nn.Sequential(*[nn.Linear(width, width) for _ in range(n_layers)])
+
+
+def serialise(path: str, n_layers: int, width: int) -> None:
+    import torch
+    from flwr.common.serde import parameters_record_to_proto
+    from interfaces.pytorch import pytorch_to_parameter_record
+
+    torch.manual_seed(0)
+    record = pytorch_to_parameter_record(create_model(n_layers, width))
+    with open(path, "wb") as f:
+        f.write(parameters_record_to_proto(record).SerializeToString())
+
+
+def _rss() -> tuple[int, int]:
+    # Current and peak resident set size in kB
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return int(status["VmRSS"].split()[0]), int(status["VmHWM"].split()[0])
+
+
+def _reset_peak() -> int:
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    return _rss()[0]
+
+
+def receive(path: str, mode: str, n_layers: int, width: int) -> tuple[int, int]:
+    from flwr.proto.recordset_pb2 import ParametersRecord as ProtoParametersRecord
+    from fl_models.iris.utils import Utils
+    from flwr.common.serde import parameters_record_from_proto
+    from interfaces.pytorch import parameters_to_pytorch_state_dict
+
+    model = create_model(n_layers, width)
+    with open(path, "rb") as f:
+        payload = f.read()
+
+    start = _reset_peak()
+    record = parameters_record_from_proto(ProtoParametersRecord.FromString(payload))
+    del payload
+    parse = _rss()[1] - start
+
+    start = _reset_peak()
+    if mode == "in-place":
+        Utils.load_parameters(model.state_dict(), record)
+    else:
+        state_dict = parameters_to_pytorch_state_dict(record, copy=mode == "copy")
+        model.load_state_dict(state_dict)
+        del state_dict
+    load = _rss()[1] - start
+
+    return parse, load
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--layers", type=int, default=8)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    shape = ["--layers", str(args.layers), "--width", str(args.width)]
+
+    if args.mode is not None:
+        print(*receive(args.payload, args.mode, args.layers, args.width))
+        return
+
+    size = args.layers * (args.width + 1) * args.width * 4 / 1e6
+    print(f"{args.layers} layers of {args.width}x{args.width}, {size:.1f} MB")
+    print(f"{'mode':<10}{'parse peak (MB)':>18}{'load peak (MB)':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payload.bin")
+        serialise(path, args.layers, args.width)
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--payload", path] + shape,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            parse, load = (int(kb) / 1024 for kb in output.split()[-2:])
+            print(f"{mode:<10}{parse:>18.1f}{load:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
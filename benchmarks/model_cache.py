@@ -0,0 +1,67 @@
+"""
+Time the client's load_model stage takes for repeated tasks on the same model, with
+the model loaded from the registry for every task and kept in the model cache.
+
+The iris model is registered in a file MLflow registry by another process, and each
+task runs load_model with its own MLflow context, as the client does when the server
+broadcasts the run details.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REGISTER = """
+import mlflow
+from fl_models.iris.fl_model import log_model
+log_model()
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)
+    os.environ["MLFLOW_URL"] = f"file://{directory}/mlruns"
+    subprocess.run([sys.executable, "-c", REGISTER], check=True)
+
+    from fl_client import stages
+    from fl_client.model_cache import ModelCache
+    from interfaces import mlflow_client
+
+    mlflow_client.setup_mlflow(os.environ["MLFLOW_URL"])
+
+    def load() -> float:
+        context = mlflow_client.MlflowContext()
+        context.model_name, context.model_version = "iris_model", 1
+        context.configured = True
+        with mlflow_client.use_context(context):
+            start = time.perf_counter()
+            stages.load_model({})
+            return time.perf_counter() - start
+
+    # The first load of the process imports and sets up MLflow, whichever the cache
+    stages.model_cache = ModelCache(0)
+    load()
+    rows = []
+    for name, budget in [("registry", 0), ("cache", 512 * 2**20)]:
+        stages.model_cache = ModelCache(budget)
+        rows.append((name, [load() for _ in range(args.tasks)]))
+
+    print(f"load_model time (s) of {args.tasks} tasks on the same model")
+    print(
+        f"{'loaded from':<14}"
+        + "".join(f"{f'task {i + 1}':>9}" for i in range(args.tasks))
+    )
+    for name, latencies in rows:
+        print(f"{name:<14}" + "".join(f"{latency:>9.4f}" for latency in latencies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Cost of exchanging and averaging a model with many small tensors, with one Array per
+tensor or with the whole model packed into a single Array.
+
+Reports the serialised size and the time to go through the Flower protobuf
+serialisation both ways, as every message does, and the time the iris aggregator
+takes to average the replies of the nodes, as the server hands them over.
+"""
+
+import argparse
+import time
+from collections import OrderedDict
+
+import numpy as np
+from flwr.common import ParametersRecord
+from flwr.common.serde import parameters_record_from_proto, parameters_record_to_proto
+from flwr.proto.recordset_pb2 import ParametersRecord as ProtoParametersRecord
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_server import stages
+from interfaces.array_serde import ndarray_to_array, pack_parameters
+
+
+def create_parameters(n_blocks: int, width: int, seed: int) -> ParametersRecord:
+    # Convolution-like blocks, each followed by a normalisation layer
+    rng = np.random.default_rng(seed)
+    arrays = OrderedDict()
+    for i in range(n_blocks):
+        arrays[f"block{i}.conv.weight"] = rng.random((width, width, 3, 3), np.float32)
+        for name in ["weight", "bias", "running_mean", "running_var"]:
+            arrays[f"block{i}.norm.{name}"] = rng.random(width, np.float32)
+        arrays[f"block{i}.norm.num_batches_tracked"] = np.array(i, dtype=np.int64)
+    return ParametersRecord(
+        OrderedDict((k, ndarray_to_array(v)) for k, v in arrays.items())
+    )
+
+
+def timed(function, repeat: int) -> tuple[float, object]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--width", type=int, default=16)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    replies = [
+        create_parameters(args.blocks, args.width, seed) for seed in range(args.nodes)
+    ]
+    global_vars = {"aggregator": create_aggregator()}
+    print(
+        f"{len(replies[0])} tensors, {sum(len(v.data) for v in replies[0].values())} "
+        f"bytes, {args.nodes} nodes"
+    )
+    print(
+        f"{'format':<10}{'bytes':>10}{'serialise (ms)':>16}{'parse (ms)':>12}"
+        f"{'pack (ms)':>11}{'aggregate (ms)':>16}"
+    )
+    for name in ["per-array", "packed"]:
+        pack_time = 0.0
+        records = replies
+        if name == "packed":
+            pack_time, _ = timed(lambda: pack_parameters(replies[0]), args.repeat)
+            records = [pack_parameters(r) for r in replies]
+        serialise_time, payload = timed(
+            lambda: parameters_record_to_proto(records[0]).SerializeToString(),
+            args.repeat,
+        )
+        parse_time, _ = timed(
+            lambda: parameters_record_from_proto(
+                ProtoParametersRecord.FromString(payload)
+            ),
+            args.repeat,
+        )
+
+        def aggregate() -> ParametersRecord:
+            stages.begin_round(global_vars)
+            for record in records:
+                stages.accumulate_parameters(record, global_vars)
+            return stages.finalize_parameters(global_vars)
+
+        aggregate_time, _ = timed(aggregate, args.repeat)
+        print(
+            f"{name:<10}{len(payload):>10}{serialise_time * 1e3:>16.2f}"
+            f"{parse_time * 1e3:>12.2f}{pack_time * 1e3:>11.2f}"
+            f"{aggregate_time * 1e3:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
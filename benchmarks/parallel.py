@@ -0,0 +1,57 @@
+"""
+Scaling of the iris aggregator with the number of aggregation threads.
+
+Large arrays are split into chunks summed on a thread pool, numpy releasing the
+GIL, as the server does with `AGGREGATION_WORKERS`. Reports the time to average
+the weighted replies of the nodes for each pool size, the speedup over one thread
+and whether the result is identical to the single-threaded one. The speedup is
+bounded by the cores available, reported first, and by memory bandwidth.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+from fl_models.iris.aggregator import create_aggregator
+from simulation import create_parameters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The replies cycle over two records, so that large models fit in memory
+    records = [create_parameters(args.size, seed) for seed in range(2)]
+    replies = [records[i % 2] for i in range(args.nodes)]
+    weights = [float(10 + i % 7) for i in range(args.nodes)]
+    aggregator = create_aggregator()
+
+    print(f"{os.cpu_count()} CPUs, {args.size} MB model, {args.nodes} nodes")
+    print(f"{'workers':>8}{'time (s)':>10}{'speedup':>9}{'identical':>11}")
+    serial_time, serial = 0.0, None
+    for workers in args.workers:
+        executor = ThreadPoolExecutor(workers) if workers > 1 else None
+        aggregator.set_executor(executor)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            result = aggregator.aggregate_parameters(replies, weights)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        if executor is not None:
+            executor.shutdown()
+        if serial is None:
+            serial_time, serial = elapsed, result
+        identical = all(result[k].data == serial[k].data for k in serial)
+        print(
+            f"{workers:>8}{elapsed:>10.3f}{serial_time / elapsed:>9.2f}"
+            f"{str(identical):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
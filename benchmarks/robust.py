@@ -0,0 +1,80 @@
+"""
+Memory and time of the robust aggregations against a naive median.
+
+The naive median stacks the parameters of every node into one N x model matrix
+before calling `np.median`, while `robust_aggregate_parameters` gathers blocks of
+coordinates from the nodes one block at a time. The peak memory traced by
+tracemalloc is reported on top of the replies themselves, the result included. The
+replies cycle over two distinct records, so that many nodes fit in memory; the naive
+median is skipped when its matrix would exceed `--max-gb`.
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+from interfaces.robust import robust_aggregate_parameters
+from simulation import create_parameters
+
+
+def naive_median(parameter_list: list[ParametersRecord]) -> ParametersRecord:
+    return ParametersRecord(
+        OrderedDict(
+            (
+                k,
+                ndarray_to_array(
+                    np.median(
+                        np.stack([array_to_ndarray(p[k]) for p in parameter_list]),
+                        axis=0,
+                    ).astype(np.float32)
+                ),
+            )
+            for k in parameter_list[0]
+        )
+    )
+
+
+def measure(function: Callable[[], object]) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--max-gb", type=float, default=1.5)
+    args = parser.parse_args()
+
+    records = [create_parameters(args.size, seed, counter=False) for seed in range(2)]
+    print(f"Model of {args.size} MB")
+    print(f"{'nodes':>6}{'method':>14}{'time (s)':>10}{'peak (MB)':>11}")
+    for n_nodes in args.nodes:
+        replies = [records[i % 2] for i in range(n_nodes)]
+        methods: list[tuple[str, Callable[[], object]]] = [
+            ("median", lambda: robust_aggregate_parameters(replies, "median")),
+            (
+                "trimmed_mean",
+                lambda: robust_aggregate_parameters(replies, "trimmed_mean", 0.1),
+            ),
+        ]
+        if args.size * n_nodes / 1000 <= args.max_gb:
+            methods.append(("naive median", lambda: naive_median(replies)))
+        for name, function in methods:
+            elapsed, peak = measure(function)
+            print(f"{n_nodes:>6}{name:>14}{elapsed:>10.2f}{peak / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
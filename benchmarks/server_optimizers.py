@@ -0,0 +1,103 @@
+"""
+Global rounds the iris model needs to reach a target loss, with plain averaging and
+with each server optimizer at its default hyperparameters.
+
+The iris data set is shuffled and split between nodes, each training the iris local
+learner for one epoch per round as the clients do. The server averages the replies
+weighted by their number of examples, applies its optimizer and computes the loss of
+the global model on the whole data set; its accuracy is reported alongside. Rounds
+are capped by `--max-rounds`.
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+import torch
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_models.iris.local_learner import create_local_learner
+from fl_server.optimizers import ServerOptimizer
+
+DATA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "common", "fl_models", "iris", "data.csv"
+)
+OPTIMIZERS = [None, "momentum", "adam", "yogi"]
+
+
+def global_loss(learner) -> float:
+    with torch.no_grad():
+        total = sum(
+            learner.loss_fn(learner(x), y).item() * len(y)
+            for x, y in learner.dataloader
+        )
+    return total / len(learner.dataloader.dataset)
+
+
+def rounds_to_target(
+    data: pd.DataFrame,
+    n_nodes: int,
+    target: float,
+    max_rounds: int,
+    name: str | None,
+) -> tuple[int | None, float, float]:
+    torch.manual_seed(0)
+    nodes = []
+    for i in range(n_nodes):
+        learner = create_local_learner()
+        learner.prepare_data(data.iloc[i::n_nodes].copy())
+        nodes.append((learner, len(data.iloc[i::n_nodes])))
+    evaluator = create_local_learner()
+    evaluator.prepare_data(data.copy())
+    aggregator = create_aggregator()
+    optimizer = ServerOptimizer(name) if name is not None else None
+
+    parameters = evaluator.get_parameters()
+    loss = 0.0
+    for round in range(1, max_rounds + 1):
+        replies = []
+        for learner, _ in nodes:
+            learner.set_parameters(parameters)
+            learner.train()
+            replies.append(learner.get_parameters())
+        aggregated = aggregator.aggregate_parameters(
+            replies, [float(n) for _, n in nodes]
+        )
+        if optimizer is not None:
+            aggregated = optimizer.step(parameters, aggregated)
+        parameters = aggregated
+        evaluator.set_parameters(parameters)
+        loss = global_loss(evaluator)
+        if loss <= target:
+            break
+    else:
+        round = None
+    return round, loss, evaluator.evaluate()["accuracy"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--target", type=float, default=0.95)
+    parser.add_argument("--max-rounds", type=int, default=300)
+    args = parser.parse_args()
+
+    data = pd.read_csv(DATA_PATH).sample(frac=1.0, random_state=0)
+    print(f"{args.nodes} nodes, target loss {args.target}")
+    print(f"{'optimizer':<10}{'rounds':>8}{'loss':>8}{'accuracy':>10}{'time (s)':>10}")
+    for name in OPTIMIZERS:
+        start = time.perf_counter()
+        rounds, loss, accuracy = rounds_to_target(
+            data, args.nodes, args.target, args.max_rounds, name
+        )
+        elapsed = time.perf_counter() - start
+        shown = str(rounds) if rounds is not None else f">{args.max_rounds}"
+        print(
+            f"{name or 'fedavg':<10}{shown:>8}{loss:>8.3f}{accuracy:>10.3f}"
+            f"{elapsed:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+In-process federation with a virtual clock, used by the benchmarks.
+
+Messages go through the same protobuf conversion as the superlink, so the sizes
+reported are the real wire sizes. Client replies are produced by the actual
+fl_client handlers, but they only become visible to the server after a simulated
+latency, measured on a virtual clock that advances whenever the server sleeps.
+"""
+
+import io
+import os
+import uuid
+import warnings
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager, redirect_stdout
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from flwr.common import (
+    DEFAULT_TTL,
+    Context,
+    Error,
+    Message,
+    MessageType,
+    Metadata,
+    ParametersRecord,
+    RecordSet,
+)
+from flwr.common.serde import (
+    message_from_taskins,
+    message_from_taskres,
+    message_to_taskins,
+    message_to_taskres,
+)
+from flwr.server import Driver
+
+from interfaces.array_serde import ndarray_to_array
+from schemas.task import Task
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_PATH = ROOT_DIR.joinpath("common", "fl_models", "iris", "data.csv")
+
+
+def payload_size(content: RecordSet) -> int:
+    return sum(
+        len(array.data)
+        for record in content.parameters_records.values()
+        for array in record.values()
+    )
+
+
+class VirtualClock:
+    """Drop-in replacement for the `time` module that never blocks."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.idle = 0.0
+        self.sleeps = 0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+        self.idle += seconds
+        self.sleeps += 1
+
+
+class SimulatedNode:
+    """A fl_client instance with its own state and a fixed response latency."""
+
+    def __init__(
+        self, node_id: int, latency: float, train_time: float, use_case: str = "iris"
+    ) -> None:
+        self.node_id = node_id
+        self.latency = latency
+        self.train_time = train_time
+        self.global_vars = {
+            "data": None,
+            "local_learner": None,
+            "model": None,
+            "model_meta": None,
+            "use_case": use_case,
+            "node_name": f"node_{node_id}",
+            "data_path": str(DATA_PATH),
+        }
+
+    def delay(self, message: Message) -> float:
+        if message.metadata.message_type == MessageType.TRAIN:
+            return self.latency + self.train_time
+        return self.latency
+
+    def handle(self, message: Message) -> Message:
+        from fl_client import main
+
+        main.global_vars = self.global_vars
+        context = Context(state=RecordSet())
+        try:
+            if message.metadata.message_type == MessageType.TRAIN:
+                return main.train(message, context)
+            return main.query(message, context)
+        except Exception as e:
+            return message.create_error_reply(Error(code=0, reason=repr(e)))
+
+
+class FakeDriver(Driver):
+    """
+    Driver building messages as the superlink does, the benchmarks deciding how
+    they are delivered and answered with push_messages and pull_messages.
+    """
+
+    def __init__(self, node_ids: list[int]) -> None:
+        self.node_ids = node_ids
+
+    def create_message(
+        self,
+        content: RecordSet,
+        message_type: str,
+        dst_node_id: int,
+        group_id: str,
+        ttl: Optional[float] = None,
+    ) -> Message:
+        metadata = Metadata(
+            run_id=0,
+            message_id="",
+            src_node_id=0,
+            dst_node_id=dst_node_id,
+            reply_to_message="",
+            group_id=group_id,
+            ttl=DEFAULT_TTL if ttl is None else ttl,
+            message_type=message_type,
+        )
+        return Message(metadata=metadata, content=content)
+
+    def get_node_ids(self) -> list[int]:
+        return list(self.node_ids)
+
+    def send_and_receive(
+        self, messages: Iterable[Message], *, timeout: Optional[float] = None
+    ) -> Iterable[Message]:
+        from fl_server.utils import driver_utils
+
+        message_ids = list(self.push_messages(messages))
+        return driver_utils.wait_messages(self, message_ids, timeout=timeout)
+
+
+class SimulatedDriver(FakeDriver):
+    def __init__(self, nodes: list[SimulatedNode], clock: VirtualClock) -> None:
+        super().__init__([node.node_id for node in nodes])
+        self.nodes = {node.node_id: node for node in nodes}
+        self.clock = clock
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # Size of the arrays alone, without the message overhead
+        self.payload_sent = 0
+        self.payload_received = 0
+        self.first_train_at: Optional[float] = None
+        self.uploaded: Optional[ParametersRecord] = None
+        self._replies: dict[str, tuple[float, bytes]] = {}
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        message_ids = []
+        for message in messages:
+            if (
+                message.metadata.message_type == MessageType.TRAIN
+                and self.first_train_at is None
+            ):
+                self.first_train_at = self.clock.now
+            configs = message.content.configs_records
+            if (
+                "config" in configs
+                and configs["config"].get("mode", "") == "upload_model"
+            ):
+                self.uploaded = message.content.parameters_records["parameters"]
+            taskins = message_to_taskins(message)
+            taskins.task_id = str(uuid.uuid4())
+            self.bytes_sent += taskins.ByteSize()
+            self.payload_sent += payload_size(message.content)
+            node = self.nodes[message.metadata.dst_node_id]
+            received = message_from_taskins(taskins)
+            reply = node.handle(received)
+            taskres = message_to_taskres(reply)
+            taskres.task_id = str(uuid.uuid4())
+            self.bytes_received += taskres.ByteSize()
+            if reply.has_content():
+                self.payload_received += payload_size(reply.content)
+            ready_at = self.clock.now + node.delay(received)
+            self._replies[taskins.task_id] = (ready_at, taskres.SerializeToString())
+            message_ids.append(taskins.task_id)
+        return message_ids
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        from flwr.proto.task_pb2 import TaskRes
+
+        replies = []
+        for message_id in message_ids:
+            if message_id not in self._replies:
+                continue
+            ready_at, payload = self._replies[message_id]
+            if ready_at <= self.clock.now:
+                del self._replies[message_id]
+                taskres = TaskRes()
+                taskres.ParseFromString(payload)
+                replies.append(message_from_taskres(taskres))
+        return replies
+
+
+def create_task(num_global_iterations: int = 5, **kwargs: object) -> Task:
+    return Task(
+        id=1,
+        user_id="benchmark",
+        use_case="iris",
+        model_name="iris_model",
+        model_version=1,
+        num_global_iterations=num_global_iterations,
+        run_name="benchmark",
+        experiment_name="benchmark",
+        **kwargs,
+    )
+
+
+def create_nodes(
+    n_nodes: int,
+    latency: Callable[[int], float] = lambda i: 0.02 + 0.01 * i,
+    train_time: Callable[[int], float] = lambda i: 0.2 + 0.05 * i,
+) -> list[SimulatedNode]:
+    return [SimulatedNode(i + 1, latency(i), train_time(i)) for i in range(n_nodes)]
+
+
+def create_parameters(
+    size_mb: int, seed: int, counter: bool = True
+) -> ParametersRecord:
+    # Eight equal layers of random weights, and a batch counter
+    rng = np.random.default_rng(seed)
+    n = size_mb * 1_000_000 // 4 // 8
+    arrays = OrderedDict(
+        (f"layer{i}.weight", rng.random(n, dtype=np.float32)) for i in range(8)
+    )
+    if counter:
+        arrays["num_batches_tracked"] = np.array(seed, dtype=np.int64)
+    return ParametersRecord(
+        OrderedDict((k, ndarray_to_array(v)) for k, v in arrays.items())
+    )
+
+
+@contextmanager
+def simulated_services(clock: VirtualClock) -> Iterator[None]:
+    """Replace MLflow, RabbitMQ and wall-clock sleeps for a simulated run."""
+    warnings.simplefilter("ignore")
+    os.environ.setdefault("DATA_PATH", str(DATA_PATH))
+    os.environ.setdefault("MLFLOW_URL", "http://localhost:5000")
+
+    from fl_models.iris.fl_model import FLModel
+
+    fl_model_wrapper = MagicMock()
+    fl_model_wrapper.unwrap_python_model.return_value = FLModel()
+    client_mlflow = MagicMock()
+    client_mlflow.load_model.return_value = fl_model_wrapper
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("fl_server.utils.driver_utils.time", clock))
+        stack.enter_context(patch("fl_server.app.rabbitmq_client"))
+        stack.enter_context(patch("fl_server.app.mlflow_client"))
+        stack.enter_context(
+            patch(
+                "fl_server.app.mlflow_utils.create_mlflow_runs",
+                return_value=("experiment", "parent_run", "child_run"),
+            )
+        )
+        stack.enter_context(
+            patch(
+                "fl_server.stages.mlflow_client.load_model",
+                return_value=fl_model_wrapper,
+            )
+        )
+        stack.enter_context(patch("fl_client.stages.mlflow_client", client_mlflow))
+        stack.enter_context(redirect_stdout(io.StringIO()))
+        yield
+
+
+def run_task(task: Task, driver: SimulatedDriver) -> None:
+    from fl_server.app import get_serverapp
+
+    app = get_serverapp(task)
+    app._main(driver, Context(state=RecordSet()))
@@ -0,0 +1,134 @@
+"""
+Server memory and aggregation latency of a training round, collecting every reply
+before aggregating against folding each reply into the aggregate as it arrives.
+
+Replies are built by a fake superlink only when they are pulled, one per poll, so
+that the peak traced by tracemalloc is the memory held by the server itself. The
+time left to aggregate once the last reply is in is reported alongside.
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Iterable
+from unittest.mock import patch
+
+import numpy as np
+from flwr.common import (
+    DEFAULT_TTL,
+    Array,
+    ConfigsRecord,
+    Message,
+    Metadata,
+    MetricsRecord,
+    ParametersRecord,
+    RecordSet,
+)
+
+from fl_models.iris.aggregator import create_aggregator
+from fl_server import config, requires
+from fl_server.rounds import RoundState
+from interfaces.array_serde import NUMPY_STYPE
+from simulation import FakeDriver
+
+
+def create_parameters(size: int, value: float) -> ParametersRecord:
+    # The data is built as bytes directly, like a message parsed off the wire
+    def full(n: int) -> Array:
+        data = np.float32(value).tobytes() * n
+        return Array(data=data, dtype="float32", stype=NUMPY_STYPE, shape=[n])
+
+    return ParametersRecord(OrderedDict({"weight": full(size), "bias": full(16)}))
+
+
+class ReplyingDriver(FakeDriver):
+    def __init__(self, size: int) -> None:
+        super().__init__([])
+        self.size = size
+        self._pending: list[tuple[int, str]] = []
+
+    def push_messages(self, messages: Iterable[Message]) -> Iterable[str]:
+        self._pending = [
+            (message.metadata.dst_node_id, str(i)) for i, message in enumerate(messages)
+        ]
+        return [message_id for _, message_id in self._pending]
+
+    def pull_messages(self, message_ids: Iterable[str]) -> Iterable[Message]:
+        # One reply per poll, as nodes finish one after the other
+        if not self._pending:
+            return []
+        node_id, message_id = self._pending.pop(0)
+        metadata = Metadata(
+            run_id=0,
+            message_id="",
+            src_node_id=node_id,
+            dst_node_id=0,
+            reply_to_message=message_id,
+            group_id="train_model",
+            ttl=DEFAULT_TTL,
+            message_type="train",
+        )
+        content = RecordSet(
+            parameters_records={
+                "parameters": create_parameters(self.size, float(node_id))
+            },
+            metrics_records={"metrics": MetricsRecord({"loss": 0.0})},
+            configs_records={"config": ConfigsRecord({"success": True, "message": ""})},
+        )
+        return [Message(metadata=metadata, content=content)]
+
+
+def run_round(n_nodes: int, size: int, streaming: bool) -> tuple[float, float]:
+    aggregator = create_aggregator()
+    driver = ReplyingDriver(size)
+    state = RoundState(create_parameters(size, 0.0))
+    node_ids = list(range(1, n_nodes + 1))
+
+    tracemalloc.start()
+    if streaming:
+        aggregator.begin_round()
+        requires.train_model(
+            driver, node_ids, state, 0, accumulate=aggregator.accumulate
+        )
+        start = time.perf_counter()
+        aggregator.finalize()
+    else:
+        results, _ = requires.train_model(driver, node_ids, state, 0)
+        start = time.perf_counter()
+        aggregator.aggregate_parameters([r[0] for r in results])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[5, 10, 20])
+    args = parser.parse_args()
+
+    print(f"Model of {args.size * 4 / 1e6:.1f} MB")
+    print(
+        f"{'nodes':>6}{'mode':>11}{'peak (MB)':>12}{'peak / model':>14}"
+        f"{'after last reply (ms)':>23}"
+    )
+    with (
+        patch.object(config, "POLL_INTERVAL", 0.0),
+        patch("builtins.print"),
+    ):
+        rows = [
+            (n_nodes, mode, *run_round(n_nodes, args.size, mode == "streaming"))
+            for n_nodes in args.nodes
+            for mode in ["collect", "streaming"]
+        ]
+    for n_nodes, mode, peak, elapsed in rows:
+        print(
+            f"{n_nodes:>6}{mode:>11}{peak / 1e6:>12.1f}"
+            f"{peak / (args.size * 4):>14.1f}{elapsed * 1e3:>23.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Bytes exchanged with the nodes during a full server_main task.
+
+Sizes are those of the protobuf messages sent to and received from the superlink,
+reported per node and round of training for each transport mode, along with the
+size of the arrays they carry. The drift column is the largest difference between
+the final model and the one trained with full precision transfers.
+"""
+
+import argparse
+
+import numpy as np
+import torch
+from flwr.common import ParametersRecord
+
+from interfaces.array_serde import array_to_ndarray
+from simulation import (
+    SimulatedDriver,
+    VirtualClock,
+    create_nodes,
+    create_task,
+    run_task,
+    simulated_services,
+)
+
+
+def measure(n_nodes: int, n_rounds: int, **task_kwargs: object) -> SimulatedDriver:
+    torch.manual_seed(0)
+    clock = VirtualClock()
+    driver = SimulatedDriver(create_nodes(n_nodes), clock)
+    with simulated_services(clock):
+        run_task(create_task(n_rounds, **task_kwargs), driver)
+    return driver
+
+
+def drift(parameters: ParametersRecord, reference: ParametersRecord) -> float:
+    return max(
+        float(np.abs(array_to_ndarray(v) - array_to_ndarray(reference[k])).max())
+        for k, v in parameters.items()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    modes: list[tuple[str, dict[str, object]]] = [
+        ("full", {}),
+        ("delta", {"delta_transport": True}),
+        ("float16", {"update_codec": "float16"}),
+        ("bfloat16", {"update_codec": "bfloat16"}),
+        ("int8", {"update_codec": "int8"}),
+        ("delta+int8", {"delta_transport": True, "update_codec": "int8"}),
+        (
+            "delta+int8+ef",
+            {"delta_transport": True, "update_codec": "int8", "error_feedback": True},
+        ),
+        ("delta+top10%", {"delta_transport": True, "update_topk": 0.1}),
+    ]
+    per_round = args.nodes * args.rounds
+    reference = None
+    print(f"{args.nodes} nodes, {args.rounds} rounds, bytes per node and round")
+    print(
+        f"{'mode':<16}{'sent':>10}{'received':>10}{'arrays out':>12}"
+        f"{'arrays in':>12}{'drift':>10}"
+    )
+    for name, task_kwargs in modes:
+        driver = measure(args.nodes, args.rounds, **task_kwargs)
+        if driver.uploaded is None:
+            raise RuntimeError(f"No model was uploaded in mode {name}")
+        reference = reference or driver.uploaded
+        print(
+            f"{name:<16}{driver.bytes_sent / per_round:>10.0f}"
+            f"{driver.bytes_received / per_round:>10.0f}"
+            f"{driver.payload_sent / per_round:>12.0f}"
+            f"{driver.payload_received / per_round:>12.0f}"
+            f"{drift(driver.uploaded, reference):>10.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Time from dispatching a task to its first train message, with the task run in the
+server's consumer thread and handed to a pre-warmed worker process.
+
+A local Flower superlink and a file MLflow registry holding the iris model are
+started, so that the driver connection, the MLflow runs and the model load are the
+real ones. RabbitMQ is replaced by a mock, and the client round trips by stubs as no
+node is connected: the first train message is when the training loop starts. In the
+consumer thread, the server has imported its modules, as when it is listening. Tasks
+are dispatched `--gap` seconds apart, the workers being replaced every
+`--max-tasks` tasks.
+"""
+
+import argparse
+import functools
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from flwr.common import ParametersRecord
+
+SUPERLINK = "127.0.0.1:19091"
+REGISTER = """
+import mlflow
+from fl_models.iris.fl_model import log_model
+log_model()
+mlflow.end_run()
+mlflow.create_experiment("warm_workers")
+"""
+
+
+def stub(path: str) -> None:
+    # Runs in every process running tasks, before it warms up
+    from fl_server import app
+    from interfaces import rabbitmq_client
+
+    def first_train(*args: object, **kwargs: object) -> None:
+        with open(path, "a") as file:
+            file.write(f"{time.time()}\n")
+
+    rabbitmq_client.setup_rabbitmq = MagicMock()
+    app.requires.setup_clients = lambda *args: ([], ParametersRecord())
+    app.requires.upload_model = lambda *args: None
+    app.requires.clean_config = lambda *args: None
+    app._training_loop = first_train
+
+
+def wait_for(path: Path, count: int) -> float:
+    while not path.exists() or len(path.read_text().splitlines()) < count:
+        time.sleep(1e-3)
+    return float(path.read_text().splitlines()[count - 1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=6)
+    parser.add_argument("--max-tasks", type=int, default=3)
+    parser.add_argument("--gap", type=float, default=5.0)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp())
+    os.chdir(directory)
+    os.environ["MLFLOW_URL"] = f"file://{directory}/mlruns"
+    superlink = subprocess.Popen(
+        [
+            "flower-superlink",
+            "--insecure",
+            "--driver-api-address",
+            SUPERLINK,
+            "--fleet-api-address",
+            "127.0.0.1:19092",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        from fl_server import config, main
+        from fl_server.workers import WorkerPool
+        from interfaces import mlflow_client
+        from schemas.task import TaskRead
+
+        # Registered by another process, leaving this one as a listening server
+        subprocess.run([sys.executable, "-c", REGISTER], check=True)
+        config.MLFLOW_URL = os.environ["MLFLOW_URL"]
+        mlflow_client.setup_mlflow(config.MLFLOW_URL, is_central_node=True)
+        main.SUPERLINK_URL = SUPERLINK
+        time.sleep(5)
+
+        def task(task_id: int) -> TaskRead:
+            return TaskRead(
+                user_id="user",
+                use_case="iris",
+                model_name="iris_model",
+                model_version=1,
+                num_global_iterations=1,
+                id=task_id,
+                status="pending",
+                created_at="2024-01-01T00:00:00",
+                run_name=f"run_{task_id}",
+                experiment_name="warm_workers",
+            )
+
+        rows = []
+        path = directory / "thread.txt"
+        stub(str(path))
+        latencies = []
+        for i in range(args.tasks):
+            start = time.time()
+            main.run_task(task(i))
+            latencies.append(wait_for(path, i + 1) - start)
+            time.sleep(args.gap)
+        rows.append(("consumer thread", latencies))
+
+        path = directory / "workers.txt"
+        pool = WorkerPool(
+            1,
+            args.max_tasks,
+            SUPERLINK,
+            functools.partial(stub, str(path)),
+        )
+        latencies = []
+        try:
+            pool.wait()
+            for i in range(args.tasks):
+                start = time.time()
+                pool.submit(task(args.tasks + i))
+                latencies.append(wait_for(path, i + 1) - start)
+                time.sleep(args.gap)
+        finally:
+            pool.shutdown()
+        rows.append(("warm worker", latencies))
+    finally:
+        superlink.terminate()
+        superlink.wait()
+
+    print(f"{args.tasks} tasks, workers replaced every {args.max_tasks}")
+    print(
+        f"{'runs in':<18}" + "".join(f"{f'task {i + 1}':>9}" for i in range(args.tasks))
+    )
+    for name, latencies in rows:
+        print(f"{name:<18}" + "".join(f"{latency:>9.3f}" for latency in latencies))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,146 @@ from .utils import Utils
 
 
 def create_aggregator():
+    import threading
     from collections import OrderedDict
+    from concurrent.futures import Executor
+    from typing import Callable
 
     import numpy as np
     from flwr.common import ParametersRecord, MetricsRecord
 
     class Aggregator:
+        # Elements per task when arrays are split over the executor
+        CHUNK = 1 << 18
+        SCRATCH = 1 << 16
+
+        def __init__(self):
+            self._executor: Executor | None = None
+            self._local = threading.local()
+            self.begin_round()
+
+        def set_executor(self, executor: Executor | None) -> None:
+            # Large arrays are then summed chunk by chunk on the executor's threads,
+            # numpy releasing the GIL; the result is the same as in one thread
+            self._executor = executor
+
+        def _for_chunks(
+            self,
+            sizes: list[tuple[str, int]],
+            function: Callable[[str, int, int], None],
+        ) -> None:
+            # Calls function(key, i, j) over the elements of each array, splitting
+            # the large ones into tasks while the small ones run in this thread
+            futures = []
+            for key, size in sizes:
+                if self._executor is None or size <= self.CHUNK:
+                    function(key, 0, size)
+                    continue
+                for i in range(0, size, self.CHUNK):
+                    futures.append(
+                        self._executor.submit(
+                            function, key, i, min(i + self.CHUNK, size)
+                        )
+                    )
+            for future in futures:
+                future.result()
+
+        def _scratch(self) -> np.ndarray:
+            # One scratch buffer per thread
+            scratch = getattr(self._local, "scratch", None)
+            if scratch is None:
+                scratch = self._local.scratch = np.empty(self.SCRATCH, np.float64)
+            return scratch
+
+        def begin_round(self) -> None:
+            # Weighted float64 sum of the parameters accumulated so far, with the
+            # dtype each array is returned with
+            self._sums: OrderedDict[str, np.ndarray] = OrderedDict()
+            self._dtypes: dict[str, np.dtype] = {}
+            self._weight = 0.0
+
+        def accumulate(self, parameters, weight: float = 1.0) -> None:
+            # Parameters come as a ParametersRecord of raw arrays, or decoded by the
+            # platform: the shape, dtype and flat values of each array, or the flat
+            # indices and values of a sparse update
+            if isinstance(parameters, ParametersRecord):
+                arrays = [
+                    (
+                        key,
+                        (
+                            tuple(array.shape),
+                            np.dtype(array.dtype),
+                            Utils._basic_array_deserialisation(array).reshape(-1),
+                        ),
+                    )
+                    for key, array in parameters.items()
+                ]
+            else:
+                arrays = list(parameters.items())
+
+            # Arrays are added straight into dense buffers, sparse updates included.
+            # An array missing from an update is an unchanged one, adding nothing.
+            dense: dict[str, np.ndarray] = {}
+            for key, (shape, dtype, values) in arrays:
+                if key not in self._sums:
+                    self._sums[key] = np.zeros(shape, dtype=np.float64)
+                    self._dtypes[key] = np.dtype(dtype)
+                if isinstance(values, tuple):
+                    indices, entries = values
+                    total = self._sums[key].reshape(-1)
+                    total[indices] += entries if weight == 1 else weight * entries
+                    continue
+                dense[key] = values
+
+            def add(key: str, i: int, j: int) -> None:
+                total, array = self._sums[key].reshape(-1)[i:j], dense[key][i:j]
+                if weight == 1:
+                    np.add(total, array, out=total)
+                    return
+                # Weighted block by block through a scratch buffer that stays in
+                # cache, instead of a weighted copy of the whole array
+                scratch = self._scratch()
+                for k in range(0, j - i, scratch.size):
+                    block = total[k : k + scratch.size]
+                    np.multiply(
+                        array[k : k + block.size], weight, out=scratch[: block.size]
+                    )
+                    np.add(block, scratch[: block.size], out=block)
+
+            self._for_chunks([(key, array.size) for key, array in dense.items()], add)
+            self._weight += weight
+
+        def finalize(self) -> ParametersRecord:
+            if not self._weight:
+                raise ValueError("No parameters were accumulated")
+            sums, dtypes, weight = self._sums, self._dtypes, self._weight
+            self.begin_round()
+
+            def divide(key: str, i: int, j: int) -> None:
+                total = sums[key].reshape(-1)[i:j]
+                np.divide(total, weight, out=total)
+                # Integer buffers such as batch counters are rounded back
+                if not np.issubdtype(dtypes[key], np.inexact):
+                    np.rint(total, out=total)
+
+            self._for_chunks([(key, total.size) for key, total in sums.items()], divide)
+            return Utils.dict_to_parameter_record(
+                OrderedDict(
+                    (key, total.astype(dtypes[key])) for key, total in sums.items()
+                )
+            )
+
         def aggregate_parameters(
-            self, parameter_list: list[ParametersRecord]
+            self,
+            parameter_list: list[ParametersRecord],
+            weights: list[float] | None = None,
         ) -> ParametersRecord:
-            parameters = [Utils.parameters_to_dict(param) for param in parameter_list]
-            keys = parameters[0].keys()
-            result = OrderedDict()
-            for key in keys:
-                # Init array
-                this_array: np.ndarray = np.zeros_like(parameters[0][key])
-                for p in parameters:
-                    this_array += p[key]
-                result[key] = this_array / len(parameter_list)
-            return Utils.dict_to_parameter_record(result)
+            if weights is None:
+                weights = [1.0] * len(parameter_list)
+            self.begin_round()
+            for parameters, weight in zip(parameter_list, weights):
+                self.accumulate(parameters, weight)
+            return self.finalize()
 
         def aggregate_metrics(self, metrics_list: list[MetricsRecord]) -> MetricsRecord:
             keys = metrics_list[0].keys()
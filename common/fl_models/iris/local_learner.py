@@ -24,7 +24,7 @@ def create_local_learner():
             return Utils.pytorch_to_parameter_record(self.state_dict())
 
         def set_parameters(self, parameters: ParametersRecord):
-            self.load_state_dict(Utils.parameters_to_pytorch_state_dict(parameters))
+            Utils.load_parameters(self.state_dict(), parameters)
 
         def prepare_data(self, data):
             class IrisDataset(Dataset):
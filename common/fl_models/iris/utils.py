@@ -7,16 +7,12 @@ from flwr.common import Array, NDArray, ParametersRecord
 class Utils:
     @staticmethod
     def _basic_array_deserialisation(array: Array) -> NDArray:
+        # Quantized, sparse and packed arrays are decoded by the platform before
+        # reaching the model
+        if array.stype != "numpy.ndarray.tobytes":
+            raise ValueError(f"Unsupported array stype: {array.stype}")
         return np.frombuffer(buffer=array.data, dtype=array.dtype).reshape(array.shape)
 
-    @staticmethod
-    def parameters_to_dict(params_record: ParametersRecord) -> OrderedDict:
-        state_dict = OrderedDict()
-        for k, v in params_record.items():
-            state_dict[k] = Utils._basic_array_deserialisation(v)
-
-        return state_dict
-
     @staticmethod
     def _ndarray_to_array(ndarray: NDArray) -> Array:
         """Represent NumPy ndarray as Array."""
@@ -50,15 +46,33 @@ class Utils:
         return ParametersRecord(transformed_state_dict)
 
     @staticmethod
-    def parameters_to_pytorch_state_dict(
-        params_record: ParametersRecord,
-    ) -> dict:
+    def load_parameters(state_dict: dict, params_record: ParametersRecord) -> None:
+        """Copy a ParametersRecord into the tensors of a PyTorch state_dict in place."""
         # Make sure to import locally torch as it is only available in the server
+        import warnings
+
         import torch
 
-        """Reconstruct PyTorch state_dict from its serialised representation."""
-        state_dict = {}
-        for k, v in params_record.items():
-            state_dict[k] = torch.tensor(Utils._basic_array_deserialisation(v))
+        if set(state_dict.keys()) != set(params_record.keys()):
+            raise ValueError("ParametersRecord does not match the model's state_dict")
+
+        # Check every array before writing any, so that a mismatch leaves the
+        # model untouched. The tensors are read-only views on the record
+        sources = {}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            for k, target in state_dict.items():
+                source = torch.from_numpy(
+                    Utils._basic_array_deserialisation(params_record[k])
+                )
+                if source.shape != target.shape or source.dtype != target.dtype:
+                    raise ValueError(
+                        f"Array {k} is {source.dtype}{list(source.shape)}, "
+                        f"expected {target.dtype}{list(target.shape)}"
+                    )
+                sources[k] = source
 
-        return state_dict
+        # The received buffers are copied straight into the model's storage
+        with torch.no_grad():
+            for k, target in state_dict.items():
+                target.copy_(sources[k])
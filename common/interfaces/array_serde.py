@@ -1,17 +1,507 @@
+import json
+import math
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Mapping
+
 import numpy as np
-from flwr.common import Array, NDArray
+from flwr.common import Array, NDArray, ParametersRecord
+
+# Optional compressors, zlib from the standard library is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+NUMPY_STYPE = "numpy.ndarray.tobytes"
+FLOAT16_STYPE = "quantized.float16"
+BFLOAT16_STYPE = "quantized.bfloat16"
+INT8_STYPE = "quantized.int8"
+INT8_CHANNEL_STYPE = "quantized.int8.channel"
+SPARSE_STYPE = "sparse.topk"
+# Lossless compression wraps another stype: compressed:<compressor>:<filter>:<stype>
+COMPRESSED_STYPE = "compressed"
+COMPRESSION_CHUNK_SIZE = 1 << 20
+# A packed ParametersRecord holds all its arrays in one Array under PACKED_KEY
+PACKED_STYPE = "packed"
+PACKED_KEY = "packed"
+PACKED_ALIGNMENT = 64
+
+# Flat values of an array, or the flat indices and values of a sparse one
+FlatValues = NDArray | tuple[NDArray, NDArray]
+
+# Codec names selectable by a task, mapped to the stype they encode to
+CODECS = {
+    "float16": FLOAT16_STYPE,
+    "bfloat16": BFLOAT16_STYPE,
+    "int8": INT8_STYPE,
+    "int8_channel": INT8_CHANNEL_STYPE,
+}
+
+
+def _compressors() -> dict[str, tuple[Callable, Callable]]:
+    compressors: dict[str, tuple[Callable, Callable]] = {
+        "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress)
+    }
+    if zstandard is not None:
+        compressors["zstd"] = (
+            lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+            lambda data: zstandard.ZstdDecompressor().decompress(data),
+        )
+    if lz4 is not None:
+        compressors["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _map_chunks(function: Callable[[bytes], bytes], chunks: list[bytes]) -> list[bytes]:
+    # zlib, zstd and lz4 release the GIL, so chunks are processed in parallel
+    global _executor
+    if len(chunks) < 2:
+        return [function(chunk) for chunk in chunks]
+    # Created on first use, by one of the threads getting there at once
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count(), thread_name_prefix="array_serde"
+            )
+    return list(_executor.map(function, chunks))
+
+
+def _shuffle(data: bytes, itemsize: int) -> bytes:
+    # Group the n-th bytes of every element, which compresses floats far better
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(data: bytes, itemsize: int) -> bytes:
+    return np.frombuffer(data, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def _int8_quantize(ndarray: NDArray) -> tuple[NDArray, NDArray, NDArray]:
+    # Asymmetric quantization along the first axis, the range always includes 0
+    channels = ndarray.reshape(ndarray.shape[0], -1).astype(np.float32)
+    low = np.minimum(channels.min(axis=1), 0.0)
+    high = np.maximum(channels.max(axis=1), 0.0)
+    scale = ((high - low) / 255.0).astype(np.float32)
+    scale[scale == 0] = 1.0
+    zero_point = np.clip(np.round(-128 - low / scale), -128, 127).astype(np.int8)
+    quantized = np.round(channels / scale[:, None]) + zero_point[:, None]
+    return np.clip(quantized, -128, 127).astype(np.int8), scale, zero_point
+
+
+def _encode(ndarray: NDArray, stype: str) -> bytes:
+    if stype == FLOAT16_STYPE:
+        return ndarray.astype(np.float16).tobytes()
+    if stype == BFLOAT16_STYPE:
+        # Round to nearest even on the upper 16 bits of the float32 representation
+        bits = ndarray.astype(np.float32).view(np.uint32)
+        rounded = bits + 0x7FFF + ((bits >> 16) & 1)
+        return (rounded >> 16).astype(np.uint16).tobytes()
+    if stype == INT8_STYPE:
+        quantized, scale, zero_point = _int8_quantize(ndarray.reshape(1, -1))
+        return scale.tobytes() + zero_point.tobytes() + quantized.tobytes()
+    if stype == INT8_CHANNEL_STYPE:
+        quantized, scale, zero_point = _int8_quantize(ndarray)
+        return scale.tobytes() + zero_point.tobytes() + quantized.tobytes()
+    raise ValueError(f"Unknown stype: {stype}")
+
+
+def _decode(array: Array) -> NDArray:
+    if array.stype == FLOAT16_STYPE:
+        ndarray = np.frombuffer(array.data, dtype=np.float16)
+    elif array.stype == BFLOAT16_STYPE:
+        bits = np.frombuffer(array.data, dtype=np.uint16).astype(np.uint32) << 16
+        ndarray = bits.view(np.float32)
+    elif array.stype == SPARSE_STYPE:
+        indices, values = sparse_array_components(array)
+        ndarray = np.zeros(math.prod(array.shape), dtype=array.dtype)
+        ndarray[indices] = values
+    elif array.stype in (INT8_STYPE, INT8_CHANNEL_STYPE):
+        n_channels = array.shape[0] if array.stype == INT8_CHANNEL_STYPE else 1
+        scale = np.frombuffer(array.data, dtype=np.float32, count=n_channels)
+        zero_point = np.frombuffer(
+            array.data, dtype=np.int8, count=n_channels, offset=4 * n_channels
+        )
+        quantized = np.frombuffer(array.data, dtype=np.int8, offset=5 * n_channels)
+        quantized = quantized.reshape(n_channels, -1).astype(np.float32)
+        ndarray = (quantized - zero_point[:, None]) * scale[:, None]
+    else:
+        raise ValueError(f"Unknown stype: {array.stype}")
+    return ndarray.astype(array.dtype).reshape(array.shape)
 
 
-def ndarray_to_array(ndarray: NDArray) -> Array:
-    """Represent NumPy ndarray as Array."""
+def ndarray_to_array(ndarray: NDArray, codec: str | None = None) -> Array:
+    """
+    Represent NumPy ndarray as Array.
+
+    Floating point arrays are encoded with the lossy `codec` when one is given, any
+    other array is kept at full precision.
+    """
+    stype = NUMPY_STYPE
+    if codec is not None:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        if np.issubdtype(ndarray.dtype, np.floating) and ndarray.size > 0:
+            stype = CODECS[codec]
+            # Vectors and scalars have a single channel
+            if stype == INT8_CHANNEL_STYPE and ndarray.ndim < 2:
+                stype = INT8_STYPE
+    data = ndarray.tobytes() if stype == NUMPY_STYPE else _encode(ndarray, stype)
     return Array(
-        data=ndarray.tobytes(),
+        data=data,
         dtype=str(ndarray.dtype),
-        stype="numpy.ndarray.tobytes",
+        stype=stype,
         shape=list(ndarray.shape),
     )
 
 
+def ndarray_to_sparse_array(ndarray: NDArray, fraction: float) -> Array:
+    """
+    Represent the `fraction` largest magnitude entries of a NumPy ndarray as Array.
+
+    The data holds the flat indices of the kept entries as uint32, followed by their
+    values, every other entry is 0.
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Fraction must be in (0, 1], got {fraction}")
+    flat = ndarray.reshape(-1)
+    k = min(flat.size, max(1, math.ceil(fraction * flat.size)))
+    top = np.argpartition(np.abs(flat), flat.size - k)[flat.size - k :]
+    indices = np.sort(top).astype(np.uint32)
+    return Array(
+        data=indices.tobytes() + flat[indices].tobytes(),
+        dtype=str(ndarray.dtype),
+        stype=SPARSE_STYPE,
+        shape=list(ndarray.shape),
+    )
+
+
+def sparse_array_components(array: Array) -> tuple[NDArray, NDArray]:
+    """Return the flat indices and the values of a sparse Array."""
+    n_entries = len(array.data) // (4 + np.dtype(array.dtype).itemsize)
+    indices = np.frombuffer(array.data, dtype=np.uint32, count=n_entries)
+    values = np.frombuffer(array.data, dtype=array.dtype, offset=4 * n_entries)
+    return indices, values
+
+
+def encode_ndarray(
+    ndarray: NDArray, codec: str | None = None, topk: float | None = None
+) -> Array:
+    """Represent NumPy ndarray as Array, keeping only its top-k entries if given."""
+    if (
+        topk is not None
+        and np.issubdtype(ndarray.dtype, np.floating)
+        and ndarray.size > 0
+    ):
+        return ndarray_to_sparse_array(ndarray, topk)
+    return ndarray_to_array(ndarray, codec)
+
+
 def array_to_ndarray(array: Array) -> NDArray:
-    """Represent Array as NumPy ndarray."""
+    """Represent Array as NumPy ndarray, decoding it according to its stype."""
+    array = decompress_array(array)
+    if array.stype != NUMPY_STYPE:
+        return _decode(array)
     return np.frombuffer(buffer=array.data, dtype=array.dtype).reshape(array.shape)
+
+
+def encode_parameters(
+    parameters: ParametersRecord, codec: str | None, topk: float | None = None
+) -> ParametersRecord:
+    """Encode every array of a ParametersRecord with the given codec or top-k."""
+    if codec is None and topk is None:
+        return parameters
+    return ParametersRecord(
+        OrderedDict(
+            (k, encode_ndarray(array_to_ndarray(v), codec, topk))
+            for k, v in parameters.items()
+        )
+    )
+
+
+def decode_parameters(
+    parameters: ParametersRecord, keep_sparse: bool = False, keep_packed: bool = False
+) -> ParametersRecord:
+    """
+    Decode the arrays of a ParametersRecord back to full precision.
+
+    Sparse arrays are left as they are with `keep_sparse`, for aggregators that
+    accumulate them without densifying them first. Packed records are unpacked
+    unless `keep_packed` is given, for aggregators that average them as a whole.
+    """
+    kept: tuple[str, ...] = (NUMPY_STYPE,)
+    if keep_sparse:
+        kept += (SPARSE_STYPE,)
+    if keep_packed:
+        kept += (PACKED_STYPE,)
+    if all(v.stype in kept for v in parameters.values()):
+        return parameters
+    arrays = ParametersRecord(
+        OrderedDict((k, decompress_array(v)) for k, v in parameters.items())
+    )
+    if not keep_packed and is_packed(arrays):
+        return unpack_parameters(arrays)
+    return ParametersRecord(
+        OrderedDict(
+            (k, v if v.stype in kept else ndarray_to_array(array_to_ndarray(v)))
+            for k, v in arrays.items()
+        )
+    )
+
+
+def compress_array(array: Array, compressor: str) -> Array:
+    """
+    Losslessly compress the data of an Array, whatever its stype.
+
+    The data is split in chunks of `COMPRESSION_CHUNK_SIZE` bytes compressed in
+    parallel. Elements of raw arrays are byte shuffled first. Arrays that do not get
+    smaller are returned as they are.
+    """
+    if compressor not in COMPRESSORS:
+        raise ValueError(f"Unknown or unavailable compressor: {compressor}")
+    if array.stype.startswith(COMPRESSED_STYPE):
+        return array
+    itemsize = np.dtype(array.dtype).itemsize
+    shuffle = array.stype == NUMPY_STYPE and itemsize > 1
+    # Chunks hold whole elements so that they can be shuffled on their own
+    chunk_size = COMPRESSION_CHUNK_SIZE - COMPRESSION_CHUNK_SIZE % itemsize
+    chunks = [
+        array.data[i : i + chunk_size] for i in range(0, len(array.data), chunk_size)
+    ]
+    compress = COMPRESSORS[compressor][0]
+    if shuffle:
+        compressed = _map_chunks(lambda c: compress(_shuffle(c, itemsize)), chunks)
+    else:
+        compressed = _map_chunks(compress, chunks)
+    header = np.array([len(c) for c in compressed], dtype=np.uint32)
+    data = (
+        np.uint32(len(compressed)).tobytes() + header.tobytes() + b"".join(compressed)
+    )
+    if len(data) >= len(array.data):
+        return array
+    filter = "shuffle" if shuffle else "none"
+    return Array(
+        data=data,
+        dtype=array.dtype,
+        stype=f"{COMPRESSED_STYPE}:{compressor}:{filter}:{array.stype}",
+        shape=array.shape,
+    )
+
+
+def decompress_array(array: Array) -> Array:
+    """Undo `compress_array`, returning the Array it was given."""
+    if not array.stype.startswith(COMPRESSED_STYPE):
+        return array
+    _, compressor, filter, stype = array.stype.split(":", 3)
+    if compressor not in COMPRESSORS:
+        raise ValueError(f"Compressor {compressor} is not available to decode Array")
+    n_chunks = int(np.frombuffer(array.data, dtype=np.uint32, count=1)[0])
+    sizes = np.frombuffer(array.data, dtype=np.uint32, count=n_chunks, offset=4)
+    offsets = [4 * (n_chunks + 1)]
+    for size in sizes:
+        offsets.append(offsets[-1] + int(size))
+    chunks = [array.data[offsets[i] : offsets[i + 1]] for i in range(n_chunks)]
+    decompress = COMPRESSORS[compressor][1]
+    if filter == "shuffle":
+        itemsize = np.dtype(array.dtype).itemsize
+        decompressed = _map_chunks(
+            lambda c: _unshuffle(decompress(c), itemsize), chunks
+        )
+    else:
+        decompressed = _map_chunks(decompress, chunks)
+    return Array(
+        data=b"".join(decompressed),
+        dtype=array.dtype,
+        stype=stype,
+        shape=array.shape,
+    )
+
+
+def compress_parameters(
+    parameters: ParametersRecord, compressor: str | None
+) -> ParametersRecord:
+    """Losslessly compress every array of a ParametersRecord."""
+    if compressor is None:
+        return parameters
+    return ParametersRecord(
+        OrderedDict((k, compress_array(v, compressor)) for k, v in parameters.items())
+    )
+
+
+def is_packed(parameters: ParametersRecord) -> bool:
+    """Whether a ParametersRecord was packed by `pack_parameters`."""
+    return (
+        len(parameters) == 1
+        and PACKED_KEY in parameters
+        and parameters[PACKED_KEY].stype == PACKED_STYPE
+    )
+
+
+def _packed_header(array: Array) -> tuple[dict, int]:
+    # The index of the arrays, and where their data starts
+    size = int(np.frombuffer(array.data, dtype=np.uint32, count=1)[0])
+    index = json.loads(array.data[4 : 4 + size])
+    start = 4 + size
+    return index, start + -start % PACKED_ALIGNMENT
+
+
+def pack_ndarrays(ndarrays: Mapping[str, NDArray]) -> Array:
+    """
+    Pack NumPy ndarrays into a single Array.
+
+    The data starts with a uint32 length and a JSON index holding the name, dtype,
+    shape and offset of every array, and the offset and size of every dtype. The
+    arrays follow, grouped by dtype, each group aligned to `PACKED_ALIGNMENT` bytes,
+    so that a whole group can be processed as a single vector.
+    """
+    groups: dict[np.dtype, list[NDArray]] = {}
+    for v in ndarrays.values():
+        groups.setdefault(v.dtype, []).append(v)
+    segments: list[tuple[str, int, int]] = []
+    cursors: dict[np.dtype, int] = {}
+    position = 0
+    for dtype, group in groups.items():
+        position += -position % PACKED_ALIGNMENT
+        size = sum(v.nbytes for v in group)
+        segments.append((str(dtype), position, size))
+        cursors[dtype] = position
+        position += size
+
+    # Arrays keep their order in the index, at the next free offset of their group
+    names = {dtype: str(dtype) for dtype in groups}
+    arrays = []
+    for k, v in ndarrays.items():
+        arrays.append([k, names[v.dtype], list(v.shape), cursors[v.dtype]])
+        cursors[v.dtype] += v.nbytes
+    header = json.dumps({"arrays": arrays, "segments": segments}).encode()
+    start = 4 + len(header)
+    parts: list[bytes | memoryview] = [
+        np.uint32(len(header)).tobytes(),
+        header,
+        bytes(-start % PACKED_ALIGNMENT),
+    ]
+    position = 0
+    for group, (_, offset, size) in zip(groups.values(), segments):
+        parts.append(bytes(offset - position))
+        parts.extend(np.ascontiguousarray(v).data for v in group)
+        position = offset + size
+    data = b"".join(parts)
+    return Array(data=data, dtype="uint8", stype=PACKED_STYPE, shape=[len(data)])
+
+
+def unpack_ndarrays(array: Array) -> OrderedDict[str, NDArray]:
+    """Undo `pack_ndarrays`, returning read-only views on the data of the Array."""
+    if array.stype != PACKED_STYPE:
+        raise ValueError(f"Array is not packed: {array.stype}")
+    index, start = _packed_header(array)
+    ndarrays = OrderedDict()
+    for k, dtype, shape, offset in index["arrays"]:
+        ndarrays[k] = np.frombuffer(
+            array.data, dtype=dtype, count=math.prod(shape), offset=start + offset
+        ).reshape(shape)
+    return ndarrays
+
+
+def packed_segments(array: Array) -> OrderedDict[str, NDArray]:
+    """
+    Return read-only views on the dtype groups of a packed Array, by their offset.
+
+    Every group is a single flat vector, for the arrays of a model to be processed at
+    once, and `replace_segments` writes the groups back with the same layout.
+    """
+    if array.stype != PACKED_STYPE:
+        raise ValueError(f"Array is not packed: {array.stype}")
+    index, start = _packed_header(array)
+    segments = OrderedDict()
+    for dtype, offset, nbytes in index["segments"]:
+        segments[str(offset)] = np.frombuffer(
+            array.data, dtype, nbytes // np.dtype(dtype).itemsize, start + offset
+        )
+    return segments
+
+
+def same_layout(array: Array, other: Array) -> bool:
+    """Whether two packed Arrays hold arrays of the same names, dtypes and shapes."""
+    # Compares the length and JSON index the data starts with, without parsing it
+    size = 4 + int(np.frombuffer(array.data, dtype=np.uint32, count=1)[0])
+    return len(array.data) == len(other.data) and (
+        array.data[:size] == other.data[:size]
+    )
+
+
+def replace_segments(array: Array, segments: Mapping[str, NDArray]) -> Array:
+    """Return a packed Array with the layout of `array`, holding the given groups."""
+    _, start = _packed_header(array)
+    data = bytearray(len(array.data))
+    data[:start] = array.data[:start]
+    for offset, values in packed_segments(array).items():
+        target = np.frombuffer(data, values.dtype, values.size, start + int(offset))
+        np.copyto(target, segments[offset], casting="unsafe")
+    return Array(data=bytes(data), dtype="uint8", stype=PACKED_STYPE, shape=[len(data)])
+
+
+def pack_parameters(parameters: ParametersRecord) -> ParametersRecord:
+    """Pack the raw arrays of a ParametersRecord into a single Array."""
+    if is_packed(parameters):
+        return parameters
+    encoded = [k for k, v in parameters.items() if v.stype != NUMPY_STYPE]
+    if encoded:
+        raise ValueError(f"Only raw arrays can be packed, got encoded {encoded}")
+    array = pack_ndarrays(
+        OrderedDict((k, array_to_ndarray(v)) for k, v in parameters.items())
+    )
+    return ParametersRecord(OrderedDict({PACKED_KEY: array}))
+
+
+def unpack_parameters(parameters: ParametersRecord) -> ParametersRecord:
+    """Undo `pack_parameters`, with one Array per array again."""
+    if not is_packed(parameters):
+        return parameters
+    return ParametersRecord(
+        OrderedDict(
+            (k, ndarray_to_array(v))
+            for k, v in unpack_ndarrays(parameters[PACKED_KEY]).items()
+        )
+    )
+
+
+def flat_arrays(
+    parameters: ParametersRecord,
+) -> OrderedDict[str, tuple[tuple[int, ...], np.dtype, FlatValues]]:
+    """
+    Decode a ParametersRecord into flat arrays, for the aggregators.
+
+    Raw arrays, the arrays of a packed record and the entries of sparse arrays are
+    views on the received data, other encodings are decoded.
+
+    Args:
+        parameters (ParametersRecord): The parameters to decode.
+
+    Returns:
+        OrderedDict[str, tuple[tuple[int, ...], np.dtype, FlatValues]]: The shape
+            and dtype of each array, with its flat values, or the flat indices and
+            values of a sparse array.
+    """
+    flat: OrderedDict[str, tuple[tuple[int, ...], np.dtype, FlatValues]] = OrderedDict()
+    if is_packed(parameters):
+        for k, v in unpack_ndarrays(parameters[PACKED_KEY]).items():
+            flat[k] = (v.shape, v.dtype, v.reshape(-1))
+        return flat
+    for k, array in parameters.items():
+        shape, dtype = tuple(array.shape), np.dtype(array.dtype)
+        if array.stype == SPARSE_STYPE:
+            flat[k] = (shape, dtype, sparse_array_components(array))
+        else:
+            flat[k] = (shape, dtype, array_to_ndarray(array).reshape(-1))
+    return flat
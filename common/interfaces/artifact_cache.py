@@ -0,0 +1,106 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+def _size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class ArtifactCache:
+    """
+    Directory of downloaded artifacts shared by the processes of a host, each entry
+    keyed by the source URI and checksum of the artifacts.
+
+    An entry is downloaded once, by the process holding its lock exclusively, into a
+    temporary directory renamed into place. Readers hold the lock shared while they
+    use the entry, and the least recently used entries not in use are evicted once
+    the cache passes its size cap.
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        for name in ["entries", "locks", "tmp"]:
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        return (
+            os.path.join(self.root, "entries", key),
+            os.path.join(self.root, "locks", f"{key}.lock"),
+        )
+
+    @contextmanager
+    def open(
+        self, source: str, checksum: str, download: Callable[[str], str]
+    ) -> Iterator[str]:
+        """
+        Gets the local copy of artifacts, downloading them if no process did.
+
+        Args:
+            source (str): The URI the artifacts are downloaded from.
+            checksum (str): The checksum of the artifacts at the source.
+            download (Callable[[str], str]): Downloads the artifacts into the given
+                directory, returning their path in it.
+
+        Yields:
+            str: The path of the artifacts, kept in the cache until the block ends.
+        """
+        key = hashlib.sha256(f"{source}\n{checksum}".encode()).hexdigest()
+        entry, lock = self._paths(key)
+        with open(lock, "a") as file:
+            fcntl.flock(file, fcntl.LOCK_SH)
+            if not os.path.isdir(entry):
+                # Only one process downloads, the others finding the entry in place
+                fcntl.flock(file, fcntl.LOCK_EX)
+                if not os.path.isdir(entry):
+                    self._download(entry, download)
+                fcntl.flock(file, fcntl.LOCK_SH)
+                self.evict()
+            # The modification time orders the entries for eviction
+            os.utime(entry)
+            yield entry
+
+    def _download(self, entry: str, download: Callable[[str], str]) -> None:
+        directory = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        os.makedirs(directory)
+        try:
+            os.rename(download(directory), entry)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries not in use until the cache fits its
+        size cap.
+        """
+        with open(os.path.join(self.root, "evict.lock"), "a") as evicting:
+            fcntl.flock(evicting, fcntl.LOCK_EX)
+            entries = []
+            for key in os.listdir(os.path.join(self.root, "entries")):
+                entry, _ = self._paths(key)
+                entries.append((os.path.getmtime(entry), key, _size(entry)))
+            total = sum(size for _, _, size in entries)
+            for _, key, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                entry, lock = self._paths(key)
+                with open(lock, "a") as file:
+                    try:
+                        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # In use, or being downloaded
+                        continue
+                    # Out of the entries at once, then deleted
+                    removed = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+                    os.rename(entry, removed)
+                shutil.rmtree(removed, ignore_errors=True)
+                total -= size
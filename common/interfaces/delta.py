@@ -0,0 +1,84 @@
+from collections import OrderedDict
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+
+
+def subtract_parameters(
+    target: ParametersRecord, base: ParametersRecord
+) -> ParametersRecord:
+    """
+    Compute the difference between two ParametersRecords holding the same arrays.
+
+    Arrays that are identical in both records are left out of the result.
+
+    Args:
+        target (ParametersRecord): The parameters to encode.
+        base (ParametersRecord): The parameters the difference is taken against.
+
+    Returns:
+        ParametersRecord: The changed arrays, as `target - base`.
+    """
+    if set(target.keys()) != set(base.keys()):
+        raise ValueError("Cannot subtract ParametersRecords with different keys")
+
+    delta = OrderedDict()
+    for k, v in target.items():
+        diff = array_to_ndarray(v) - array_to_ndarray(base[k])
+        if diff.any():
+            delta[k] = ndarray_to_array(diff)
+
+    return ParametersRecord(delta)
+
+
+def add_parameters(base: ParametersRecord, delta: ParametersRecord) -> ParametersRecord:
+    """
+    Apply a difference computed by `subtract_parameters` to its base.
+
+    Args:
+        base (ParametersRecord): The parameters the difference was taken against.
+        delta (ParametersRecord): The difference, possibly missing unchanged arrays.
+
+    Returns:
+        ParametersRecord: The reconstructed parameters, in the order of `base`.
+    """
+    unknown = set(delta.keys()) - set(base.keys())
+    if unknown:
+        raise ValueError(f"Delta contains unknown arrays: {sorted(unknown)}")
+
+    parameters = OrderedDict()
+    for k, v in base.items():
+        if k in delta:
+            parameters[k] = ndarray_to_array(
+                array_to_ndarray(v) + array_to_ndarray(delta[k])
+            )
+        else:
+            parameters[k] = v
+
+    return ParametersRecord(parameters)
+
+
+def scale_parameters(delta: ParametersRecord, factor: float) -> ParametersRecord:
+    """
+    Scale a difference computed by `subtract_parameters`.
+
+    Integer arrays are rounded back to their dtype.
+
+    Args:
+        delta (ParametersRecord): The difference to scale.
+        factor (float): The factor applied to every array.
+
+    Returns:
+        ParametersRecord: The scaled difference, as `factor * delta`.
+    """
+    scaled = OrderedDict()
+    for k, v in delta.items():
+        array = array_to_ndarray(v)
+        result = factor * array
+        if not np.issubdtype(array.dtype, np.inexact):
+            result = np.rint(result)
+        scaled[k] = ndarray_to_array(result.astype(array.dtype))
+
+    return ParametersRecord(scaled)
@@ -1,4 +1,9 @@
-from typing import Any, Optional, Self, cast
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, cast
 
 import mlflow
 from mlflow import MlflowClient
@@ -9,14 +14,19 @@ from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
 from mlflow.data.meta_dataset import MetaDataset
 from mlflow.data.http_dataset_source import HTTPDatasetSource
 
+from .artifact_cache import ArtifactCache
 from .utils import ensure_bool, MutableBoolean
 
 mlflow.set_system_metrics_sampling_interval(0.5)
 
 
-class __Config:
+class MlflowContext:
     """
-    A configuration class for managing experiment settings and model metadata.
+    The MLflow runs and model metadata of one task.
+
+    Each task is given its own context, bound to the thread running it with
+    `use_context`, so that several tasks can run at once in one process. The module
+    functions act on the context bound to the calling thread.
 
     Attributes:
         experiment_id (Optional[str]): The ID of the experiment.
@@ -28,55 +38,105 @@ class __Config:
         model_python (Any): Python-specific metadata related to the model.
         model_description (Optional[str]): A description of the model.
         is_central_node (Optional[bool]): Whether this is a central node in the configuration.
+        configured (bool): Whether the context was set by `set_current_config`.
     """
 
-    experiment_id: Optional[str] = None
-    parent_run_id: Optional[str] = None
-    child_run_id: Optional[str] = None
-    model_name: Optional[str] = None
-    model_version: Optional[int] = None
-    model_tags: dict = dict()
-    model_python: Any = None
-    model_description: Optional[str] = None
-    is_central_node: Optional[bool] = None
+    def __init__(self) -> None:
+        self.clean()
 
-    def __new__(cls) -> Self:
+    def clean(self) -> None:
         """
-        Prevent instantiation of the Config class.
-
-        Raises:
-            RuntimeError: Always raises an exception to prevent instantiation.
+        Resets all attributes, the central node flag to the one of `setup_mlflow`.
         """
-        raise RuntimeError("Cannot instantiate Config class")
+        self.experiment_id: Optional[str] = None
+        self.parent_run_id: Optional[str] = None
+        self.child_run_id: Optional[str] = None
+        self.model_name: Optional[str] = None
+        self.model_version: Optional[int] = None
+        self.model_tags: dict = dict()
+        self.model_python: Any = None
+        self.model_description: Optional[str] = None
+        self.is_central_node: Optional[bool] = _is_central_node
+        self.configured = False
+
+
+class _ContextBoolean(MutableBoolean):
+    """
+    The configured flag of the context bound to the calling thread.
+    """
 
-    @classmethod
-    def clean(cls) -> None:
-        """
-        Resets all class attributes to None, except for special methods and properties.
+    def __init__(self) -> None:
+        pass
 
-        This method is intended to clear the configuration state.
-        """
-        for attr in cls.__dict__:
-            if not attr.startswith("__"):
-                setattr(cls, attr, None)
+    @property
+    def value(self) -> bool:
+        return current_context().configured
+
+    @value.setter
+    def value(self, value: bool) -> None:
+        if not isinstance(value, bool):
+            raise TypeError("value must be a boolean")
+        current_context().configured = value
 
 
+_is_central_node: Optional[bool] = None
+_local = threading.local()
 _initialized = MutableBoolean(False)
-_configured = MutableBoolean(False)
-_current_config = __Config
+_configured = _ContextBoolean()
 _mlflow_client = cast(MlflowClient, None)
+_artifact_cache: Optional[ArtifactCache] = None
+
+
+def current_context() -> MlflowContext:
+    """
+    Returns the context bound to the calling thread, binding a new one if none is.
 
+    Returns:
+        MlflowContext: The context of the calling thread.
+    """
+    context = getattr(_local, "context", None)
+    if context is None:
+        context = MlflowContext()
+        _local.context = context
+    return context
+
+
+@contextmanager
+def use_context(context: MlflowContext) -> Iterator[MlflowContext]:
+    """
+    Binds a context to the calling thread for the duration of the block.
 
-def setup_mlflow(tracking_url: str, is_central_node: bool = False) -> None:
+    Args:
+        context (MlflowContext): The context of the task run in the block.
+
+    Yields:
+        MlflowContext: The context bound.
+    """
+    previous = getattr(_local, "context", None)
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = previous
+
+
+def setup_mlflow(
+    tracking_url: str,
+    is_central_node: bool = False,
+    artifact_cache: Optional[ArtifactCache] = None,
+) -> None:
     """
     Sets up the MLflow tracking URI and initializes the MlflowClient.
 
     Args:
         tracking_url (str): The URL of the MLflow tracking server.
         is_central_node (bool, optional): Indicates if this is a central node in a multi-run experiment.
+        artifact_cache (Optional[ArtifactCache], optional): The cache the models are loaded through, downloaded for every load if None.
     """
-    global _mlflow_client, _initialized, _current_config
-    _current_config.is_central_node = is_central_node
+    global _mlflow_client, _is_central_node, _artifact_cache
+    _is_central_node = is_central_node
+    _artifact_cache = artifact_cache
+    current_context().is_central_node = is_central_node
     mlflow.set_tracking_uri(tracking_url)
     _mlflow_client = MlflowClient(tracking_url)
     _initialized.value = True
@@ -144,34 +204,37 @@ def set_current_config(
         model_name (str): The name of the model.
         model_version (int): The version of the model.
     """
-    global _current_config, _mlflow_client
     model_mlflow_meta = _mlflow_client.get_model_version(
         name=model_name, version=model_version
     )
-    _current_config.experiment_id = experiment_id
-    _current_config.parent_run_id = parent_run_id
-    _current_config.child_run_id = child_run_id
-    _current_config.model_name = model_name
-    _current_config.model_version = model_version
-    _current_config.model_tags = model_mlflow_meta.tags
-    _current_config.model_description = model_mlflow_meta.description
-    _configured.value = True
+    context = current_context()
+    context.experiment_id = experiment_id
+    context.parent_run_id = parent_run_id
+    context.child_run_id = child_run_id
+    context.model_name = model_name
+    context.model_version = model_version
+    context.model_tags = model_mlflow_meta.tags
+    context.model_description = model_mlflow_meta.description
+    context.configured = True
 
 
 @ensure_bool(_configured)
-def clean_current_config() -> None:
+def clean_current_config(status: str = "FINISHED") -> None:
     """
     Cleans up the current configuration by finishing the associated MLflow runs.
 
     If the node is a central node, it updates the parent run and finishes the child run.
+
+    Args:
+        status (str, optional): The status the runs end with, such as "KILLED" for a
+            cancelled task.
     """
-    global _current_config, _configured
-    # _current_config.clean()
-    if _current_config.is_central_node:
-        _mlflow_client.update_run(_current_config.parent_run_id, "FINISHED")
-    mlflow.end_run()
-    _mlflow_client.update_run(_current_config.child_run_id, "FINISHED")
-    _configured.value = False
+    context = current_context()
+    if context.is_central_node:
+        _mlflow_client.update_run(context.parent_run_id, status)
+    mlflow.end_run(status)
+    _mlflow_client.update_run(context.child_run_id, status)
+    context.configured = False
 
 
 @ensure_bool(_configured)
@@ -183,9 +246,31 @@ def load_model() -> PyFuncModel:
     Returns:
         PyFuncModel: The loaded model.
     """
-    return _load_model(
-        f"models:/{_current_config.model_name}/{_current_config.model_version}"
+    context = current_context()
+    if _artifact_cache is None:
+        return _load_model(f"models:/{context.model_name}/{context.model_version}")
+    source = _mlflow_client.get_model_version_download_uri(
+        str(context.model_name), str(context.model_version)
     )
+    with _artifact_cache.open(
+        source,
+        _model_checksum(source),
+        lambda directory: mlflow.artifacts.download_artifacts(
+            artifact_uri=source, dst_path=directory
+        ),
+    ) as path:
+        model: PyFuncModel = _load_model(path)
+    return model
+
+
+def _model_checksum(source: str) -> str:
+    # The MLmodel file holds the UUID of the model, unique to the artifacts logged
+    with tempfile.TemporaryDirectory() as directory:
+        path = mlflow.artifacts.download_artifacts(
+            artifact_uri=f"{source.rstrip('/')}/MLmodel", dst_path=directory
+        )
+        with open(path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
 
 
 @ensure_bool(_configured)
@@ -202,11 +287,12 @@ def upload_final_state(
     Returns:
         dict: A dictionary containing information about the registered model.
     """
-    name = f"trained_{_current_config.model_name}"
+    context = current_context()
+    name = f"trained_{context.model_name}"
     if mlflow.active_run():
         mlflow.end_run()
     with mlflow.start_run(
-        run_id=_current_config.parent_run_id,
+        run_id=context.parent_run_id,
     ):
         model_info: ModelInfo = _log_model(
             pytorch_model=local_learner,
@@ -215,14 +301,12 @@ def upload_final_state(
         )
 
     version = model_info.registered_model_version
-    _mlflow_client.update_model_version(
-        name, version, _current_config.model_description
-    )
+    _mlflow_client.update_model_version(name, version, context.model_description)
     _mlflow_client.set_model_version_tag(
         name,
         model_info.registered_model_version,
         "use_case",
-        _current_config.model_tags["use_case"],
+        context.model_tags["use_case"],
     )
     _mlflow_client.set_model_version_tag(
         name, model_info.registered_model_version, "trained", True
@@ -252,6 +336,120 @@ def log_metrics(
     mlflow.log_metrics(metrics, step=step)
 
 
+@ensure_bool(_configured)
+@ensure_bool(_initialized)
+def log_dict(dictionary: dict, artifact_file: str) -> None:
+    """
+    Logs a dictionary as a JSON or YAML artifact of the current child run.
+
+    Args:
+        dictionary (dict): The dictionary to log.
+        artifact_file (str): The path of the artifact in the run, its extension
+            choosing the format.
+    """
+    mlflow.log_dict(dictionary, artifact_file)
+
+
+@ensure_bool(_initialized)
+def set_run_tag(run_id: str, key: str, value: str) -> None:
+    """
+    Sets a tag on a run, from any thread.
+
+    Args:
+        run_id (str): The ID of the run.
+        key (str): The name of the tag.
+        value (str): The value of the tag.
+    """
+    _mlflow_client.set_tag(run_id, key, value)
+
+
+@ensure_bool(_initialized)
+def set_run_status(run_id: str, status: str) -> None:
+    """
+    Ends a run with the given status, from any thread.
+
+    Args:
+        run_id (str): The ID of the run.
+        status (str): The status the run ends with, such as "KILLED".
+    """
+    _mlflow_client.set_terminated(run_id, status)
+
+
+@ensure_bool(_initialized)
+def find_runs(experiment_name: str, filter_string: str) -> list[str]:
+    """
+    Finds the runs of an experiment matching a filter, the latest first.
+
+    Args:
+        experiment_name (str): The name of the experiment to search.
+        filter_string (str): The MLflow search filter, such as "tags.key = 'value'".
+
+    Returns:
+        list[str]: The IDs of the runs found.
+    """
+    experiment = _mlflow_client.get_experiment_by_name(experiment_name)
+    if experiment is None:
+        return []
+    runs = _mlflow_client.search_runs(
+        [experiment.experiment_id],
+        filter_string=filter_string,
+        order_by=["attributes.start_time DESC"],
+    )
+    return [run.info.run_id for run in runs]
+
+
+@ensure_bool(_initialized)
+def log_artifact_bytes(run_id: str, data: bytes, artifact_file: str) -> None:
+    """
+    Logs bytes as an artifact of a run, from any thread.
+
+    Args:
+        run_id (str): The ID of the run.
+        data (bytes): The content of the artifact.
+        artifact_file (str): The path of the artifact in the run.
+    """
+    artifact_path, name = os.path.split(artifact_file)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        _mlflow_client.log_artifact(run_id, path, artifact_path or None)
+
+
+@ensure_bool(_initialized)
+def list_artifacts(run_id: str, path: str) -> list[str]:
+    """
+    Lists the files logged under a directory of the artifacts of a run.
+
+    Args:
+        run_id (str): The ID of the run.
+        path (str): The directory in the artifacts of the run.
+
+    Returns:
+        list[str]: The paths of the files, sorted.
+    """
+    artifacts = _mlflow_client.list_artifacts(run_id, path)
+    return sorted(a.path for a in artifacts if not a.is_dir)
+
+
+@ensure_bool(_initialized)
+def load_artifact_bytes(run_id: str, artifact_file: str) -> bytes:
+    """
+    Downloads an artifact of a run.
+
+    Args:
+        run_id (str): The ID of the run.
+        artifact_file (str): The path of the artifact in the run.
+
+    Returns:
+        bytes: The content of the artifact.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = _mlflow_client.download_artifacts(run_id, artifact_file, directory)
+        with open(path, "rb") as file:
+            return file.read()
+
+
 @ensure_bool(_configured)
 @ensure_bool(_initialized)
 def set_dataset_signature(node_name: str, path: str, run_id: str) -> None:
@@ -1,17 +1,21 @@
+import warnings
 from collections import OrderedDict
 
 import torch
 from flwr.common import ParametersRecord
 
-from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+from interfaces.array_serde import array_to_ndarray, compress_array, ndarray_to_array
 
 
-def pytorch_to_parameter_record(pytorch_module: torch.nn.Module) -> ParametersRecord:
+def pytorch_to_parameter_record(
+    pytorch_module: torch.nn.Module, compression: str | None = None
+) -> ParametersRecord:
     """
     Serialize a PyTorch model's state_dict into a ParametersRecord.
 
     Args:
         pytorch_module (torch.nn.Module): The PyTorch model to be serialized.
+        compression (str | None): Lossless compressor applied to every array.
 
     Returns:
         ParametersRecord: A ParametersRecord containing the serialized state_dict of the PyTorch model.
@@ -20,25 +24,40 @@ def pytorch_to_parameter_record(pytorch_module: torch.nn.Module) -> ParametersRe
     transformed_state_dict = OrderedDict()
 
     for k, v in raw_state_dict.items():
-        transformed_state_dict[k] = ndarray_to_array(v.numpy())
+        array = ndarray_to_array(v.numpy())
+        if compression is not None:
+            array = compress_array(array, compression)
+        transformed_state_dict[k] = array
 
     return ParametersRecord(transformed_state_dict)
 
 
 def parameters_to_pytorch_state_dict(
-    params_record: ParametersRecord,
+    params_record: ParametersRecord, copy: bool = True
 ) -> dict[str, torch.Tensor]:
     """
     Reconstruct a PyTorch model's state_dict from a ParametersRecord.
 
+    Without `copy`, the tensors are views on the memory of the record's arrays, which
+    must not be written to. That is enough for `load_state_dict`, which copies them
+    into the model, and saves a full copy of the parameters.
+
     Args:
         params_record (ParametersRecord): The ParametersRecord containing the serialized state_dict.
+        copy (bool): Whether the tensors own a copy of their data.
 
     Returns:
         dict[str, torch.Tensor]: A dictionary mapping each parameter name to its corresponding PyTorch tensor.
     """
     state_dict = {}
     for k, v in params_record.items():
-        state_dict[k] = torch.tensor(array_to_ndarray(v))
+        ndarray = array_to_ndarray(v)
+        if copy:
+            state_dict[k] = torch.tensor(ndarray)
+        else:
+            with warnings.catch_warnings():
+                # The tensor is read-only like the bytes it is built on
+                warnings.simplefilter("ignore", UserWarning)
+                state_dict[k] = torch.from_numpy(ndarray)
 
     return state_dict
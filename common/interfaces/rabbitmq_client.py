@@ -60,6 +60,23 @@ class RabbitMQClient:
                 binding.queue, binding.exchange, binding.routing_key
             )
 
+    @property
+    def is_open(self) -> bool:
+        return bool(self._channel.is_open)
+
+    def probe(self) -> None:
+        # Handles what the connection received while idle, raising if the broker
+        # closed it, as after missed heartbeats
+        self._channel.connection.process_data_events(time_limit=0)
+
+    def for_topic(self, topic: str, declare: bool) -> "RabbitMQClient":
+        # Client of another queue over the same channel
+        binding = RabbitBinding(self._binding.exchange, topic, topic)
+        return RabbitMQClient(self._channel, binding, declare=declare)
+
+    def delete(self) -> None:
+        self._channel.queue_delete(queue=self._binding.queue)
+
     def publish_message(self, message: str) -> None:
         self._channel.basic_publish(
             exchange=self._binding.exchange,
@@ -93,6 +110,11 @@ class RabbitMQClient:
             return decoded_body
 
 
+def control_topic(task_id: int | None) -> str:
+    # Queue of the messages controlling a running task, such as its cancellation
+    return f"control.{task_id}"
+
+
 def setup_rabbitmq(
     user: str,
     password: str,
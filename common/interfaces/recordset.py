@@ -1,5 +1,7 @@
 from flwr.common import ConfigsRecord, ParametersRecord, RecordSet
 
+PIPELINE_STEP_PREFIX = "step"
+
 
 def create_filter_clients_recordset(use_case: str) -> RecordSet:
     configsrecord = ConfigsRecord({"mode": "filter_clients", "use_case": use_case})
@@ -70,15 +72,33 @@ def read_upload_model_recordset(recordset: RecordSet) -> ParametersRecord:
     return recordset.parameters_records["parameters"]
 
 
-def create_get_parameters_recordset() -> RecordSet:
+def create_get_parameters_recordset(compression: str | None = None) -> RecordSet:
     configsrecord = ConfigsRecord(
         {
             "mode": "get_parameters",
         }
     )
+    # Lossless compressor the node applies to the parameters it replies with
+    if compression is not None:
+        configsrecord["compression"] = compression
     return RecordSet(configs_records={"config": configsrecord})
 
 
+def read_compression(recordset: RecordSet) -> str | None:
+    config = recordset.configs_records["config"]
+    compression = config["compression"] if "compression" in config else None
+    if compression is not None and not isinstance(compression, str):
+        raise TypeError(f"compression must be a string, received {type(compression)}")
+    return compression
+
+
+def read_packed(recordset: RecordSet) -> bool:
+    packed = recordset.configs_records["config"].get("packed", False)
+    if not isinstance(packed, bool):
+        raise TypeError(f"packed must be a boolean, received {type(packed)}")
+    return packed
+
+
 def create_set_parameters_recordset(parametersrecord: ParametersRecord) -> RecordSet:
     configrecord = ConfigsRecord(
         {
@@ -135,13 +155,41 @@ def read_set_run_cfg_recordset(recordset: RecordSet) -> dict:
 
 
 def create_train_model_recordset(
-    parametersrecord: ParametersRecord, current_global_iter: int
+    parametersrecord: ParametersRecord,
+    current_global_iter: int,
+    global_version: int = 0,
+    base_version: int | None = None,
+    delta_reply: bool = False,
+    codec: str | None = None,
+    error_feedback: bool = False,
+    topk: float | None = None,
+    compression: str | None = None,
+    packed: bool = False,
 ) -> RecordSet:
+    # With a base_version, the parameters are a delta against that global version
+    configsrecord = ConfigsRecord(
+        {
+            "current_global_iter": current_global_iter,
+            "global_version": global_version,
+            "delta_reply": delta_reply,
+            "error_feedback": error_feedback,
+            # Whether the node packs the parameters it replies with
+            "packed": packed,
+        }
+    )
+    if base_version is not None:
+        configsrecord["base_version"] = base_version
+    # Lossy encoding the node applies to the parameters it replies with
+    if codec is not None:
+        configsrecord["codec"] = codec
+    # Fraction of the largest entries of each array the node replies with
+    if topk is not None:
+        configsrecord["topk"] = topk
+    if compression is not None:
+        configsrecord["compression"] = compression
     return RecordSet(
         parameters_records={"parameters": parametersrecord},
-        configs_records={
-            "config": ConfigsRecord({"current_global_iter": current_global_iter})
-        },
+        configs_records={"config": configsrecord},
     )
 
 
@@ -155,6 +203,42 @@ def read_train_model_recordset(recordset: RecordSet) -> tuple[ParametersRecord,
     return parameters, current_global_iter
 
 
+def read_train_model_transport(recordset: RecordSet) -> tuple[int, int | None, bool]:
+    config = recordset.configs_records["config"]
+    global_version = config.get("global_version", 0)
+    base_version = config["base_version"] if "base_version" in config else None
+    delta_reply = config.get("delta_reply", False)
+    if not isinstance(global_version, int):
+        raise TypeError(
+            f"global_version must be an integer, received {type(global_version)}"
+        )
+    if base_version is not None and not isinstance(base_version, int):
+        raise TypeError(
+            f"base_version must be an integer, received {type(base_version)}"
+        )
+    if not isinstance(delta_reply, bool):
+        raise TypeError(f"delta_reply must be a boolean, received {type(delta_reply)}")
+    return global_version, base_version, delta_reply
+
+
+def read_train_model_codec(
+    recordset: RecordSet,
+) -> tuple[str | None, bool, float | None]:
+    config = recordset.configs_records["config"]
+    codec = config["codec"] if "codec" in config else None
+    error_feedback = config.get("error_feedback", False)
+    topk = config["topk"] if "topk" in config else None
+    if codec is not None and not isinstance(codec, str):
+        raise TypeError(f"codec must be a string, received {type(codec)}")
+    if topk is not None and not isinstance(topk, float):
+        raise TypeError(f"topk must be a float, received {type(topk)}")
+    if not isinstance(error_feedback, bool):
+        raise TypeError(
+            f"error_feedback must be a boolean, received {type(error_feedback)}"
+        )
+    return codec, error_feedback, topk
+
+
 def create_clean_config_recordset() -> RecordSet:
     configsrecord = ConfigsRecord(
         {
@@ -162,3 +246,81 @@ def create_clean_config_recordset() -> RecordSet:
         }
     )
     return RecordSet(configs_records={"config": configsrecord})
+
+
+def _pack_pipeline_steps(steps: list[RecordSet]) -> RecordSet:
+    recordset = RecordSet()
+    for i, step in enumerate(steps):
+        prefix = f"{PIPELINE_STEP_PREFIX}.{i}."
+        for key, configsrecord in step.configs_records.items():
+            recordset.configs_records[prefix + key] = configsrecord
+        for key, parametersrecord in step.parameters_records.items():
+            recordset.parameters_records[prefix + key] = parametersrecord
+        for key, metricsrecord in step.metrics_records.items():
+            recordset.metrics_records[prefix + key] = metricsrecord
+    return recordset
+
+
+def _unpack_pipeline_steps(recordset: RecordSet, n_steps: int) -> list[RecordSet]:
+    steps = [RecordSet() for _ in range(n_steps)]
+    for records, attr in (
+        (recordset.configs_records, "configs_records"),
+        (recordset.parameters_records, "parameters_records"),
+        (recordset.metrics_records, "metrics_records"),
+    ):
+        for key, record in records.items():
+            if not key.startswith(f"{PIPELINE_STEP_PREFIX}."):
+                continue
+            _, index, name = key.split(".", 2)
+            getattr(steps[int(index)], attr)[name] = record
+    return steps
+
+
+def create_pipeline_recordset(steps: list[RecordSet]) -> RecordSet:
+    modes = []
+    for step in steps:
+        mode = step.configs_records["config"]["mode"]
+        if not isinstance(mode, str):
+            raise TypeError(f"mode must be a string, received {type(mode)}")
+        modes.append(mode)
+    recordset = _pack_pipeline_steps(steps)
+    recordset.configs_records["config"] = ConfigsRecord(
+        {"mode": "pipeline", "steps": modes}
+    )
+    return recordset
+
+
+def read_pipeline_recordset(recordset: RecordSet) -> list[RecordSet]:
+    modes = recordset.configs_records["config"]["steps"]
+    if not isinstance(modes, list):
+        raise TypeError(f"steps must be a list, received {type(modes)}")
+    return _unpack_pipeline_steps(recordset, len(modes))
+
+
+def create_pipeline_reply_recordset(
+    modes: list[str], replies: list[RecordSet], step_success: list[bool], message: str
+) -> RecordSet:
+    recordset = _pack_pipeline_steps(replies)
+    recordset.configs_records["config"] = ConfigsRecord(
+        {
+            "success": all(step_success),
+            "message": message,
+            "steps": modes,
+            "step_success": step_success,
+        }
+    )
+    return recordset
+
+
+def read_pipeline_reply_recordset(
+    recordset: RecordSet,
+) -> list[tuple[str, bool, RecordSet]]:
+    modes = recordset.configs_records["config"]["steps"]
+    step_success = recordset.configs_records["config"]["step_success"]
+    if not isinstance(modes, list) or not isinstance(step_success, list):
+        raise TypeError("steps and step_success must be lists")
+    replies = _unpack_pipeline_steps(recordset, len(modes))
+    return [
+        (str(mode), bool(success), reply)
+        for mode, success, reply in zip(modes, step_success, replies)
+    ]
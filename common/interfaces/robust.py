@@ -0,0 +1,144 @@
+import math
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+from flwr.common import MetricsRecord, NDArray, ParametersRecord
+
+from interfaces.array_serde import (
+    FlatValues,
+    flat_arrays,
+    is_packed,
+    ndarray_to_array,
+    pack_parameters,
+)
+
+ROBUST_METHODS = ("median", "trimmed_mean")
+# Coordinates gathered from every node at once
+BLOCK_SIZE = 1 << 12
+
+
+def _fill_column(column: NDArray, values: FlatValues | None, start: int) -> None:
+    # An array missing from an update is an unchanged one
+    if values is None:
+        column[:] = 0
+    elif isinstance(values, tuple):
+        indices, entries = values
+        low, high = np.searchsorted(indices, [start, start + column.size])
+        column[:] = 0
+        column[indices[low:high].astype(np.int64) - start] = entries[low:high]
+    else:
+        column[:] = values[start : start + column.size]
+
+
+def _block_statistic(block: NDArray, method: str, trimmed: int) -> NDArray:
+    # Partitions the values of each coordinate, contiguous in a row of the block,
+    # in place and in linear time
+    n = block.shape[1]
+    statistic: NDArray
+    if method == "median":
+        block.partition([(n - 1) // 2, n // 2], axis=1)
+        statistic = (block[:, (n - 1) // 2].astype(np.float64) + block[:, n // 2]) / 2
+    else:
+        block.partition([trimmed, n - trimmed - 1], axis=1)
+        statistic = block[:, trimmed : n - trimmed].mean(axis=1, dtype=np.float64)
+    return statistic
+
+
+def robust_aggregate_parameters(
+    parameter_list: list[ParametersRecord],
+    method: str = "median",
+    trim_fraction: float = 0.1,
+    block_size: int = BLOCK_SIZE,
+) -> ParametersRecord:
+    """
+    Aggregate ParametersRecords with a coordinate-wise median or trimmed mean.
+
+    The model is processed in blocks of `block_size` coordinates, gathered from
+    every record into a single buffer, so that the memory needed on top of the
+    records and the result is bounded by `len(parameter_list) * block_size` values.
+    Packed and sparse records are read in place.
+
+    Args:
+        parameter_list (list[ParametersRecord]): The parameters of the nodes.
+        method (str): "median" or "trimmed_mean".
+        trim_fraction (float): Fraction of the smallest and of the largest values
+            of each coordinate left out of the trimmed mean, in [0, 0.5).
+        block_size (int): Number of coordinates processed at once.
+
+    Returns:
+        ParametersRecord: The aggregated parameters, packed if every record was.
+    """
+    if method not in ROBUST_METHODS:
+        raise ValueError(f"Unknown robust aggregation: {method}")
+    if not 0 <= trim_fraction < 0.5:
+        raise ValueError(f"Trim fraction must be in [0, 0.5), got {trim_fraction}")
+    if not parameter_list:
+        raise ValueError("No parameters to aggregate")
+
+    n = len(parameter_list)
+    trimmed = int(trim_fraction * n) if method == "trimmed_mean" else 0
+    records = [flat_arrays(p) for p in parameter_list]
+    layout: OrderedDict[str, tuple[tuple[int, ...], np.dtype]] = OrderedDict()
+    for record in records:
+        for k, (shape, dtype, _) in record.items():
+            layout.setdefault(k, (shape, dtype))
+
+    result = OrderedDict()
+    for k, (shape, dtype) in layout.items():
+        size = math.prod(shape)
+        values = [record[k][2] if k in record else None for record in records]
+        out = np.empty(size, dtype)
+        buffer = np.empty(
+            (min(block_size, size), n), dtype=np.result_type(dtype, np.float32)
+        )
+        for start in range(0, size, block_size):
+            block = buffer[: min(block_size, size - start)]
+            for i, v in enumerate(values):
+                _fill_column(block[:, i], v, start)
+            statistic = _block_statistic(block, method, trimmed)
+            # Integer buffers such as batch counters are rounded back
+            if not np.issubdtype(dtype, np.inexact):
+                np.rint(statistic, out=statistic)
+            out[start : start + len(block)] = statistic
+        result[k] = ndarray_to_array(out.reshape(shape))
+
+    aggregated = ParametersRecord(result)
+    if all(is_packed(p) for p in parameter_list):
+        return pack_parameters(aggregated)
+    return aggregated
+
+
+class RobustAggregator:
+    """
+    Aggregator taking a coordinate-wise median or trimmed mean of the parameters.
+
+    Wraps the aggregator of a model, which still aggregates the metrics.
+    """
+
+    def __init__(
+        self,
+        aggregator: Any,
+        method: str,
+        trim_fraction: float = 0.1,
+        block_size: int = BLOCK_SIZE,
+    ) -> None:
+        if method not in ROBUST_METHODS:
+            raise ValueError(f"Unknown robust aggregation: {method}")
+        if not 0 <= trim_fraction < 0.5:
+            raise ValueError(f"Trim fraction must be in [0, 0.5), got {trim_fraction}")
+        self.aggregator = aggregator
+        self.method = method
+        self.trim_fraction = trim_fraction
+        self.block_size = block_size
+
+    def aggregate_parameters(
+        self, parameter_list: list[ParametersRecord]
+    ) -> ParametersRecord:
+        return robust_aggregate_parameters(
+            parameter_list, self.method, self.trim_fraction, self.block_size
+        )
+
+    def aggregate_metrics(self, metrics_list: list[MetricsRecord]) -> MetricsRecord:
+        metrics: MetricsRecord = self.aggregator.aggregate_metrics(metrics_list)
+        return metrics
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+from flwr.common import ParametersRecord
+
+from interfaces.array_serde import ndarray_to_array
+
+
+def parameters_record(**arrays: Any) -> ParametersRecord:
+    """
+    Build a ParametersRecord of raw arrays, for the tests of the components.
+
+    Args:
+        **arrays: The arrays by name. NumPy arrays and scalars keep their dtype,
+            lists and numbers are made float32.
+
+    Returns:
+        ParametersRecord: The record, with the arrays in the order given.
+    """
+    return ParametersRecord(
+        OrderedDict(
+            (
+                k,
+                ndarray_to_array(
+                    np.asarray(v)
+                    if isinstance(v, (np.ndarray, np.generic))
+                    else np.asarray(v, dtype=np.float32)
+                ),
+            )
+            for k, v in arrays.items()
+        )
+    )
+
+
+def full_parameters(value: float, shape: tuple[int, ...] = (3,)) -> ParametersRecord:
+    """
+    Build a ParametersRecord holding a single float32 "weight" array.
+
+    Args:
+        value (float): The value of every entry.
+        shape (tuple[int, ...]): The shape of the array.
+
+    Returns:
+        ParametersRecord: The record.
+    """
+    return parameters_record(weight=np.full(shape, value, dtype=np.float32))
@@ -1,8 +1,38 @@
+from unittest.mock import patch
+
+import pytest
 from pytest import fixture
 
 import numpy as np
+from flwr.common import Array, ParametersRecord
 
-from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+from interfaces.array_serde import (
+    BFLOAT16_STYPE,
+    FLOAT16_STYPE,
+    INT8_CHANNEL_STYPE,
+    INT8_STYPE,
+    NUMPY_STYPE,
+    PACKED_ALIGNMENT,
+    PACKED_KEY,
+    SPARSE_STYPE,
+    array_to_ndarray,
+    compress_array,
+    compress_parameters,
+    decompress_array,
+    decode_parameters,
+    encode_parameters,
+    is_packed,
+    ndarray_to_array,
+    ndarray_to_sparse_array,
+    pack_ndarrays,
+    pack_parameters,
+    packed_segments,
+    replace_segments,
+    same_layout,
+    sparse_array_components,
+    unpack_ndarrays,
+    unpack_parameters,
+)
 
 
 @fixture(scope="session")
@@ -14,3 +44,197 @@ def test_serde(ndarray):
     array = ndarray_to_array(ndarray)
     deserialized = array_to_ndarray(array)
     assert np.array_equal(ndarray, deserialized)
+
+
+@pytest.mark.parametrize(
+    "codec, stype, max_error",
+    [
+        ("float16", FLOAT16_STYPE, 1e-3),
+        ("bfloat16", BFLOAT16_STYPE, 1e-2),
+        ("int8", INT8_STYPE, 1e-2),
+        ("int8_channel", INT8_CHANNEL_STYPE, 1e-2),
+    ],
+)
+def test_quantized_serde(ndarray, codec, stype, max_error):
+    array = ndarray_to_array(ndarray, codec)
+    deserialized = array_to_ndarray(array)
+
+    assert array.stype == stype
+    assert len(array.data) < ndarray.nbytes
+    assert deserialized.dtype == ndarray.dtype
+    assert deserialized.shape == ndarray.shape
+    assert np.abs(deserialized - ndarray).max() < max_error
+
+
+def test_quantized_serde_keeps_integers():
+    ndarray = np.arange(5)
+
+    array = ndarray_to_array(ndarray, "int8")
+
+    assert array.stype == NUMPY_STYPE
+    assert np.array_equal(array_to_ndarray(array), ndarray)
+
+
+def test_channel_quantization_of_vectors():
+    array = ndarray_to_array(np.random.rand(10).astype(np.float32), "int8_channel")
+
+    assert array.stype == INT8_STYPE
+
+
+def test_unknown_codec(ndarray):
+    with pytest.raises(ValueError):
+        ndarray_to_array(ndarray, "int4")
+
+
+def test_parameters_codec(ndarray):
+    parameters = ParametersRecord({"weight": ndarray_to_array(ndarray)})
+
+    encoded = encode_parameters(parameters, "float16")
+    decoded = decode_parameters(encoded)
+
+    assert encode_parameters(parameters, None) is parameters
+    assert encoded["weight"].stype == FLOAT16_STYPE
+    assert decoded["weight"].stype == NUMPY_STYPE
+    assert np.allclose(array_to_ndarray(decoded["weight"]), ndarray, atol=1e-3)
+
+
+def test_sparse_serde():
+    ndarray = np.zeros((4, 5), dtype=np.float32)
+    ndarray[1, 2] = 3.0
+    ndarray[3, 0] = -4.0
+    ndarray[0, 4] = 0.5
+
+    array = ndarray_to_sparse_array(ndarray, 0.1)
+    indices, values = sparse_array_components(array)
+
+    assert array.stype == SPARSE_STYPE
+    assert indices.tolist() == [7, 15]
+    assert values.tolist() == [3.0, -4.0]
+    expected = ndarray.copy()
+    expected[0, 4] = 0.0
+    assert np.array_equal(array_to_ndarray(array), expected)
+
+
+def test_sparse_parameters(ndarray):
+    parameters = ParametersRecord({"weight": ndarray_to_array(ndarray)})
+
+    encoded = encode_parameters(parameters, None, topk=0.1)
+
+    assert encoded["weight"].stype == SPARSE_STYPE
+    assert len(encoded["weight"].data) == 10 * 8
+    assert decode_parameters(encoded, keep_sparse=True) is encoded
+    assert decode_parameters(encoded)["weight"].stype == NUMPY_STYPE
+
+
+@pytest.mark.parametrize("codec", [None, "int8"])
+def test_compressed_serde(codec):
+    ndarray = np.round(np.random.rand(100, 100), 2).astype(np.float32)
+    array = ndarray_to_array(ndarray, codec)
+
+    # Small chunks, so that the array is compressed in several parallel chunks
+    with patch("interfaces.array_serde.COMPRESSION_CHUNK_SIZE", 4096):
+        compressed = compress_array(array, "zlib")
+        decompressed = decompress_array(compressed)
+
+    assert compressed.stype.startswith("compressed:zlib:")
+    assert compressed.stype.endswith(array.stype)
+    assert len(compressed.data) < len(array.data)
+    assert decompressed.stype == array.stype
+    assert decompressed.data == array.data
+    assert np.array_equal(array_to_ndarray(compressed), array_to_ndarray(array))
+
+
+def test_compression_of_incompressible_arrays():
+    array = ndarray_to_array(np.random.rand(4).astype(np.float32))
+
+    assert compress_array(array, "zlib") is array
+
+
+def test_unknown_compressor(ndarray):
+    with pytest.raises(ValueError):
+        compress_array(ndarray_to_array(ndarray), "brotli")
+
+    array = Array(
+        data=b"",
+        dtype="float32",
+        stype="compressed:brotli:none:" + NUMPY_STYPE,
+        shape=[],
+    )
+    with pytest.raises(ValueError):
+        array_to_ndarray(array)
+
+
+def test_compressed_parameters():
+    ndarray = np.zeros((100, 100), dtype=np.float32)
+    parameters = ParametersRecord({"weight": ndarray_to_array(ndarray)})
+
+    compressed = compress_parameters(parameters, "zlib")
+    decoded = decode_parameters(compressed)
+
+    assert compress_parameters(parameters, None) is parameters
+    assert decoded["weight"].stype == NUMPY_STYPE
+    assert np.array_equal(array_to_ndarray(decoded["weight"]), ndarray)
+
+
+def test_packed_serde(ndarray):
+    ndarrays = {
+        "weight": ndarray,
+        "steps": np.array(3, dtype=np.int64),
+        "bias": np.arange(3, dtype=np.float32),
+        "empty": np.zeros((0, 2), dtype=np.float32),
+    }
+    array = pack_ndarrays(ndarrays)
+    unpacked = unpack_ndarrays(array)
+
+    assert list(unpacked.keys()) == list(ndarrays.keys())
+    for k, v in ndarrays.items():
+        assert unpacked[k].dtype == v.dtype
+        assert np.array_equal(unpacked[k], v)
+    # Arrays of the same dtype are contiguous, dtype groups are aligned
+    weight, steps, bias = (unpacked[k] for k in ["weight", "steps", "bias"])
+    assert bias.ctypes.data == weight.ctypes.data + weight.nbytes
+    assert (steps.ctypes.data - weight.ctypes.data) % PACKED_ALIGNMENT == 0
+    # The arrays are views on the packed data
+    assert not weight.flags.owndata
+
+
+def test_packed_segments(ndarray):
+    ndarrays = {
+        "weight": ndarray,
+        "steps": np.array(3, dtype=np.int64),
+        "bias": np.arange(3, dtype=np.float32),
+    }
+    array = pack_ndarrays(ndarrays)
+
+    # One flat view per dtype, the arrays of the group following each other
+    segments = packed_segments(array)
+    assert [v.dtype for v in segments.values()] == [np.float32, np.int64]
+    floats, ints = segments.values()
+    assert np.array_equal(floats, np.concatenate([ndarray.reshape(-1), np.arange(3)]))
+    assert not floats.flags.owndata
+
+    replaced = replace_segments(array, {k: v * 2 for k, v in segments.items()})
+    assert same_layout(array, replaced)
+    for k, v in unpack_ndarrays(replaced).items():
+        assert v.dtype == ndarrays[k].dtype
+        assert np.array_equal(v, ndarrays[k] * 2)
+    assert not same_layout(array, pack_ndarrays({"weight": ndarray}))
+
+
+def test_packed_parameters(ndarray):
+    parameters = ParametersRecord(
+        {"weight": ndarray_to_array(ndarray), "bias": ndarray_to_array(np.ones(2))}
+    )
+
+    packed = pack_parameters(parameters)
+    compressed = compress_parameters(packed, "zlib")
+
+    assert is_packed(packed) and list(packed.keys()) == [PACKED_KEY]
+    assert pack_parameters(packed) is packed
+    assert is_packed(decode_parameters(compressed, keep_packed=True))
+    for unpacked in [unpack_parameters(packed), decode_parameters(compressed)]:
+        assert list(unpacked.keys()) == ["weight", "bias"]
+        assert np.array_equal(array_to_ndarray(unpacked["weight"]), ndarray)
+    assert unpack_parameters(parameters) is parameters
+    with pytest.raises(ValueError):
+        pack_parameters(encode_parameters(parameters, "float16"))
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+
+from interfaces.artifact_cache import ArtifactCache
+
+
+def _download(directory, content=b"model"):
+    path = os.path.join(directory, "model")
+    os.makedirs(path)
+    with open(os.path.join(path, "weights.bin"), "wb") as file:
+        file.write(content)
+    return path
+
+
+def _load(root, downloads):
+    def download(directory):
+        downloads.put(os.getpid())
+        return _download(directory)
+
+    with ArtifactCache(root, 2**20).open(
+        "models:/model/1", "checksum", download
+    ) as path:
+        with open(os.path.join(path, "weights.bin"), "rb") as file:
+            assert file.read() == b"model"
+
+
+def test_artifact_cache_shared_download(tmp_path):
+    context = multiprocessing.get_context("fork")
+    downloads = context.Queue()
+    processes = [
+        context.Process(target=_load, args=(str(tmp_path), downloads)) for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+
+    # Every process reads the artifacts, downloaded by one of them
+    assert [p.exitcode for p in processes] == [0] * 4
+    assert downloads.qsize() == 1
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_artifact_cache_keys(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 2**20)
+    with cache.open("models:/model/1", "a", _download) as first:
+        pass
+    with cache.open("models:/model/1", "a", _download) as again:
+        pass
+    with cache.open("models:/model/1", "b", _download) as changed:
+        pass
+
+    # Artifacts changing at the source are downloaded again
+    assert again == first
+    assert changed != first
+
+
+def test_artifact_cache_evicts_least_recent(tmp_path):
+    cache = ArtifactCache(str(tmp_path), 250)
+
+    def download(directory):
+        return _download(directory, b"x" * 100)
+
+    with cache.open("a", "", download) as a:
+        pass
+    with cache.open("b", "", download) as b:
+        os.utime(a, (0, 0))
+        os.utime(b, (1, 1))
+        # An entry in use is kept even when it is the least recent
+        with cache.open("c", "", download) as c:
+            pass
+        with cache.open("d", "", download) as d:
+            pass
+
+    assert not os.path.exists(a)
+    assert os.path.exists(b)
+    assert not os.path.exists(c)
+    assert os.path.exists(d)
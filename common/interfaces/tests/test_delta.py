@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from interfaces.array_serde import array_to_ndarray, ndarray_to_array
+from interfaces.delta import add_parameters, scale_parameters, subtract_parameters
+from interfaces.testing import parameters_record
+
+
+def test_subtract_add_roundtrip():
+    base = parameters_record(weight=[[1.0, 2.0], [3.0, 4.0]], bias=[0.5, 0.5])
+    target = parameters_record(weight=[[1.5, 2.0], [3.0, 3.0]], bias=[0.5, 0.5])
+
+    delta = subtract_parameters(target, base)
+    result = add_parameters(base, delta)
+
+    # Unchanged arrays are left out of the delta
+    assert list(delta.keys()) == ["weight"]
+    assert np.array_equal(array_to_ndarray(delta["weight"]), [[0.5, 0.0], [0.0, -1.0]])
+    assert list(result.keys()) == ["weight", "bias"]
+    for k in target:
+        assert np.array_equal(array_to_ndarray(result[k]), array_to_ndarray(target[k]))
+
+
+def test_mismatched_keys():
+    base = parameters_record(weight=[1.0])
+
+    with pytest.raises(ValueError):
+        subtract_parameters(parameters_record(bias=[1.0]), base)
+    with pytest.raises(ValueError):
+        add_parameters(base, parameters_record(bias=[1.0]))
+
+
+def test_scale_parameters():
+    delta = parameters_record(weight=[1.0, -2.0])
+    delta["steps"] = ndarray_to_array(np.array([3, 5], dtype=np.int64))
+
+    scaled = scale_parameters(delta, 0.5)
+
+    assert np.array_equal(array_to_ndarray(scaled["weight"]), [0.5, -1.0])
+    # Integer arrays keep their dtype, rounded to the nearest even value
+    assert array_to_ndarray(scaled["steps"]).dtype == np.int64
+    assert np.array_equal(array_to_ndarray(scaled["steps"]), [2, 2])
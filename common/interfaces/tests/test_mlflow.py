@@ -1,8 +1,11 @@
+import threading
+from pathlib import Path
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
 from interfaces import mlflow_client
+from interfaces.artifact_cache import ArtifactCache
 
 pytest.fixture(autouse=True)
 
@@ -10,7 +13,7 @@ pytest.fixture(autouse=True)
 def reset_mlflow_client():
     mlflow_client._initialized.value = False
     mlflow_client._configured.value = False
-    mlflow_client._current_config.clean()
+    mlflow_client.current_context().clean()
     mlflow_client._mlflow_client = None
 
 
@@ -104,32 +107,62 @@ def test_set_current_config():
             experiment_id, parent_run_id, child_run_id, model_name, model_version
         )
 
-    assert mlflow_client._current_config.experiment_id == experiment_id
-    assert mlflow_client._current_config.parent_run_id == parent_run_id
-    assert mlflow_client._current_config.child_run_id == child_run_id
-    assert mlflow_client._current_config.model_name == model_name
-    assert mlflow_client._current_config.model_version == model_version
-    assert mlflow_client._current_config.model_tags == tags
-    assert mlflow_client._current_config.model_description == description
+    assert mlflow_client.current_context().experiment_id == experiment_id
+    assert mlflow_client.current_context().parent_run_id == parent_run_id
+    assert mlflow_client.current_context().child_run_id == child_run_id
+    assert mlflow_client.current_context().model_name == model_name
+    assert mlflow_client.current_context().model_version == model_version
+    assert mlflow_client.current_context().model_tags == tags
+    assert mlflow_client.current_context().model_description == description
     assert mlflow_client._configured
 
 
+def test_contexts_per_thread():
+    mlflow_client._initialized.value = True
+    seen = {}
+
+    def run(name: str) -> None:
+        with mlflow_client.use_context(mlflow_client.MlflowContext()) as context:
+            mlflow_client.set_current_config(
+                f"{name}_experiment", None, f"{name}_run", f"{name}_model", 1
+            )
+            barrier.wait(5)
+            seen[name] = (mlflow_client.current_context() is context, context)
+
+    barrier = threading.Barrier(2)
+    with patch("interfaces.mlflow_client._mlflow_client") as mock_mlflow_client:
+        mock_mlflow_client.get_model_version.return_value = Mock(
+            tags={}, description=""
+        )
+        threads = [threading.Thread(target=run, args=(n,)) for n in ["a", "b"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Both tasks were configured at once, each in its own context
+    assert all(bound for bound, _ in seen.values())
+    assert seen["a"][1].child_run_id == "a_run"
+    assert seen["b"][1].child_run_id == "b_run"
+    assert all(context.configured for _, context in seen.values())
+
+
 def test_clean_current_config():
     mlflow_client._initialized.value = True
     mlflow_client._configured.value = True
-    mlflow_client._current_config.is_central_node = True
-    mlflow_client._current_config.parent_run_id = "test_parent_run_id"
-    mlflow_client._current_config.child_run_id = "test_child_run_id"
+    mlflow_client.current_context().is_central_node = True
+    mlflow_client.current_context().parent_run_id = "test_parent_run_id"
+    mlflow_client.current_context().child_run_id = "test_child_run_id"
 
     with patch.object(mlflow_client._mlflow_client, "update_run") as mock_update_run:
         mlflow_client.clean_current_config()
 
     assert not mlflow_client._configured
     mock_update_run.assert_any_call(
-        mlflow_client._current_config.child_run_id, "FINISHED"
+        mlflow_client.current_context().child_run_id, "FINISHED"
     )
     mock_update_run.assert_any_call(
-        mlflow_client._current_config.parent_run_id, "FINISHED"
+        mlflow_client.current_context().parent_run_id, "FINISHED"
     )
 
 
@@ -137,17 +170,60 @@ def test_load_mlflow_model():
     mlflow_client._initialized.value = True
     mlflow_client._configured.value = True
 
-    mlflow_client._current_config.model_name = "test_model_name"
-    mlflow_client._current_config.model_version = 1
+    mlflow_client.current_context().model_name = "test_model_name"
+    mlflow_client.current_context().model_version = 1
 
     with patch("interfaces.mlflow_client._load_model") as mock_load_model:
         mlflow_client.load_model()
 
     mock_load_model.assert_called_once_with(
-        f"models:/{mlflow_client._current_config.model_name}/{mlflow_client._current_config.model_version}"
+        f"models:/{mlflow_client.current_context().model_name}/{mlflow_client.current_context().model_version}"
     )
 
 
+def test_load_model_artifact_cache(tmp_path):
+    mlflow_client._initialized.value = True
+    mlflow_client._configured.value = True
+    source = tmp_path / "source" / "model"
+    source.mkdir(parents=True)
+    (source / "MLmodel").write_text("model_uuid: first")
+    client = MagicMock()
+    client.get_model_version_download_uri.return_value = str(source)
+    download = mlflow_client.mlflow.artifacts.download_artifacts
+
+    with (
+        patch.object(mlflow_client, "_mlflow_client", client),
+        patch.object(
+            mlflow_client,
+            "_artifact_cache",
+            ArtifactCache(str(tmp_path / "cache"), 2**20),
+        ),
+        patch(
+            "interfaces.mlflow_client.mlflow.artifacts.download_artifacts",
+            side_effect=download,
+        ) as mock_download,
+        patch("interfaces.mlflow_client._load_model") as mock_load_model,
+    ):
+        mlflow_client.load_model()
+        mlflow_client.load_model()
+        # A model logged again is a new entry
+        (source / "MLmodel").write_text("model_uuid: second")
+        mlflow_client.load_model()
+
+    paths = [c.args[0] for c in mock_load_model.call_args_list]
+    assert paths[0] == paths[1] != paths[2]
+    assert Path(paths[0]).parent == tmp_path / "cache" / "entries"
+    # The model is downloaded once per version of its artifacts, its MLmodel file
+    # being fetched on every load for the checksum
+    full = [
+        c
+        for c in mock_download.call_args_list
+        if c.kwargs["artifact_uri"] == str(source)
+    ]
+    assert len(full) == 2
+    assert mock_download.call_count == 5
+
+
 def test_upload_final_state():
     model_name = "test_model_name"
     uploaded_model_name = f"trained_{model_name}"
@@ -160,10 +236,10 @@ def test_upload_final_state():
 
     mlflow_client._initialized.value = True
     mlflow_client._configured.value = True
-    mlflow_client._current_config.model_name = model_name
-    mlflow_client._current_config.model_version = model_version
-    mlflow_client._current_config.model_description = description
-    mlflow_client._current_config.model_tags = tags
+    mlflow_client.current_context().model_name = model_name
+    mlflow_client.current_context().model_version = model_version
+    mlflow_client.current_context().model_description = description
+    mlflow_client.current_context().model_tags = tags
 
     final_state = Mock()
 
@@ -226,6 +302,18 @@ def test_log_metrics():
     mock_mlflow.log_metrics.assert_called_once_with(metrics, step=step)
 
 
+def test_log_dict():
+    mlflow_client._initialized.value = True
+    mlflow_client._configured.value = True
+
+    with patch("interfaces.mlflow_client.mlflow") as mock_mlflow:
+        mlflow_client.log_dict({"round": 1}, "round_plans/round_1.json")
+
+    mock_mlflow.log_dict.assert_called_once_with(
+        {"round": 1}, "round_plans/round_1.json"
+    )
+
+
 def test_set_dataset_signature():
     mlflow_client._initialized.value = True
     mlflow_client._configured.value = True
@@ -240,3 +328,42 @@ def test_set_dataset_signature():
         )
 
     mock_mlflow.log_input.assert_called_once()
+
+
+def test_clean_current_config_status():
+    mlflow_client._initialized.value = True
+    mlflow_client._configured.value = True
+    mlflow_client.current_context().is_central_node = True
+    mlflow_client.current_context().parent_run_id = "test_parent_run_id"
+    mlflow_client.current_context().child_run_id = "test_child_run_id"
+
+    with (
+        patch.object(mlflow_client._mlflow_client, "update_run") as mock_update_run,
+        patch("interfaces.mlflow_client.mlflow.end_run") as mock_end_run,
+    ):
+        mlflow_client.clean_current_config("KILLED")
+
+    # A cancelled task's runs end as killed rather than finished
+    mock_end_run.assert_called_once_with("KILLED")
+    mock_update_run.assert_any_call("test_child_run_id", "KILLED")
+    mock_update_run.assert_any_call("test_parent_run_id", "KILLED")
+
+
+def test_artifact_bytes(tmp_path):
+    mlflow_client._initialized.value = True
+    client = mlflow_client.MlflowClient(f"file://{tmp_path}")
+    experiment_id = client.create_experiment("test_experiment")
+    run_id = client.create_run(experiment_id, tags={"key": "value"}).info.run_id
+
+    with patch.object(mlflow_client, "_mlflow_client", client):
+        mlflow_client.log_artifact_bytes(run_id, b"first", "dir/a.bin")
+        mlflow_client.log_artifact_bytes(run_id, b"second", "dir/b.bin")
+        paths = mlflow_client.list_artifacts(run_id, "dir")
+        data = mlflow_client.load_artifact_bytes(run_id, paths[-1])
+        found = mlflow_client.find_runs("test_experiment", "tags.key = 'value'")
+        mlflow_client.set_run_status(run_id, "KILLED")
+
+    assert paths == ["dir/a.bin", "dir/b.bin"]
+    assert data == b"second"
+    assert found == [run_id]
+    assert client.get_run(run_id).info.status == "KILLED"
@@ -0,0 +1,68 @@
+from flwr.common import ConfigsRecord, MetricsRecord, ParametersRecord, RecordSet
+
+from interfaces import recordset
+
+
+def test_pipeline_serde():
+    pr = ParametersRecord()
+    steps = [
+        recordset.create_load_data_recordset("iris"),
+        recordset.create_set_parameters_recordset(pr),
+    ]
+
+    rs = recordset.create_pipeline_recordset(steps)
+    result = recordset.read_pipeline_recordset(rs)
+
+    assert rs.configs_records["config"]["mode"] == "pipeline"
+    assert rs.configs_records["config"]["steps"] == ["load_data", "set_parameters"]
+    assert recordset.read_load_data_recordset(result[0]) == "iris"
+    assert recordset.read_set_parameters_recordset(result[1]) is pr
+
+
+def test_pipeline_reply_serde():
+    replies = [
+        RecordSet(configs_records={"config": ConfigsRecord({"success": True})}),
+        RecordSet(
+            configs_records={"config": ConfigsRecord({"success": False})},
+            metrics_records={"metrics": MetricsRecord({"loss": 0.1})},
+        ),
+    ]
+
+    rs = recordset.create_pipeline_reply_recordset(
+        ["load_data", "train"], replies, [True, False], "failed"
+    )
+    result = recordset.read_pipeline_reply_recordset(rs)
+
+    assert not rs.configs_records["config"]["success"]
+    assert [(mode, success) for mode, success, _ in result] == [
+        ("load_data", True),
+        ("train", False),
+    ]
+    assert result[1][2].metrics_records["metrics"]["loss"] == 0.1
+
+
+def test_train_model_serde():
+    pr = ParametersRecord()
+
+    rs = recordset.create_train_model_recordset(pr, 3, global_version=5)
+
+    assert recordset.read_train_model_recordset(rs) == (pr, 3)
+    assert recordset.read_train_model_transport(rs) == (5, None, False)
+
+    rs = recordset.create_train_model_recordset(
+        pr, 3, global_version=5, base_version=4, delta_reply=True
+    )
+
+    assert recordset.read_train_model_transport(rs) == (5, 4, True)
+    assert recordset.read_train_model_codec(rs) == (None, False, None)
+
+    rs = recordset.create_train_model_recordset(
+        pr, 3, codec="int8", error_feedback=True, topk=0.1
+    )
+
+    assert recordset.read_train_model_codec(rs) == ("int8", True, 0.1)
+    assert not recordset.read_packed(rs)
+
+    rs = recordset.create_train_model_recordset(pr, 3, packed=True)
+
+    assert recordset.read_packed(rs)
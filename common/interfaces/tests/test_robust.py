@@ -0,0 +1,108 @@
+from unittest.mock import Mock
+
+import numpy as np
+import pytest
+from flwr.common import MetricsRecord, ParametersRecord
+
+from interfaces.array_serde import (
+    array_to_ndarray,
+    is_packed,
+    ndarray_to_array,
+    ndarray_to_sparse_array,
+    pack_parameters,
+)
+from interfaces.robust import RobustAggregator, robust_aggregate_parameters
+
+
+def _records(ndarrays):
+    return [
+        ParametersRecord(
+            {
+                "weight": ndarray_to_array(v),
+                "steps": ndarray_to_array(np.array(i, dtype=np.int64)),
+            }
+        )
+        for i, v in enumerate(ndarrays)
+    ]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 12])
+def test_median(block_size):
+    rng = np.random.default_rng(0)
+    ndarrays = [rng.random((20, 30), dtype=np.float32) for _ in range(6)]
+
+    result = robust_aggregate_parameters(
+        _records(ndarrays), "median", block_size=block_size
+    )
+
+    expected = np.median(np.stack(ndarrays), axis=0).astype(np.float32)
+    assert np.array_equal(array_to_ndarray(result["weight"]), expected)
+    # Integer buffers keep their dtype and are rounded
+    steps = array_to_ndarray(result["steps"])
+    assert steps.dtype == np.int64 and steps == 2
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 12])
+def test_trimmed_mean(block_size):
+    rng = np.random.default_rng(0)
+    ndarrays = [rng.random((20, 30), dtype=np.float32) for _ in range(10)]
+    # A node sending outliers is left out of the mean
+    ndarrays[3] = np.full((20, 30), 1e9, dtype=np.float32)
+
+    result = robust_aggregate_parameters(
+        _records(ndarrays), "trimmed_mean", 0.2, block_size=block_size
+    )
+
+    expected = np.sort(np.stack(ndarrays), axis=0)[2:8].mean(axis=0)
+    assert np.allclose(array_to_ndarray(result["weight"]), expected)
+    assert array_to_ndarray(result["weight"]).max() < 1
+
+
+def test_robust_packed_and_sparse():
+    rng = np.random.default_rng(0)
+    ndarrays = [rng.random(100, dtype=np.float32) - 0.5 for _ in range(5)]
+    expected = np.median(np.stack(ndarrays), axis=0)
+
+    packed = robust_aggregate_parameters(
+        [pack_parameters(r) for r in _records(ndarrays)]
+    )
+    assert is_packed(packed)
+    unpacked = robust_aggregate_parameters(_records(ndarrays))
+    assert packed["packed"].data == pack_parameters(unpacked)["packed"].data
+
+    # Sparse updates count their missing entries as zeros
+    sparse = [
+        ParametersRecord({"weight": ndarray_to_sparse_array(v, 0.3)}) for v in ndarrays
+    ]
+    dense = [array_to_ndarray(r["weight"]) for r in sparse]
+    result = robust_aggregate_parameters(sparse, block_size=16)
+    assert np.array_equal(
+        array_to_ndarray(result["weight"]), np.median(np.stack(dense), axis=0)
+    )
+    assert not np.array_equal(array_to_ndarray(result["weight"]), expected)
+
+
+def test_robust_invalid():
+    records = _records([np.ones(3, dtype=np.float32)])
+
+    with pytest.raises(ValueError):
+        robust_aggregate_parameters(records, "mode")
+    with pytest.raises(ValueError):
+        robust_aggregate_parameters(records, "trimmed_mean", 0.5)
+    with pytest.raises(ValueError):
+        robust_aggregate_parameters([])
+    with pytest.raises(ValueError):
+        RobustAggregator(Mock(), "mode")
+
+
+def test_robust_aggregator():
+    aggregator = Mock()
+    aggregator.aggregate_metrics.return_value = MetricsRecord({"loss": 0.5})
+    robust = RobustAggregator(aggregator, "median")
+    ndarrays = [np.full(3, v, dtype=np.float32) for v in [1.0, 2.0, 100.0]]
+
+    result = robust.aggregate_parameters(_records(ndarrays))
+
+    assert np.array_equal(array_to_ndarray(result["weight"]), [2.0, 2.0, 2.0])
+    assert robust.aggregate_metrics([]) == MetricsRecord({"loss": 0.5})
+    aggregator.aggregate_parameters.assert_not_called()
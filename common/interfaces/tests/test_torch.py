@@ -1,3 +1,4 @@
+import numpy as np
 from torch import nn
 
 from interfaces.pytorch import (
@@ -12,3 +13,29 @@ def test_pytorch_serde():
     state_dict = parameters_to_pytorch_state_dict(params_record)
     for k, v in model.state_dict().items():
         assert v.numpy().all() == state_dict[k].numpy().all()
+
+
+def test_pytorch_serde_compressed():
+    model = nn.Linear(100, 100)
+    nn.init.zeros_(model.weight)
+    params_record = pytorch_to_parameter_record(model, compression="zlib")
+    state_dict = parameters_to_pytorch_state_dict(params_record)
+
+    assert params_record["weight"].stype.startswith("compressed:zlib")
+    for k, v in model.state_dict().items():
+        assert (v == state_dict[k]).all()
+
+
+def test_pytorch_serde_without_copy():
+    model = nn.Linear(10, 1)
+    params_record = pytorch_to_parameter_record(model)
+    state_dict = parameters_to_pytorch_state_dict(params_record, copy=False)
+
+    # The tensors share the memory of the record
+    weight = np.frombuffer(params_record["weight"].data, dtype=np.float32)
+    assert state_dict["weight"].data_ptr() == weight.ctypes.data
+
+    loaded = nn.Linear(10, 1)
+    loaded.load_state_dict(state_dict)
+    for k, v in model.state_dict().items():
+        assert (v == loaded.state_dict()[k]).all()
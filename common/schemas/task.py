@@ -23,6 +23,57 @@ class TaskBase(SQLModel):
     num_global_iterations: int = Field(nullable=False)
     run_name: str = Field(nullable=False)
     experiment_name: str = Field(nullable=False)
+    # Round policy: close a training round after min_replies replies, after a
+    # fraction of the nodes replied, or once round_deadline seconds have elapsed
+    min_replies: int | None = Field(default=None, nullable=True)
+    min_reply_fraction: float | None = Field(default=None, nullable=True)
+    round_deadline: float | None = Field(default=None, nullable=True)
+    # Exchange parameters as deltas against the previous global model
+    delta_transport: bool = Field(default=False)
+    # Lossy codec for the parameters sent back by the nodes (float16, bfloat16,
+    # int8, int8_channel), optionally carrying the quantization error over rounds
+    update_codec: str | None = Field(default=None, nullable=True)
+    error_feedback: bool = Field(default=False)
+    # Fraction of the largest entries of each update the nodes send back, the
+    # rest is carried over to the next round, needs delta_transport
+    update_topk: float | None = Field(default=None, nullable=True)
+    # Lossless compressor for the parameters exchanged (zlib, or zstd and lz4
+    # when installed)
+    compression: str | None = Field(default=None, nullable=True)
+    # Exchange the whole model as a single buffer, averaged in one pass by
+    # aggregators that support it, cannot be combined with delta_transport,
+    # update_codec or update_topk
+    packed_parameters: bool = Field(default=False)
+    # Coordinate-wise robust aggregation of the parameters instead of the model's
+    # average (median, trimmed_mean), the trimmed mean leaving out trim_fraction of
+    # the nodes on each side
+    robust_aggregation: str | None = Field(default=None, nullable=True)
+    trim_fraction: float = Field(default=0.1)
+    # Server optimizer applied to the aggregated update (momentum, adam, yogi), with
+    # its learning rate (1.0 for momentum, 0.1 otherwise by default), decay rates
+    # and adaptivity
+    server_optimizer: str | None = Field(default=None, nullable=True)
+    server_lr: float | None = Field(default=None, nullable=True)
+    server_beta1: float = Field(default=0.9)
+    server_beta2: float = Field(default=0.99)
+    server_tau: float = Field(default=1e-3)
+    # Asynchronous training: the nodes are sent the latest global model as soon as
+    # they reply, and a new global version is published every async_buffer_size
+    # updates, each weighted by (1 + staleness) ** -staleness_exponent, the
+    # num_global_iterations versions replacing the rounds
+    async_buffer_size: int | None = Field(default=None, nullable=True)
+    staleness_exponent: float = Field(default=0.5)
+    # Train a random sample of sample_count nodes, or of a fraction of the nodes,
+    # every synchronous round, drawn with sample_seed from sample_strata strata of
+    # nodes of similar reply latency, the replies weighted by the inverse of their
+    # probability to be sampled
+    sample_count: int | None = Field(default=None, nullable=True)
+    sample_fraction: float | None = Field(default=None, nullable=True)
+    sample_seed: int = Field(default=0)
+    sample_strata: int = Field(default=1)
+    # Checkpoint the global model, the server optimizer state and the nodes every
+    # checkpoint_every versions, a task dispatched again resuming from the latest
+    checkpoint_every: int | None = Field(default=None, nullable=True)
 
 
 class Task(TaskBase, table=True):